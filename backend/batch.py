@@ -0,0 +1,129 @@
+"""Apply a list of create/update/delete operations in one transaction.
+
+Creates may name themselves with ``ref`` so later operations in the same
+batch can point at them, e.g. ``{"project_id": "$new-project"}``.
+"""
+from typing import Dict, List
+
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from models import Profile, Skill, Project, Education, WorkExperience, Link, ProjectLink, check_slug
+from schemas import BatchOperation
+
+MODELS = {
+    "profile": Profile,
+    "skill": Skill,
+    "project": Project,
+    "project_link": ProjectLink,
+    "education": Education,
+    "work": WorkExperience,
+    "link": Link,
+}
+
+# Columns clients may not write directly
+PROTECTED_FIELDS = {"id"}
+# Foreign keys that must point at an existing row
+PARENTS = {"profile_id": Profile, "project_id": Project}
+
+
+class BatchError(Exception):
+    def __init__(self, index: int, status_code: int, message: str):
+        super().__init__(message)
+        self.index = index
+        self.status_code = status_code
+        self.message = message
+
+
+def writable_fields(model) -> set:
+    return set(model.model_fields) - PROTECTED_FIELDS
+
+
+def resolve_refs(index: int, data: dict, refs: Dict[str, int]) -> dict:
+    """Replace ``"$ref"`` values with the id of the row created under that ref"""
+    resolved = {}
+    for key, value in data.items():
+        if isinstance(value, str) and value.startswith("$") and key in PARENTS:
+            if value[1:] not in refs:
+                raise BatchError(index, 400, f"Unknown ref '{value[1:]}' in {key}")
+            value = refs[value[1:]]
+        resolved[key] = value
+    return resolved
+
+
+def check_fields(index: int, model, data: dict, session: Session):
+    unknown = set(data) - writable_fields(model)
+    if unknown:
+        raise BatchError(index, 400, f"Unknown fields for {model.__name__}: {', '.join(sorted(unknown))}")
+    for key, parent in PARENTS.items():
+        if key in data and data[key] is not None and session.get(parent, data[key]) is None:
+            raise BatchError(index, 404, f"{parent.__name__} {data[key]} not found")
+    if model is Profile and data.get("slug") is not None:
+        try:
+            check_slug(data["slug"])
+        except ValueError as exc:
+            raise BatchError(index, 422, str(exc))
+
+
+def validated(index: int, model, data: dict):
+    try:
+        return model.model_validate(data)
+    except ValidationError as exc:
+        error = exc.errors()[0]
+        field = ".".join(str(part) for part in error["loc"])
+        raise BatchError(index, 422, f"{field}: {error['msg']}")
+
+
+def apply_operation(session: Session, index: int, operation: BatchOperation, refs: Dict[str, int]) -> dict:
+    model = MODELS[operation.type]
+    result = {"index": index, "op": operation.op, "type": operation.type}
+
+    if operation.op == "create":
+        data = resolve_refs(index, operation.data, refs)
+        check_fields(index, model, data, session)
+        obj = validated(index, model, data)
+        session.add(obj)
+        session.flush()
+        if operation.ref:
+            refs[operation.ref] = obj.id
+        return {**result, "id": obj.id, "status": "created"}
+
+    if operation.id is None:
+        raise BatchError(index, 400, f"'{operation.op}' needs an id")
+    obj = session.get(model, operation.id)
+    if obj is None:
+        raise BatchError(index, 404, f"{model.__name__} {operation.id} not found")
+
+    if operation.op == "update":
+        data = resolve_refs(index, operation.data, refs)
+        check_fields(index, model, data, session)
+        current = {name: getattr(obj, name) for name in model.model_fields}
+        merged = validated(index, model, {**current, **data})
+        for name in data:
+            setattr(obj, name, getattr(merged, name))
+        session.add(obj)
+        session.flush()
+        return {**result, "id": obj.id, "status": "updated"}
+
+    session.delete(obj)
+    session.flush()
+    return {**result, "id": operation.id, "status": "deleted"}
+
+
+def apply_operations(session: Session, operations: List[BatchOperation]) -> List[dict]:
+    """Apply every operation and commit, or roll back and raise ``BatchError``"""
+    refs: Dict[str, int] = {}
+    results = []
+    try:
+        for i, op in enumerate(operations):
+            try:
+                results.append(apply_operation(session, i, op, refs))
+            except IntegrityError as exc:
+                # e.g. a slug another profile (or an earlier operation) already has
+                raise BatchError(i, 409, f"Conflicts with an existing row: {exc.orig}") from exc
+    except Exception:
+        session.rollback()
+        raise
+    session.commit()
+    return results
@@ -0,0 +1,35 @@
+"""Throughput and tail latency of the sync (threadpool) vs async (aiosqlite) DB paths.
+
+The response cache is disabled so every request reaches SQLite.
+
+Usage: python benchmarks/bench_async_db.py [clients] [seconds]
+"""
+import sys
+
+from common import engine, make_profile, reset_database
+
+from sqlmodel import Session
+
+from load import drive, uvicorn_server
+
+PATHS = ["/api/profile", "/api/projects?skill=python", "/api/skills/top", "/api/search?q=python"]
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    reset_database()
+    with Session(engine) as session:
+        make_profile(session, projects=50)
+
+    print(f"{'mode':<8} {'clients':>8} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode, flag in (("sync", "0"), ("async", "1")):
+        with uvicorn_server({"ASYNC_DB": flag, "CACHE_MAX_ENTRIES": "0"}) as base_url:
+            drive(base_url, PATHS, clients=clients, duration=2)  # warm up
+            result = drive(base_url, PATHS, clients=clients, duration=duration)
+        print(f"{mode:<8} {clients:>8} {result['rps']:>8} {result['p50_ms']:>8} "
+              f"{result['p95_ms']:>8} {result['p99_ms']:>8} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""One PATCH /api/batch with N operations vs N single-operation requests.
+
+Usage: python benchmarks/bench_batch.py [operations]
+"""
+import sys
+import time
+
+from common import engine, make_profile, reset_database
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from main import app
+
+
+def operations(profile_id: int, n: int, prefix: str):
+    return [
+        {"op": "create", "type": "skill", "data": {"name": f"{prefix} skill {i}", "profile_id": profile_id}}
+        for i in range(n)
+    ]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    reset_database()
+    with Session(engine) as session:
+        profile_id = make_profile(session, projects=20)
+    client = TestClient(app)
+
+    start = time.perf_counter()
+    for op in operations(profile_id, n, "single"):
+        assert client.patch("/api/batch", json={"operations": [op]}).status_code == 200
+    separate = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assert client.patch("/api/batch", json={"operations": operations(profile_id, n, "batched")}).status_code == 200
+    batched = time.perf_counter() - start
+
+    print(f"{n} separate requests: {separate * 1000:8.1f} ms ({n} commits)")
+    print(f"1 batch request:      {batched * 1000:8.1f} ms (1 commit)  {separate / batched:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Bulk NDJSON import throughput and export memory.
+
+First posts malformed lines between good ones to POST /api/import and checks
+that only the malformed lines are rejected. Then generates a synthetic NDJSON
+file, imports it with bulk.import_ndjson, and exports everything while
+tracking peak Python memory.
+
+Usage: python benchmarks/bench_bulk.py [target_rows]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import engine, reset_database, synthetic_record
+
+import orjson
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from bulk import export_ndjson, import_ndjson
+from main import app
+from models import Profile
+
+
+ROWS_PER_PROFILE = 1 + 5 + 10 * (1 + 2 + 3) + 2 + 2 + 2
+
+MALFORMED_LINES = [
+    {"name": "a", "email": "b", "skills": [{"name": 5}]},
+    {"name": "a", "email": "b", "projects": [{"title": 5, "description": "x"}]},
+    {"name": "a", "email": "b", "projects": [{"title": "t", "description": None}]},
+    {"name": "a", "email": "b", "projects": [{"title": "t", "links": [{"platform": "github", "url": None}]}]},
+    {"name": "a", "email": "b", "bio": {"x": 1}},
+    {"name": "a", "email": "b", "location": 5},
+    {"name": "a", "email": "b", "links": [{"platform": "github"}]},
+    {"name": "a", "email": "b", "work": "none"},
+]
+
+
+def check_malformed_lines():
+    """POST /api/import with a malformed line after each good one: the good lines are all committed"""
+    good = [synthetic_record(i, projects=2) for i in range(len(MALFORMED_LINES) + 1)]
+    lines = [good[0]]
+    for bad, record in zip(MALFORMED_LINES, good[1:]):
+        lines += [bad, record]
+    response = TestClient(app).post("/api/import", content=b"".join(orjson.dumps(line) + b"\n" for line in lines))
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert report["profiles"] == len(good) and report["error_count"] == len(MALFORMED_LINES), report
+    assert [e["line"] for e in report["errors"]] == list(range(2, 2 * len(MALFORMED_LINES) + 1, 2)), report
+    with Session(engine) as session:
+        assert sorted(session.exec(select(Profile.name))) == sorted(r["name"] for r in good)
+    print("malformed lines rejected one by one:")
+    for error in report["errors"]:
+        print(f"  line {error['line']}: {error['error']}")
+
+
+def main():
+    target_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    profiles = target_rows // ROWS_PER_PROFILE
+    reset_database()
+    check_malformed_lines()
+    reset_database()
+
+    path = os.path.join(tempfile.mkdtemp(), "profiles.ndjson")
+    with open(path, "wb") as f:
+        for i in range(profiles):
+            f.write(orjson.dumps(synthetic_record(i)) + b"\n")
+    print(f"generated {profiles:,} profiles ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        report = import_ndjson(f)
+    elapsed = time.perf_counter() - start
+    print(f"import: {report['rows']:,} rows in {elapsed:.1f}s ({report['rows'] / elapsed:,.0f} rows/s), "
+          f"{report['error_count']} errors")
+
+    for limit in (profiles // 10, profiles):
+        tracemalloc.start()
+        start = time.perf_counter()
+        exported = 0
+        for chunk in export_ndjson():
+            exported += chunk.count(b"\n")
+            if exported >= limit:
+                break
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"export: {exported:,} profiles in {elapsed:.1f}s, peak traced memory {peak / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Change log and SSE feed: idle subscriber cost, fan-out latency, read and write cost.
+
+1. Opens N SSE subscribers straight through the ASGI app and reports memory
+   per subscriber and the CPU the worker burns while they sit idle.
+2. Commits a profile update and times until every subscriber has the event.
+3. Times ``GET /api/changes?since=`` (cache bumped each time) on a large log:
+   an up-to-date poller and a full page from the start.
+4. Times ``PUT /api/profile`` with and without the change-log flush hook.
+
+Usage: python benchmarks/bench_changes.py [subscribers] [log rows]
+"""
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ["METRICS_ENABLED"] = "0"
+
+from common import asgi_get, engine, load_dataset, percentile, reset_database
+
+import orjson
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session
+
+import changes
+from cache import response_cache
+from changes import change_feed
+from main import app
+from models import Change
+from suite import rss_mb
+
+
+class Stream:
+    """An SSE request driven through the ASGI app, collecting its events"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.events = []
+        self.received = asyncio.Event()
+        self._disconnect = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        path, _, query = self.path.partition("?")
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+            "headers": [(b"host", b"bench"), (b"accept", b"text/event-stream")],
+            "client": ("127.0.0.1", 1), "server": ("bench", 80),
+        }
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await self._disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            body = message.get("body", b"")
+            for line in body.split(b"\n"):
+                if line.startswith(b"data: "):
+                    self.events.append(orjson.loads(line[6:]))
+                    self.received.set()
+
+        await app(scope, receive, send)
+
+    async def close(self):
+        self._disconnect.set()
+        await self.task
+
+
+async def idle_and_fanout(n: int):
+    gc.collect()
+    tracemalloc.start()
+    before_rss, before_heap = rss_mb()["rss_mb"], tracemalloc.get_traced_memory()[0]
+    streams = [Stream("/api/changes/stream") for _ in range(n)]
+    while len(change_feed.subscribers) < n:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.5)
+    heap = tracemalloc.get_traced_memory()[0] - before_heap
+    tracemalloc.stop()
+    rss = rss_mb()["rss_mb"] - before_rss
+    print(f"{n} idle subscribers: {heap / n / 1024:.1f} KB traced heap, {rss * 1024 / n:.1f} KB RSS each")
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.sleep(5)
+    print(f"idle for 5s: {(time.process_time() - cpu) * 1000:.1f} ms CPU "
+          f"({(time.process_time() - cpu) / (time.perf_counter() - wall) * 100:.2f}% of one core)")
+
+    latencies = []
+    for i in range(5):
+        for stream in streams:
+            stream.received.clear()
+        start = time.perf_counter()
+        status, _, _ = await asgi_put(f"/api/profile?bio=fan-out+{i}")
+        assert status == 200
+        await asyncio.gather(*(stream.received.wait() for stream in streams))
+        latencies.append((time.perf_counter() - start) * 1000)
+    missing = sum(1 for s in streams if len([e for e in s.events if e["entity"] == "profile"]) < 5)
+    print(f"PUT -> event at all {n} subscribers: p50 {percentile(latencies, 50):.1f} ms, "
+          f"max {max(latencies):.1f} ms, subscribers missing an event: {missing}")
+    await asyncio.gather(*(stream.close() for stream in streams))
+
+
+async def asgi_put(path: str):
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "PUT", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 2), "server": ("bench", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"], messages[0]["headers"], b"".join(m.get("body", b"") for m in messages[1:])
+
+
+def fill_log(rows: int):
+    now = changes._now()
+    with Session(engine) as session:
+        for start in range(0, rows, 10_000):
+            session.execute(insert(Change), [
+                {"profile_id": 1, "entity": "project", "entity_id": 1, "op": "update",
+                 "data": '{"title": "Project %d"}' % i, "created_at": now}
+                for i in range(start, min(start + 10_000, rows))
+            ])
+        session.commit()
+
+
+async def read_latency(rows: int):
+    fill_log(rows)
+    with Session(engine) as session:
+        latest = changes.latest_seq(session)
+    for label, path in [
+        ("poll, up to date", f"/api/changes?since={latest}"),
+        ("poll, 10 behind", f"/api/changes?since={latest - 10}"),
+        ("page of 500 from 0", "/api/changes?since=0&limit=500"),
+    ]:
+        timings = []
+        for _ in range(200):
+            response_cache.bump()
+            start = time.perf_counter()
+            status, _, _ = await asgi_get(app, path)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert status == 200
+        print(f"GET {label:<20} p50 {percentile(timings, 50):.2f} ms  p95 {percentile(timings, 95):.2f} ms")
+
+
+async def write_cost():
+    results = {}
+    for logged in (True, False):
+        if not logged:
+            event.remove(OrmSession, "after_flush", changes._record_changes)
+        timings = []
+        for i in range(300):
+            start = time.perf_counter()
+            await asgi_put(f"/api/profile?bio=write+{logged}+{i}")
+            timings.append((time.perf_counter() - start) * 1000)
+        results[logged] = percentile(timings, 50)
+    event.listen(OrmSession, "after_flush", changes._record_changes)
+    print(f"PUT /api/profile p50: {results[True]:.2f} ms logged, {results[False]:.2f} ms without the hook")
+
+
+async def main():
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    reset_database()
+    load_dataset(10, first_profile_projects=100)
+    await idle_and_fanout(subscribers)
+    await read_latency(rows)
+    await write_cost()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
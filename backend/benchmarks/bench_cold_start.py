@@ -0,0 +1,67 @@
+"""Cold start: time to import main and time from spawning uvicorn to its first response.
+
+Runs against a migrated database of synthetic profiles, once per STARTUP_MODE.
+
+Usage: python benchmarks/bench_cold_start.py [profiles] [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import BACKEND_DIR, load_dataset, reset_database
+
+import httpx
+
+from load import free_port
+
+IMPORT_MAIN = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def import_seconds(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_MAIN], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def first_response_seconds(env: dict) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health/live").status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    profiles = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    reset_database()
+    load_dataset(profiles)
+    env = dict(os.environ)
+
+    imports = [import_seconds(env) for _ in range(runs)]
+    print(f"import main: median {statistics.median(imports) * 1000:.0f} ms over {runs} runs")
+    print(f"{'STARTUP_MODE':<13} {'first response':>15} {'min':>8}")
+    for mode in ("migrate", "check", "skip"):
+        samples = [first_response_seconds({**env, "STARTUP_MODE": mode}) for _ in range(runs)]
+        print(f"{mode:<13} {statistics.median(samples) * 1000:>12.0f} ms {min(samples) * 1000:>5.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
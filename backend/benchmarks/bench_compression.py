@@ -0,0 +1,66 @@
+"""Bytes on the wire and CPU cost of response compression.
+
+For each payload: size and compression time for identity, gzip and Brotli,
+then server-side latency of a cached response served precompressed vs
+compressed on every request (response cache disabled).
+
+Usage: python benchmarks/bench_compression.py [projects] [profiles]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from common import asgi_get, load_dataset, reset_database
+
+from cache import response_cache
+from compression import ENCODINGS, compress
+from main import app
+
+PATHS = ["/api/profile", "/api/projects", "/api/export"]
+
+
+async def latency_us(path: str, headers: dict, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        await asgi_get(app, path, headers)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    profiles = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    reset_database()
+    load_dataset(profiles, first_profile_projects=projects)
+
+    print(f"{'path':<15} {'encoding':<9} {'bytes':>10} {'ratio':>7} {'compress ms':>12}")
+    for path in PATHS:
+        _, _, body = await asgi_get(app, path)
+        print(f"{path:<15} {'identity':<9} {len(body):>10,} {1:>7.2f} {0:>12.2f}")
+        for encoding in ENCODINGS:
+            samples = []
+            for _ in range(5):
+                start = time.perf_counter()
+                encoded = compress(body, encoding)
+                samples.append((time.perf_counter() - start) * 1000)
+            _, headers, wire = await asgi_get(app, path, {"accept-encoding": encoding})
+            assert headers.get("content-encoding") == encoding, headers
+            print(f"{path:<15} {encoding:<9} {len(wire):>10,} {len(body) / len(wire):>7.2f} {statistics.median(samples):>12.2f}")
+
+    print("\nper-request server time (us)")
+    print(f"{'path':<15} {'encoding':<9} {'cached':>10} {'uncached':>10}")
+    for path in PATHS[:2]:
+        for encoding in (None, *ENCODINGS):
+            headers = {"accept-encoding": encoding} if encoding else {}
+            response_cache.max_entries = 256
+            await asgi_get(app, path, headers)
+            cached = await latency_us(path, headers, 200)
+            response_cache.max_entries = 0
+            response_cache.bump()
+            uncached = await latency_us(path, headers, 20)
+            print(f"{path:<15} {encoding or 'identity':<9} {cached:>10.0f} {uncached:>10.0f}")
+    response_cache.max_entries = 256
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,171 @@
+"""Fuzzy search: recall on misspelled queries, and latency on a large corpus.
+
+1. Indexes N projects whose words follow a Zipf distribution over a few
+   thousand made-up words plus real technology names, and reports the size
+   of the trigram vocabulary.
+2. Misspells words from the corpus (a deleted, inserted, substituted or
+   swapped letter, or a word split in two) and reports how often the
+   intended word is among the terms tried, and how often the best hit
+   contains it, with and without ``fuzzy``.
+3. Latency of exact and fuzzy queries, and of the trigram lookup alone.
+4. Cost of a project insert with the vocabulary hook, and without it.
+
+Usage: python benchmarks/bench_fuzzy_search.py [rows] [misspelled queries]
+"""
+import random
+import string
+import sys
+import time
+
+from common import engine, percentile, reset_database, timed
+
+from sqlalchemy import insert, text
+from sqlmodel import Session
+
+import search_index
+from models import Profile, Project, Skill
+from search_index import (
+    fuzzy_search_hits, fuzzy_words, rebuild_search_index, search_hits, similar_words, tokens,
+)
+
+SYLLABLES = "ka lo mi ter son vel dra pin cor lex nu ba ri tho gen sa quo fi mar zen ul tra bo ne".split()
+TECHNOLOGIES = [
+    "Python", "FastAPI", "React", "TypeScript", "JavaScript", "PostgreSQL", "SQLite", "Docker", "Kubernetes",
+    "PyTorch", "TensorFlow", "OpenCV", "Django", "Flask", "GraphQL", "Elasticsearch", "Redis", "Terraform",
+]
+
+
+def vocabulary(size: int, rng: random.Random) -> list:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def load_corpus(rows: int, rng: random.Random):
+    reset_database()
+    words = vocabulary(5000, rng)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    with Session(engine) as session:
+        profile = Profile(name="Bench User", email="bench@example.com")
+        session.add(profile)
+        session.commit()
+        profile_id = profile.id
+        session.execute(insert(Skill), [{"name": t, "profile_id": profile_id} for t in TECHNOLOGIES])
+        for start in range(0, rows, 10_000):
+            session.execute(insert(Project), [
+                {
+                    "title": " ".join(rng.choices(words, weights, k=3)).title(),
+                    "description": " ".join(rng.choices(words, weights, k=20)),
+                    "technologies": ",".join(rng.sample(TECHNOLOGIES, 3)),
+                    "profile_id": profile_id,
+                }
+                for _ in range(start, min(start + 10_000, rows))
+            ])
+        session.commit()
+        start = time.perf_counter()
+        rebuild_search_index(session)
+        seconds = time.perf_counter() - start
+        size = session.connection().execute(text("SELECT count(*) FROM search_words")).scalar()
+    print(f"indexed {rows} projects in {seconds:.2f}s, {size} words in the trigram vocabulary")
+    return profile_id, words, weights
+
+
+def misspell(word: str, rng: random.Random) -> tuple:
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(["delete", "insert", "substitute", "swap", "split"])
+    if kind == "delete":
+        return kind, word[:i] + word[i + 1:]
+    if kind == "insert":
+        return kind, word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+    if kind == "substitute":
+        return kind, word[:i] + rng.choice(string.ascii_lowercase.replace(word[i], "")) + word[i + 1:]
+    if kind == "swap":
+        return kind, word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+    return kind, word[:i] + " " + word[i:]
+
+
+def best_hit_has(session: Session, hits: list, word: str) -> bool:
+    if not hits:
+        return False
+    title, body = session.connection().execute(
+        text("SELECT title, body FROM search_index WHERE kind = :kind AND ref_id = :ref_id"),
+        {"kind": hits[0]["type"], "ref_id": hits[0]["id"]},
+    ).one()
+    return word in tokens(f"{title} {body}")
+
+
+def recall(session: Session, profile_id: int, targets: list, rng: random.Random):
+    by_kind = {}
+    for word in targets:
+        kind, query = misspell(word, rng)
+        found = by_kind.setdefault(kind, {"queries": 0, "corrected": 0, "exact": 0, "fuzzy": 0})
+        found["queries"] += 1
+        found["corrected"] += any(word in w.terms for w in fuzzy_words(session.connection(), query))
+        found["exact"] += best_hit_has(session, search_hits(session, query, profile_id, limit=1)[1], word)
+        found["fuzzy"] += best_hit_has(session, fuzzy_search_hits(session, query, profile_id, limit=1)[1], word)
+    by_kind["all"] = {key: sum(f[key] for f in by_kind.values()) for key in ("queries", "corrected", "exact", "fuzzy")}
+    print(f"\n{'misspelling':<12} {'queries':>8} {'corrected':>10} {'exact top-1':>12} {'fuzzy top-1':>12}")
+    for kind, found in by_kind.items():
+        n = found["queries"]
+        print(f"{kind:<12} {n:>8} {found['corrected'] / n:>10.0%} {found['exact'] / n:>12.0%} {found['fuzzy'] / n:>12.0%}")
+
+
+def latency(session: Session, profile_id: int, words: list, rng: random.Random):
+    common, rare = words[:20], words[-2000:]
+    cases = [
+        ("exact, common word", search_hits, lambda: rng.choice(common)),
+        ("fuzzy, common word", fuzzy_search_hits, lambda: rng.choice(common)),
+        ("fuzzy, misspelled common", fuzzy_search_hits, lambda: misspell(rng.choice(common), rng)[1]),
+        ("fuzzy, misspelled rare", fuzzy_search_hits, lambda: misspell(rng.choice(rare), rng)[1]),
+        ("fuzzy, 3 misspelled words", fuzzy_search_hits,
+         lambda: " ".join(misspell(w, rng)[1] for w in rng.sample(words[:500], 3))),
+        ("fuzzy, pytorh", fuzzy_search_hits, lambda: "pytorh"),
+        ("fuzzy, tensor flow", fuzzy_search_hits, lambda: "tensor flow"),
+    ]
+    print(f"\n{'query':<28} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, find, make_query in cases:
+        timings = timed(lambda: find(session, make_query(), profile_id, limit=20), repeat=200)
+        print(f"{label:<28} {percentile(timings, 50):>8.2f} {percentile(timings, 95):>8.2f} "
+              f"{percentile(timings, 99):>8.2f}")
+    connection = session.connection()
+    timings = timed(lambda: similar_words(connection, misspell(rng.choice(words), rng)[1]), repeat=500)
+    print(f"{'trigram lookup, one word':<28} {percentile(timings, 50):>8.2f} {percentile(timings, 95):>8.2f} "
+          f"{percentile(timings, 99):>8.2f}")
+
+
+def write_cost(profile_id: int, words: list, rng: random.Random):
+    """Insert projects with and without ``add_words``, alternating so both see the same database"""
+    add_words = search_index.add_words
+    timings = {True: [], False: []}
+    for i in range(600):
+        with_words = i % 2 == 0
+        search_index.add_words = add_words if with_words else (lambda connection, new_words: None)
+        start = time.perf_counter()
+        with Session(engine) as session:
+            session.add(Project(
+                title=" ".join(rng.choices(words, k=3)), description=" ".join(rng.choices(words, k=20)),
+                technologies="Python", profile_id=profile_id,
+            ))
+            session.commit()
+        timings[with_words].append((time.perf_counter() - start) * 1000)
+    search_index.add_words = add_words
+    print(f"\nproject insert p50: {percentile(timings[True], 50):.2f} ms with the vocabulary hook, "
+          f"{percentile(timings[False], 50):.2f} ms without")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    rng = random.Random(42)
+    profile_id, words, weights = load_corpus(rows, rng)
+    targets = [w for w in rng.choices(words, weights, k=queries * 2) if len(w) >= 5][:queries]
+    targets += [t.lower() for t in TECHNOLOGIES if len(t) >= 5]
+    with Session(engine) as session:
+        recall(session, profile_id, targets, rng)
+        latency(session, profile_id, words, rng)
+    write_cost(profile_id, words, rng)
+
+
+if __name__ == "__main__":
+    main()
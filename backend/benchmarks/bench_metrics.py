@@ -0,0 +1,83 @@
+"""Overhead of the Prometheus instrumentation (MetricsMiddleware + SQL listeners).
+
+Requests are driven straight through the ASGI app, without an HTTP client, so
+the per-request cost of the instrumentation is not hidden by client overhead.
+
+Usage: python benchmarks/bench_metrics.py [requests]
+"""
+import asyncio
+import os
+import statistics
+import sys
+
+os.environ["METRICS_ENABLED"] = "0"  # main must not install the middleware itself
+
+from common import asgi_get, engine, make_profile, reset_database, read_engine
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+from cache import response_cache
+from main import app
+import metrics
+from metrics import MetricsMiddleware, instrument_engine
+
+ROUTES = [
+    ("/health", False),
+    ("/api/profile", False),  # served from the response cache
+    ("/api/projects?limit=20", True),  # cache bumped before every request, so it queries SQLite
+]
+
+
+async def call(asgi, path: str):
+    await asgi_get(asgi, path)
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def set_sql_listeners(enabled: bool):
+    for target in (engine, read_engine):
+        if enabled:
+            instrument_engine(target)
+        elif event.contains(target, "before_cursor_execute", metrics._before_cursor_execute):
+            event.remove(target, "before_cursor_execute", metrics._before_cursor_execute)
+            event.remove(target, "after_cursor_execute", metrics._after_cursor_execute)
+
+
+async def per_request_us(asgi, path: str, uncached: bool, n: int) -> float:
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(n):
+        if uncached:
+            response_cache.bump()
+        await call(asgi, path)
+    return (loop.time() - start) / n * 1e6
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    reset_database()
+    with Session(engine) as session:
+        make_profile(session, projects=100)
+
+    print(f"{'route':<26} {'plain':>10} {'instrumented':>13} {'overhead':>10}")
+    for path, uncached, target in [("(no-op ASGI app)", False, noop_app)] + [(p, u, app) for p, u in ROUTES]:
+        instrumented_app = MetricsMiddleware(target)
+        await call(target, path)
+        plain, instrumented = [], []
+        # Alternate rounds so drift (page cache, CPU frequency) hits both sides equally
+        for _ in range(7):
+            set_sql_listeners(False)
+            plain.append(await per_request_us(target, path, uncached, n))
+            set_sql_listeners(True)
+            instrumented.append(await per_request_us(instrumented_app, path, uncached, n))
+        plain, instrumented = statistics.median(plain), statistics.median(instrumented)
+        print(f"{path:<26} {plain:>7.1f} us {instrumented:>10.1f} us {instrumented - plain:>+7.1f} us "
+              f"({(instrumented - plain) / plain * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+"""Check that GET /api/profile runs a fixed number of SQL queries.
+
+Usage: python benchmarks/bench_profile_queries.py
+"""
+from common import count_queries, make_profile, reset_database, engine
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from main import app
+
+
+def main():
+    client = TestClient(app)
+    counts = {}
+    for projects in (1, 10, 500):
+        reset_database()
+        with Session(engine) as session:
+            make_profile(session, projects=projects)
+        with count_queries() as counter:
+            response = client.get("/api/profile")
+        assert response.status_code == 200
+        assert len(response.json()["projects"]) == projects
+        counts[projects] = counter["count"]
+        print(f"projects={projects:<5} queries={counter['count']}")
+
+    assert len(set(counts.values())) == 1, f"query count grows with project count: {counts}"
+    print("OK: query count is independent of project count")
+
+
+if __name__ == "__main__":
+    main()
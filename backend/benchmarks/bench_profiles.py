@@ -0,0 +1,79 @@
+"""Per-profile endpoint latency as the number of profiles in one database grows.
+
+Usage: python benchmarks/bench_profiles.py [max_profiles]
+"""
+import os
+import sys
+
+os.environ.setdefault("CACHE_MAX_ENTRIES", "0")
+
+from common import TECHNOLOGIES, engine, percentile, reset_database, timed  # noqa: E402
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from main import app  # noqa: E402
+from models import Profile, Project, ProjectTechnology, Skill  # noqa: E402
+from search_index import rebuild_search_index  # noqa: E402
+
+
+def add_profiles(session: Session, start: int, stop: int):
+    """Bulk-insert profiles ``start..stop`` with two skills and two projects each"""
+    session.execute(insert(Profile), [
+        {"id": i, "slug": f"user-{i}", "name": f"User {i}", "email": f"user{i}@example.com"}
+        for i in range(start, stop)
+    ])
+    session.execute(insert(Skill), [
+        {"name": TECHNOLOGIES[(i + k) % len(TECHNOLOGIES)], "profile_id": i}
+        for i in range(start, stop) for k in range(2)
+    ])
+    projects = [
+        {"id": i * 2 + k, "title": f"Project {i}-{k}", "description": "Synthetic project",
+         "technologies": TECHNOLOGIES[(i + k) % len(TECHNOLOGIES)], "profile_id": i}
+        for i in range(start, stop) for k in range(2)
+    ]
+    session.execute(insert(Project), projects)
+    session.execute(insert(ProjectTechnology), [
+        {"name": p["technologies"], "name_lower": p["technologies"].lower(), "project_id": p["id"]} for p in projects
+    ])
+    session.commit()
+
+
+def measure(client: TestClient, profiles: int) -> dict:
+    target = profiles // 2
+    paths = {
+        "profile by slug": f"/api/profiles/user-{target}",
+        "profile by id": f"/api/profiles/{target}",
+        "projects?skill": f"/api/profiles/{target}/projects?skill=python",
+        "skills/top": f"/api/profiles/{target}/skills/top",
+        "search": f"/api/profiles/{target}/search?q=project",
+        "list (deep cursor)": f"/api/profiles?limit=50&cursor={profiles - 100}",
+    }
+    return {name: percentile(timed(lambda: client.get(path), repeat=100), 50) for name, path in paths.items()}
+
+
+def main():
+    max_profiles = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    sizes = [n for n in (1_000, 10_000, 100_000) if n < max_profiles] + [max_profiles]
+    reset_database()
+    client = TestClient(app)
+    results = {}
+    with Session(engine) as session:
+        loaded = 1
+        for size in sizes:
+            for start in range(loaded, size + 1, 10_000):
+                add_profiles(session, start, min(start + 10_000, size + 1))
+            loaded = size + 1
+            rebuild_search_index(session)
+            assert session.scalar(select(func.count()).select_from(Profile)) == size
+            results[size] = measure(client, size)
+
+    names = list(next(iter(results.values())))
+    print(f"{'p50 ms':<20}" + "".join(f"{size:>12,}" for size in sizes))
+    for name in names:
+        print(f"{name:<20}" + "".join(f"{results[size][name]:>12.2f}" for size in sizes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Cost of the profiling hooks, and what they report for the hot read paths.
+
+1. Per-request overhead of ``ProfilingMiddleware`` (no token, no sampling),
+   with the SQL listeners attached, on a cached and an uncached route.
+2. Phase breakdown (median ms from ``Server-Timing``) of uncached
+   ``/api/profile``, ``/api/projects`` and ``/api/search`` requests.
+3. Time for a request profiled with ``X-Profile: cprofile`` / ``pyinstrument``.
+4. One slow-request log entry.
+
+Usage: python benchmarks/bench_profiling.py [projects of the first profile]
+"""
+import asyncio
+import logging
+import statistics
+import sys
+import time
+import os
+
+os.environ["METRICS_ENABLED"] = "0"
+
+from common import asgi_get, engine, load_dataset, read_engine, reset_database
+
+from cache import response_cache
+from main import app
+from profiling import PROFILERS, ProfilingMiddleware, trace_engine
+
+TOKEN = "bench-token"
+HEADERS = {"X-Debug-Token": TOKEN}
+ROUTES = ["/api/profile", "/api/projects?limit=100", "/api/search?q=python", "/api/search?q=python&format=legacy"]
+
+
+async def per_request_us(asgi, path: str, n: int, bump: bool) -> float:
+    total = 0.0
+    for _ in range(n):
+        if bump:
+            response_cache.bump()
+        start = time.perf_counter()
+        await asgi_get(asgi, path)
+        total += time.perf_counter() - start
+    return total / n * 1e6
+
+
+async def overhead():
+    traced = ProfilingMiddleware(app, token="", slow_ms=0, sample_rate=0)
+    print(f"{'route':<28} {'plain':>10} {'profiling':>10}")
+    for path, bump, n in [("/api/profile (cached)", False, 3000), ("/api/skills (uncached)", True, 1000)]:
+        route = path.split()[0]
+        await asgi_get(app, route)
+        rounds = {"plain": [], "traced": []}
+        for _ in range(5):
+            rounds["plain"].append(await per_request_us(app, route, n, bump))
+            rounds["traced"].append(await per_request_us(traced, route, n, bump))
+        plain, with_trace = statistics.median(rounds["plain"]), statistics.median(rounds["traced"])
+        print(f"{path:<28} {plain:>7.1f} us {with_trace - plain:>+7.1f} us")
+
+
+def parse_server_timing(header: str) -> dict:
+    phases = {}
+    for part in header.split(", "):
+        name, _, rest = part.partition(";dur=")
+        phases[name] = float(rest.split(";")[0])
+    return phases
+
+
+async def phases(rounds: int = 30):
+    traced = ProfilingMiddleware(app, token=TOKEN, slow_ms=0, sample_rate=0)
+    columns = ["total", "handler", "sql", "orm", "serialize", "json", "compress"]
+    print(f"\n{'route (uncached, median ms)':<38} " + " ".join(f"{c:>9}" for c in columns))
+    for path in ROUTES:
+        samples = []
+        for _ in range(rounds):
+            response_cache.bump()
+            _, headers, _ = await asgi_get(traced, path, HEADERS)
+            samples.append(parse_server_timing(headers["server-timing"]))
+        cells = " ".join(f"{statistics.median(s.get(c, 0.0) for s in samples):>9.2f}" for c in columns)
+        print(f"{path:<38} {cells}")
+
+
+async def captures():
+    traced = ProfilingMiddleware(app, token=TOKEN, slow_ms=0, sample_rate=0)
+    print()
+    for kind in PROFILERS:
+        timings = []
+        for _ in range(5):
+            response_cache.bump()
+            start = time.perf_counter()
+            status, headers, body = await asgi_get(traced, "/api/profile", {**HEADERS, "X-Profile": kind})
+            timings.append((time.perf_counter() - start) * 1000)
+            assert status == 200 and headers["x-profiled-status"] == "200"
+        print(f"/api/profile with X-Profile: {kind:<12} {statistics.median(timings):7.1f} ms, report {len(body)} bytes")
+
+
+async def slow_log():
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logging.getLogger("profiling").addHandler(handler)
+    traced = ProfilingMiddleware(app, token="", slow_ms=0.001, sample_rate=0)
+    response_cache.bump()
+    await asgi_get(traced, "/api/profile?include=skills,projects")
+    print("\nslow-request log entry:\n" + records[-1].getMessage())
+
+
+async def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    reset_database()
+    load_dataset(100, first_profile_projects=projects)
+    for traced_engine in {engine, read_engine}:
+        trace_engine(traced_engine)
+    await overhead()
+    await phases()
+    await captures()
+    await slow_log()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
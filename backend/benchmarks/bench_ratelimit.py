@@ -0,0 +1,106 @@
+"""Cost of RateLimitMiddleware, and what it buys a well-behaved client under abuse.
+
+1. Per-request overhead of a granted request, with the in-memory and the
+   SQLite bucket store, measured straight through the ASGI app.
+2. Against a uvicorn server, an abusive client process hammers ``/api/profile``
+   from many connections (response cache off, so every request runs a query)
+   while another client, connecting from 127.0.0.2 so it has an IP of its
+   own, reads ``/api/skills`` one request at a time. The victim's latency is
+   compared with no limiter, the token bucket, and the in-flight cap.
+
+Usage: python benchmarks/bench_ratelimit.py [abusive connections] [seconds]
+"""
+import asyncio
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ["METRICS_ENABLED"] = "0"
+
+from common import asgi_get, load_dataset, reset_database
+
+import httpx
+
+from load import drive, drive_async, uvicorn_server
+from main import app
+from ratelimit import Budget, MemoryBucketStore, RateLimitMiddleware, SQLiteBucketStore
+
+UNLIMITED = Budget(1e9, 1e9)
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def per_request_us(asgi, path: str, n: int) -> float:
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(n):
+        await asgi_get(asgi, path)
+    return (loop.time() - start) / n * 1e6
+
+
+async def overhead(n: int = 5000):
+    sqlite_path = os.path.join(tempfile.mkdtemp(prefix="me-api-ratelimit-"), "buckets.db")
+    stores = {"memory": MemoryBucketStore(), "sqlite": SQLiteBucketStore(sqlite_path)}
+    print(f"{'target':<22} {'plain':>9} " + " ".join(f"{name:>14}" for name in stores))
+    for label, target, path in [("(no-op ASGI app)", noop_app, "/api/search"), ("/api/profile (cached)", app, "/api/profile")]:
+        limited = {
+            name: RateLimitMiddleware(target, app.routes, budgets={"/api/search": UNLIMITED, "/api/profile": UNLIMITED},
+                                      store=store, enabled=True)
+            for name, store in stores.items()
+        }
+        await asgi_get(target, path)
+        rounds = {"plain": []} | {name: [] for name in stores}
+        for _ in range(5):
+            rounds["plain"].append(await per_request_us(target, path, n))
+            for name, wrapped in limited.items():
+                rounds[name].append(await per_request_us(wrapped, path, n))
+        plain = statistics.median(rounds["plain"])
+        cells = " ".join(f"{statistics.median(rounds[name]) - plain:>+11.1f} us" for name in stores)
+        print(f"{label:<22} {plain:>6.1f} us {cells}")
+
+
+def _abuser(args) -> dict:
+    base_url, connections, duration = args
+    return drive(base_url, ["/api/profile"], connections, duration)
+
+
+def abuse(env: dict, connections: int, duration: float) -> tuple:
+    with uvicorn_server({"DATABASE_URL": os.environ["DATABASE_URL"], "STARTUP_MODE": "check", "METRICS_ENABLED": "0",
+                         "CACHE_MAX_ENTRIES": "0", **env}) as base_url:
+        victim = httpx.AsyncHTTPTransport(local_address="127.0.0.2")
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            abuser = pool.map_async(_abuser, [(base_url, connections, duration)])
+            time.sleep(0.5)  # let the abuser ramp up
+            victim_result = asyncio.run(drive_async(base_url, ["/api/skills"], 1, duration - 1.0, victim))
+            return abuser.get()[0], victim_result
+
+
+def main():
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    reset_database()
+    load_dataset(200, first_profile_projects=2000)
+    asyncio.run(overhead())
+
+    scenarios = [
+        ("no limiter", {}),
+        ("token bucket 2/s", {"RATE_LIMIT_ENABLED": "1", "RATE_LIMITS": "/api/profile=2/4"}),
+        ("in-flight cap 8", {"MAX_IN_FLIGHT": "8"}),
+    ]
+    print(f"\n{connections} abusive connections on /api/profile vs 1 client on /api/skills, {duration:.0f}s, cache off")
+    print(f"{'limiter':<20} {'abuser rps':>11} {'refused':>8} {'victim rps':>11} {'victim p50':>11} {'victim p99':>11} {'refused':>8}")
+    for label, env in scenarios:
+        abuser, victim = abuse(env, connections, duration)
+        print(f"{label:<20} {abuser['rps']:>11.1f} {abuser['errors']:>8} {victim['rps']:>11.1f} "
+              f"{victim['p50_ms']:>8.2f} ms {victim['p99_ms']:>8.2f} ms {victim['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare the FTS5 search index with the old in-Python substring scan.
+
+Usage: python benchmarks/bench_search.py [rows]
+"""
+import random
+import sys
+import time
+
+from common import TECHNOLOGIES, engine, percentile, reset_database, timed
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from models import Profile, Project, Skill
+from search_index import rebuild_search_index, search_hits
+
+WORDS = (
+    "api service dashboard model pipeline realtime scalable secure mobile web cloud data "
+    "vision language stream cache index graph queue worker async batch report analytics"
+).split()
+QUERIES = ["python", "dashboard", "realtime pipeline", "tensorflow vision", "zzz-no-match"]
+
+
+def load_corpus(rows: int) -> int:
+    reset_database()
+    rng = random.Random(42)
+    with Session(engine) as session:
+        profile = Profile(name="Bench User", email="bench@example.com")
+        session.add(profile)
+        session.commit()
+        profile_id = profile.id
+        session.execute(insert(Skill), [{"name": t, "profile_id": profile_id} for t in TECHNOLOGIES])
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "title": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}",
+                "description": " ".join(rng.choice(WORDS) for _ in range(20)),
+                "technologies": ",".join(rng.sample(TECHNOLOGIES, 3)),
+                "profile_id": profile_id,
+            })
+            if len(batch) == 10_000:
+                session.execute(insert(Project), batch)
+                batch = []
+        if batch:
+            session.execute(insert(Project), batch)
+        session.commit()
+        start = time.perf_counter()
+        rebuild_search_index(session)
+        print(f"indexed {rows} projects in {time.perf_counter() - start:.2f}s")
+    return profile_id
+
+
+def scan_search(session: Session, q: str):
+    """The pre-FTS implementation: substring match over every row in Python"""
+    query_lower = q.lower()
+    projects = [
+        p.id for p in session.exec(select(Project))
+        if query_lower in p.title.lower()
+        or query_lower in p.description.lower()
+        or query_lower in p.technologies.lower()
+    ]
+    skills = [s.id for s in session.exec(select(Skill)) if query_lower in s.name.lower()]
+    return projects, skills
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    profile_id = load_corpus(rows)
+    print(f"{'query':<20} {'scan p50 ms':>12} {'fts p50 ms':>12} {'fts p99 ms':>12} {'fts total':>10}")
+    with Session(engine) as session:
+        for q in QUERIES:
+            scan = timed(lambda: (scan_search(session, q), session.expunge_all()), repeat=3)
+            fts = timed(lambda: search_hits(session, q, profile_id, limit=20), repeat=50)
+            total, _ = search_hits(session, q, profile_id, limit=20)
+            print(f"{q:<20} {percentile(scan, 50):>12.1f} {percentile(fts, 50):>12.2f} "
+                  f"{percentile(fts, 99):>12.2f} {total:>10}")
+
+
+if __name__ == "__main__":
+    main()
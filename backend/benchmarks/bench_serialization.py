@@ -0,0 +1,47 @@
+"""Serialization cost per endpoint: jsonable_encoder + stdlib json vs orjson.
+
+Payloads are fetched once through the app, then re-encoded in a loop.
+
+Usage: python benchmarks/bench_serialization.py [projects]
+"""
+import json
+import sys
+
+from common import engine, make_profile, percentile, reset_database, timed
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from main import app
+
+ENDPOINTS = ["/api/profile", "/api/projects", "/api/projects?skill=python", "/api/skills/top", "/api/search?q=python"]
+
+
+def stdlib_render(payload) -> bytes:
+    """What FastAPI did before: jsonable_encoder, then JSONResponse's json.dumps"""
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    reset_database()
+    with Session(engine) as session:
+        make_profile(session, projects=projects)
+
+    client = TestClient(app)
+    print(f"{'endpoint':<30} {'bytes':>9} {'stdlib us':>10} {'orjson us':>10} {'speedup':>8}")
+    for path in ENDPOINTS:
+        payload = client.get(path).json()
+        size = len(orjson.dumps(payload))
+        before = percentile(timed(lambda: stdlib_render(payload), repeat=200), 50) * 1000
+        after = percentile(timed(lambda: orjson.dumps(payload), repeat=200), 50) * 1000
+        print(f"{path:<30} {size:>9} {before:>10.1f} {after:>10.1f} {before / after:>7.1f}x")
+    print("cached responses reuse the rendered bytes, so a cache hit skips serialization entirely")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Top-skills ranking: materialized skill_stats read vs aggregating over projects.
+
+Also reports what the incremental maintenance adds to a project insert.
+
+Usage: python benchmarks/bench_skill_stats.py [projects ...]
+"""
+import statistics
+import sys
+
+from common import count_queries, engine, make_profile, percentile, reset_database, timed
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session
+
+from cache import response_cache
+from main import app
+from models import Project
+import skill_stats
+
+from fastapi.testclient import TestClient
+
+# What /api/skills/top would have to run without the materialized table
+AGGREGATE = text("""
+SELECT s.id, s.name, count(p.id) AS score, max(p.id) AS last_project_id
+FROM skill s
+LEFT JOIN project p ON p.profile_id = s.profile_id AND EXISTS (
+    SELECT 1 FROM projecttechnology pt WHERE pt.project_id = p.id AND pt.name_lower = lower(s.name)
+)
+WHERE s.profile_id = :profile_id
+GROUP BY s.id
+ORDER BY score DESC, last_project_id DESC, s.id DESC
+LIMIT 10
+""")
+
+
+def uncached_get(client, url):
+    def call():
+        response_cache.bump()
+        assert client.get(url).status_code == 200
+    return call
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [100, 1000, 10000]
+    client = TestClient(app)
+    print(f"{'projects':>8} {'endpoint p50':>13} {'p95':>8} {'queries':>8} {'aggregate p50':>14} {'insert +stats':>14} {'insert base':>12}")
+    for n in sizes:
+        reset_database()
+        with Session(engine) as session:
+            profile_id = make_profile(session, projects=n, links_per_project=0)
+        url = f"/api/profiles/{profile_id}/skills/top?limit=10"
+
+        endpoint = timed(uncached_get(client, url), repeat=50)
+        with count_queries() as queries:
+            uncached_get(client, url)()
+        with engine.connect() as conn:
+            aggregate = timed(lambda: conn.execute(AGGREGATE, {"profile_id": profile_id}).all(), repeat=20)
+
+        def insert_project():
+            with Session(engine) as session:
+                session.add(Project(title="New", description="d", technologies="Python, Docker, Git", profile_id=profile_id))
+                session.commit()
+
+        with_stats = timed(insert_project, repeat=50)
+        # The same insert with the stats hook detached approximates the old write cost
+        event.remove(OrmSession, "before_flush", skill_stats._collect_skill_stat_changes)
+        try:
+            without_stats = timed(insert_project, repeat=50)
+        finally:
+            event.listen(OrmSession, "before_flush", skill_stats._collect_skill_stat_changes)
+
+        print(f"{n:>8} {statistics.median(endpoint):>10.2f} ms {percentile(endpoint, 95):>5.2f} ms {queries['count']:>8} "
+              f"{statistics.median(aggregate):>11.2f} ms {statistics.median(with_stats):>11.2f} ms {statistics.median(without_stats):>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
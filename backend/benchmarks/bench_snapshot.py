@@ -0,0 +1,143 @@
+"""Snapshot mode against the ORM path: agreement, latency, memory and refresh lag.
+
+1. Loads the snapshot and reports build time and traced memory per profile,
+   next to the same profiles loaded as ORM objects with ``profile_query``.
+2. Requests every GET route both ways and reports responses that differ.
+   Search is compared on its hit order and scores, since snippets are cut by
+   the snapshot's own window rule rather than FTS5's.
+3. Times each route both ways with the response cache bumped before every
+   request, so each one is built from scratch.
+4. Times a ``PUT /api/profile`` until a GET shows the new value.
+
+Usage: python benchmarks/bench_snapshot.py [profiles] [projects of the first profile]
+"""
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ["METRICS_ENABLED"] = "0"
+
+from common import asgi_get, load_dataset, percentile, read_engine, reset_database
+
+import orjson
+from sqlmodel import Session
+
+import main
+from bench_changes import asgi_put
+from cache import response_cache
+from main import app
+from serializers import profile_query
+from snapshot import build_snapshot, snapshot_store
+
+ROUTES = [
+    "/api/profiles?limit=500",
+    "/api/profile",
+    "/api/profile?include=projects&fields=id,title",
+    "/api/profiles/2",
+    "/api/projects",
+    "/api/projects?skill=python&limit=50",
+    "/api/projects?limit=50&cursor=100",
+    "/api/skills",
+    "/api/work",
+    "/api/education",
+    "/api/skills/top",
+    "/api/skills/top?min_score=200&limit=3",
+    "/api/search?q=python",
+    "/api/search?q=pro+fast&type=project&limit=50",
+    "/api/search?q=comp&offset=5",
+    "/api/search?q=python&format=legacy",
+]
+
+
+def traced(fn):
+    """(result, traced bytes still allocated after fn) with a clean heap"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, size
+
+
+def memory(profiles: int):
+    start = time.perf_counter()
+    snapshot, snapshot_bytes = traced(build_snapshot)
+    seconds = time.perf_counter() - start
+    session = Session(read_engine)
+    _, orm_bytes = traced(lambda: session.exec(profile_query()).all())
+    session.close()
+    print(f"snapshot of {profiles} profiles built in {seconds:.2f}s")
+    print(f"memory per profile: snapshot {snapshot_bytes / profiles / 1024:.1f} KB, "
+          f"ORM identity map {orm_bytes / profiles / 1024:.1f} KB")
+    return snapshot
+
+
+async def get(path: str, snapshot_mode: bool) -> tuple:
+    main.SNAPSHOT_MODE = snapshot_mode
+    response_cache.bump()
+    start = time.perf_counter()
+    status, _, body = await asgi_get(app, path)
+    return status, body, (time.perf_counter() - start) * 1000
+
+
+def comparable(path: str, payload):
+    if "/search" in path and "hits" in payload:
+        return [(h["type"], h["id"], h["title"], h["score"]) for h in payload["hits"]], payload["total"]
+    return payload
+
+
+async def agreement():
+    differences = 0
+    for path in ROUTES:
+        orm = await get(path, False)
+        snap = await get(path, True)
+        if orm[0] != snap[0] or comparable(path, orjson.loads(orm[1])) != comparable(path, orjson.loads(snap[1])):
+            differences += 1
+            print(f"  differs: {path}")
+    print(f"{len(ROUTES) - differences}/{len(ROUTES)} routes answer the same from the snapshot")
+
+
+async def latency(rounds: int = 100):
+    print(f"\n{'route':<48} {'ORM p50':>10} {'snapshot p50':>13} {'speedup':>8}")
+    for path in ROUTES:
+        timings = {False: [], True: []}
+        for _ in range(rounds):
+            for mode in timings:
+                timings[mode].append((await get(path, mode))[2])
+        orm, snap = percentile(timings[False], 50), percentile(timings[True], 50)
+        print(f"{path:<48} {orm:>7.2f} ms {snap:>10.2f} ms {orm / snap:>7.1f}x")
+
+
+async def refresh_lag(writes: int = 20):
+    main.SNAPSHOT_MODE = True
+    lags = []
+    for i in range(writes):
+        bio = f"lag-{i}"
+        start = time.perf_counter()
+        await asgi_put(f"/api/profile?bio={bio}")
+        while orjson.loads((await asgi_get(app, "/api/profile?include=skills"))[2])["bio"] != bio:
+            await asyncio.sleep(0.0005)
+        lags.append((time.perf_counter() - start) * 1000)
+    print(f"\nPUT -> visible in the snapshot: p50 {percentile(lags, 50):.1f} ms, max {max(lags):.1f} ms "
+          f"({snapshot_store.refreshes} incremental refreshes)")
+
+
+async def main_async(profiles: int):
+    memory(profiles)
+    snapshot_store.start()
+    await agreement()
+    await latency()
+    await refresh_lag()
+
+
+if __name__ == "__main__":
+    profiles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    first_profile_projects = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    reset_database()
+    load_dataset(profiles, first_profile_projects=first_profile_projects)
+    asyncio.run(main_async(profiles))
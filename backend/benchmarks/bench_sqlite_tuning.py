@@ -0,0 +1,49 @@
+"""Mixed read/write load against SQLite defaults vs the tuned engine (WAL + read pool).
+
+One request in ten is a PUT /api/profile; the response cache is disabled.
+
+Usage: python benchmarks/bench_sqlite_tuning.py [clients] [seconds]
+"""
+import sys
+
+from common import engine, make_profile, reset_database
+
+from sqlmodel import Session
+
+from load import drive, uvicorn_server
+
+READS = ["/api/profile", "/api/projects?skill=python", "/api/skills/top", "/api/search?q=python"]
+PATHS = [*READS, *READS, "/api/profile", "PUT /api/profile?bio=updated"]
+
+CONFIGS = {
+    "defaults": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_BUSY_TIMEOUT_MS": "0",
+        "SQLITE_CACHE_SIZE_KB": "2000",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_TEMP_STORE": "DEFAULT",
+        "DB_READ_POOL_SIZE": "0",
+    },
+    "tuned": {},
+}
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+
+    print(f"{'config':<10} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, env in CONFIGS.items():
+        reset_database()
+        with Session(engine) as session:
+            make_profile(session, projects=50)
+        engine.dispose()
+        with uvicorn_server({**env, "CACHE_MAX_ENTRIES": "0"}) as base_url:
+            drive(base_url, PATHS, clients=clients, duration=2)  # warm up
+            result = drive(base_url, PATHS, clients=clients, duration=duration)
+        print(f"{name:<10} {result['rps']:>8} {result['p50_ms']:>8} {result['p99_ms']:>8} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
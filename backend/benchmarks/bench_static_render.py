@@ -0,0 +1,149 @@
+"""Static renders: regenerating 10k profiles, and what a write costs afterwards.
+
+1. Full render of N profiles (``manage.py render --full`` on an empty
+   directory) with 0 (inline), 1, 2 and 4 pool workers, and the files and
+   bytes it leaves on disk.
+2. The same render forced again over unchanged data, where every file is
+   hard-linked from the previous version instead of written and compressed.
+3. Incremental run after a single profile update.
+4. Resume: a full render is killed partway, and the next run only renders
+   the profiles it had not reached.
+5. Serving ``projects.json`` through ``StaticRenderApp`` vs the API route.
+
+Usage: python benchmarks/bench_static_render.py [profiles] [workers, e.g. 0,1,2,4]
+"""
+import asyncio
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ["METRICS_ENABLED"] = "0"
+
+from common import asgi_get, engine, load_dataset, reset_database
+
+from sqlmodel import Session, select
+
+from cache import response_cache
+from main import app
+from models import Profile
+from static_render import StaticRenderApp, render_pending
+
+
+def disk_usage(root: str) -> tuple:
+    """``(files, bytes on disk)``; a hard-linked file is only counted once"""
+    files, inodes = 0, {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            stat = os.lstat(os.path.join(directory, name))
+            files += 1
+            inodes[stat.st_ino] = stat.st_size
+    return files, sum(inodes.values())
+
+
+def timed_render(root: str, **kwargs) -> tuple:
+    start = time.perf_counter()
+    result = render_pending(root, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def full_renders(profiles: int, worker_counts: list) -> str:
+    print(f"{'full render':<24} {'seconds':>8} {'profiles/s':>11} {'responses':>10} {'files':>8} {'MB':>8}")
+    root = None
+    for workers in worker_counts:
+        if root:
+            shutil.rmtree(root)
+        root = tempfile.mkdtemp(prefix="me-api-static-")
+        seconds, result = timed_render(root, workers=workers)
+        files, size = disk_usage(root)
+        label = "inline" if workers == 0 else f"{workers} worker{'s' * (workers > 1)}"
+        print(f"{label:<24} {seconds:>8.2f} {profiles / seconds:>11.0f} {result['changed']:>10} "
+              f"{files:>8} {size / 1e6:>8.1f}")
+    return root
+
+
+def forced_render(root: str, profiles: int, workers: int):
+    _, size = disk_usage(root)
+    seconds, result = timed_render(root, workers=workers, full=True)
+    _, after_size = disk_usage(root)
+    print(f"\nforced full render, nothing changed: {seconds:.2f}s ({profiles / seconds:.0f} profiles/s), "
+          f"{result['changed']} responses written, {size / 1e6:.1f} MB on disk before, {after_size / 1e6:.1f} MB after")
+
+
+def incremental(root: str, workers: int):
+    with Session(engine) as session:
+        profile = session.exec(select(Profile).order_by(Profile.id.desc()).limit(1)).one()
+        profile.bio = f"Updated at {time.time()}"
+        session.add(profile)
+        session.commit()
+    seconds, result = timed_render(root, workers=workers)
+    print(f"\nincremental run after one update: {seconds * 1000:.1f} ms, "
+          f"{result['profiles']} profile, {result['changed']} responses changed")
+    seconds, result = timed_render(root, workers=workers)
+    print(f"run with nothing to do: {seconds * 1000:.1f} ms, {result['profiles']} profiles")
+
+
+def resume(profiles: int, workers: int):
+    """Kill an inline full render once half the profiles are done, then run again"""
+    root = tempfile.mkdtemp(prefix="me-api-static-")
+    process = multiprocessing.get_context("spawn").Process(target=render_pending, args=(root, 0))
+    process.start()
+    by_id = os.path.join(root, "by-id")
+    while not os.path.isdir(by_id) or len(os.listdir(by_id)) < profiles // 2:
+        time.sleep(0.01)
+    process.kill()
+    process.join()
+    done = len(os.listdir(by_id))
+    seconds, result = timed_render(root, workers=workers)
+    print(f"\nrender killed after {done} of {profiles} profiles, resumed: {seconds:.2f}s, "
+          f"{result['profiles']} profiles rendered")
+    shutil.rmtree(root)
+
+
+async def serving(root: str, rounds: int = 2000):
+    static = StaticRenderApp(root)
+    with Session(engine) as session:
+        slug = session.exec(select(Profile.slug).order_by(Profile.id).limit(1)).one()
+    headers = {"Accept-Encoding": "br, gzip"}
+    cases = [
+        ("API, cached", app, f"/api/profiles/{slug}/projects", False),
+        ("API, uncached", app, f"/api/profiles/{slug}/projects", True),
+        ("StaticRenderApp", static, f"/profiles/{slug}/current/projects.json", False),
+    ]
+    _, api_headers, _ = await asgi_get(app, cases[0][2], headers)
+    _, static_headers, _ = await asgi_get(static, cases[2][2], headers)
+    print(f"\nETag from the API: {api_headers['etag']}, from the static file: {static_headers['etag']}")
+    print(f"{'serving projects.json':<24} {'p50 us':>8}")
+    for label, asgi, path, bump in cases:
+        timings = []
+        for _ in range(rounds):
+            if bump:
+                response_cache.bump()
+            start = time.perf_counter()
+            status, _, _ = await asgi_get(asgi, path, headers)
+            timings.append((time.perf_counter() - start) * 1e6)
+            assert status == 200
+        print(f"{label:<24} {statistics.median(timings):>8.1f}")
+
+
+def main():
+    profiles = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    worker_counts = [int(w) for w in sys.argv[2].split(",")] if len(sys.argv) > 2 else [0, 1, 2, 4]
+    reset_database()
+    start = time.perf_counter()
+    load_dataset(profiles)
+    print(f"loaded {profiles} profiles in {time.perf_counter() - start:.1f}s, {os.cpu_count()} CPUs\n")
+    root = full_renders(profiles, worker_counts)
+    workers = worker_counts[-1]
+    forced_render(root, profiles, workers)
+    incremental(root, workers)
+    resume(profiles, workers)
+    asyncio.run(serving(root))
+    shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Throughput of ``uvicorn --workers N`` for N = 1..cores, and cross-worker cache coherence.
+
+Each worker process has its own response cache. A write made through one
+worker must invalidate the others, which they notice through
+``database.data_version``. The coherence check warms every worker's cache,
+writes through one of them, and then counts reads that still return the old
+value. The scaling run drives the same read mix against 1..N workers, using
+several load-generator processes so the client is not the bottleneck.
+
+    python benchmarks/bench_workers.py [max_workers] [seconds]
+"""
+import multiprocessing
+import os
+import sys
+import time
+
+from common import load_dataset, reset_database
+
+import httpx
+
+from cache import ResponseCache
+from database import data_version
+from load import drive, uvicorn_process
+
+READS = ["/api/profile", "/api/projects?limit=50", "/api/skills/top", "/api/skills", "/api/work"]
+
+
+def _drive(args) -> dict:
+    base_url, clients, duration = args
+    return drive(base_url, READS, clients, duration)
+
+
+def drive_processes(base_url: str, processes: int, clients: int, duration: float) -> dict:
+    """Run ``drive`` in ``processes`` client processes and add up their results"""
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        results = pool.map(_drive, [(base_url, max(clients // processes, 1), duration)] * processes)
+    return {
+        "requests": sum(r["requests"] for r in results),
+        "errors": sum(r["errors"] for r in results),
+        "rps": round(sum(r["rps"] for r in results), 1),
+        "p50_ms": max(r["p50_ms"] for r in results),
+        "p99_ms": max(r["p99_ms"] for r in results),
+    }
+
+
+def stale_reads(base_url: str, rounds: int = 20, reads: int = 40) -> tuple:
+    """(stale, total) GET /api/profile responses after PUTs made through some worker"""
+    stale = total = 0
+    for i in range(rounds):
+        for _ in range(reads):  # warm every worker's cache with the current bio
+            httpx.get(f"{base_url}/api/profile")
+        bio = f"revision {i}"
+        httpx.put(f"{base_url}/api/profile", params={"bio": bio}).raise_for_status()
+        for _ in range(reads):
+            # A fresh connection each time, so the reads spread over the workers
+            total += 1
+            stale += httpx.get(f"{base_url}/api/profile").json()["bio"] != bio
+    return stale, total
+
+
+def lookup_overhead(n: int = 200_000) -> tuple:
+    """Seconds per cache lookup with and without the data_version check"""
+    timings = []
+    for source in (None, data_version):
+        cache = ResponseCache()
+        if source is not None:
+            cache.watch(source)
+        cache.set("key", b"value", cache.refresh())
+        start = time.perf_counter()
+        for _ in range(n):
+            cache.refresh()
+            cache.get("key")
+        timings.append((time.perf_counter() - start) / n)
+    return tuple(timings)
+
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    clients, client_processes = 64, max(min(os.cpu_count(), 4), 2)
+
+    reset_database()
+    load_dataset(200, first_profile_projects=500)
+    plain, watched = lookup_overhead()
+    print(f"cache lookup: {plain * 1e6:.2f} µs, with data_version check {watched * 1e6:.2f} µs")
+
+    env = {"DATABASE_URL": os.environ["DATABASE_URL"], "STARTUP_MODE": "check", "METRICS_ENABLED": "0"}
+    with uvicorn_process(env, ["--workers", "2"]) as (base_url, _):
+        time.sleep(1.0)  # let the second worker finish booting
+        stale, total = stale_reads(base_url)
+        print(f"coherence (2 workers): {stale} stale of {total} reads after writes")
+    with uvicorn_process({**env, "CACHE_COHERENCE": "0"}, ["--workers", "2"]) as (base_url, _):
+        time.sleep(1.0)
+        stale, total = stale_reads(base_url)
+        print(f"coherence off (2 workers): {stale} stale of {total} reads after writes")
+
+    print(f"\n{os.cpu_count()} cpus, {client_processes} client processes x {clients // client_processes} connections, "
+          f"{duration:.0f}s per run")
+    for cache_entries in ("256", "0"):
+        print(f"\nCACHE_MAX_ENTRIES={cache_entries}")
+        print(f"{'workers':>7} {'rps':>9} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        baseline = None
+        for workers in range(1, max_workers + 1):
+            with uvicorn_process({**env, "CACHE_MAX_ENTRIES": cache_entries}, ["--workers", str(workers)]) as (base_url, _):
+                time.sleep(0.5 * workers)
+                drive(base_url, READS, 8, 1.0)  # warm up
+                result = drive_processes(base_url, client_processes, clients, duration)
+            baseline = baseline or result["rps"]
+            print(f"{workers:>7} {result['rps']:>9.1f} {result['rps'] / baseline:>7.2f}x {result['p50_ms']:>8.2f} "
+                  f"{result['p99_ms']:>8.2f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
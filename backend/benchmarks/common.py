@@ -0,0 +1,196 @@
+"""Shared helpers for the benchmark scripts.
+
+Every script points ``DATABASE_URL`` at a throwaway SQLite file *before*
+importing the app modules, so benchmarks never touch ``database.db``.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+_tmpdir = tempfile.mkdtemp(prefix="me-api-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from database import engine, read_engine, create_db_and_tables  # noqa: E402
+from models import Profile, Skill, Project, Education, WorkExperience, Link, ProjectLink  # noqa: E402
+
+
+TECHNOLOGIES = [
+    "Python", "FastAPI", "React", "TypeScript", "SQLite", "Docker", "PyTorch",
+    "TensorFlow", "OpenCV", "NLP", "Django", "Flask", "Java", "C/C++", "Git",
+]
+
+
+def make_profile(session: Session, projects: int = 100, links_per_project: int = 2, name: str = "Bench User"):
+    """Insert one synthetic profile with ``projects`` projects and return its id"""
+    profile = Profile(name=name, email="bench@example.com", bio="Synthetic profile", location="Nowhere")
+    session.add(profile)
+    session.flush()
+
+    for tech in TECHNOLOGIES:
+        session.add(Skill(name=tech, profile_id=profile.id))
+    for i in range(3):
+        session.add(Education(
+            institution=f"University {i}", degree="BSc", field_of_study="Computer Science",
+            start_date="2018-01", end_date="2022-01", profile_id=profile.id,
+        ))
+        session.add(WorkExperience(
+            company=f"Company {i}", position="Engineer", description="Built things with Python",
+            start_date="2022-01", end_date=None, profile_id=profile.id,
+        ))
+    session.add(Link(platform="github", url="https://github.com/example", profile_id=profile.id))
+
+    for i in range(projects):
+        techs = ",".join(TECHNOLOGIES[(i + k) % len(TECHNOLOGIES)] for k in range(3))
+        project = Project(
+            title=f"Project {i}",
+            description=f"Synthetic project number {i} built with {techs}",
+            technologies=techs,
+            profile_id=profile.id,
+        )
+        session.add(project)
+        session.flush()
+        for k in range(links_per_project):
+            session.add(ProjectLink(platform="github", url=f"https://example.com/{i}/{k}", project_id=project.id))
+
+    session.commit()
+    return profile.id
+
+
+def synthetic_record(i: int, projects: int = 10, links_per_project: int = 2, skills: int = 5) -> dict:
+    """One profile in the NDJSON import format (see bulk.parse_record)"""
+    return {
+        "name": f"User {i}",
+        "email": f"user{i}@example.com",
+        "bio": "Synthetic profile",
+        "location": "Nowhere",
+        "skills": [{"name": TECHNOLOGIES[(i + k) % len(TECHNOLOGIES)]} for k in range(skills)],
+        "projects": [
+            {
+                "title": f"Project {i}-{k}",
+                "description": "Synthetic project used by the benchmarks",
+                "technologies": [TECHNOLOGIES[(i + k + t) % len(TECHNOLOGIES)] for t in range(3)],
+                "links": [{"platform": "github", "url": f"https://example.com/{i}/{k}/{n}"} for n in range(links_per_project)],
+            }
+            for k in range(projects)
+        ],
+        "education": [
+            {"institution": "University", "degree": "BSc", "field_of_study": "CS", "start_date": "2018-01", "end_date": "2022-01"}
+            for _ in range(2)
+        ],
+        "work": [
+            {"company": "Company", "position": "Engineer", "description": "Built things", "start_date": "2022-01", "end_date": None}
+            for _ in range(2)
+        ],
+        "links": [{"platform": "github", "url": f"https://github.com/user{i}"} for _ in range(2)],
+    }
+
+
+def load_dataset(profiles: int, projects: int = 10, links_per_project: int = 2, first_profile_projects: int = None,
+                 batch_size: int = 500) -> dict:
+    """Import a synthetic dataset through bulk.import_batch and return its row counts.
+
+    The first profile, which the unscoped ``/api/...`` routes serve, can be
+    given a different number of projects than the rest.
+    """
+    from bulk import import_batch, parse_record
+
+    counts = {"profiles": 0, "rows": 0}
+    batch = []
+    for i in range(profiles):
+        n = first_profile_projects if i == 0 and first_profile_projects is not None else projects
+        batch.append(parse_record(synthetic_record(i, projects=n, links_per_project=links_per_project)))
+        if len(batch) >= batch_size or i == profiles - 1:
+            with Session(engine) as session:
+                result = import_batch(session, batch)
+            counts["profiles"] += result["profiles"]
+            counts["rows"] += result["rows"]
+            batch = []
+    return counts
+
+
+def reset_database():
+    """Drop and recreate every table in the benchmark database"""
+    from sqlmodel import SQLModel
+    from cache import response_cache
+    SQLModel.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS schema_migrations")
+    create_db_and_tables()
+    response_cache.bump()
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements executed on the write and read engines inside the block"""
+    counter = {"count": 0}
+    engines = {engine, read_engine}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["count"] += 1
+
+    for target in engines:
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+
+async def asgi_get(asgi, path: str, headers: dict = None) -> tuple:
+    """GET ``path`` straight through an ASGI app, without an HTTP client.
+
+    Returns the status, the response headers and the raw (still encoded) body.
+    """
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"bench")] + [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    response = {"status": None, "headers": {}, "body": []}
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:  # the client never disconnects; StreamingResponse waits here
+            await asyncio.Event().wait()
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {k.decode().lower(): v.decode() for k, v in message["headers"]}
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    await asgi(scope, receive, send)
+    return response["status"], response["headers"], b"".join(response["body"])
+
+
+def timed(fn, repeat: int = 50):
+    """Run ``fn`` ``repeat`` times and return per-call latencies in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,109 @@
+"""Tiny concurrent HTTP load generator shared by the server benchmarks."""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import httpx
+
+from common import BACKEND_DIR, percentile
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def uvicorn_process(env: dict = None, args: list = None):
+    """Run ``uvicorn main:app`` in a subprocess and yield its base URL and process"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning", *(args or [])],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {})},
+        stderr=subprocess.DEVNULL,  # failed requests are counted as errors instead
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if httpx.get(f"{base_url}/health").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline or process.poll() is not None:
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.1)
+        yield base_url, process
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextmanager
+def uvicorn_server(env: dict = None, args: list = None):
+    """Run ``uvicorn main:app`` in a subprocess and yield its base URL"""
+    with uvicorn_process(env, args) as (base_url, _):
+        yield base_url
+
+
+def _request_args(entry) -> tuple:
+    if isinstance(entry, tuple):
+        return entry
+    method, _, path = entry.rpartition(" ")
+    return method or "GET", path, None
+
+
+async def drive_async(base_url: str, paths: list, clients: int, duration: float, transport=None) -> dict:
+    latencies, errors = [], 0
+    requests = [_request_args(entry) for entry in paths]
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30, transport=transport) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def worker(offset: int):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < stop_at:
+                method, path, body = requests[i % len(requests)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    if isinstance(body, dict):
+                        response = await client.request(method, path, json=body)
+                    else:
+                        response = await client.request(method, path, content=body)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def drive(base_url: str, paths: list, clients: int = 200, duration: float = 10.0, transport=None) -> dict:
+    """Hit ``paths`` round-robin from ``clients`` concurrent connections for ``duration`` seconds.
+
+    Entries are plain paths (GET), ``"METHOD /path"`` or ``(method, path, body)``
+    where ``body`` is raw bytes or a dict sent as JSON.
+    Pass an ``httpx.ASGITransport`` as ``transport`` to drive an app in-process.
+    """
+    return asyncio.run(drive_async(base_url, paths, clients, duration, transport))
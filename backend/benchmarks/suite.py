@@ -0,0 +1,240 @@
+"""Load test for every route: in-process (ASGI) and against a real uvicorn server.
+
+Builds a synthetic dataset and drives each route with concurrent clients for a
+fixed duration. For each route it records RPS, p50/p95/p99 latency, errors,
+SQL statements per request and memory. Results are written as JSON, so runs on
+different commits can be compared:
+
+    python benchmarks/suite.py --profiles 1000 --first-profile-projects 2000 --output before.json
+    git checkout <other commit>
+    python benchmarks/suite.py --profiles 1000 --first-profile-projects 2000 --output after.json --compare before.json
+
+The suite fails if a route in main.py has no entry in ``routes()``, so new
+endpoints cannot go unmeasured.
+"""
+import argparse
+import asyncio
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from common import BACKEND_DIR, count_queries, load_dataset, reset_database
+
+import httpx
+import orjson
+from fastapi.routing import APIRoute
+from prometheus_client.parser import text_string_to_metric_families
+
+from cache import response_cache
+from load import drive_async, uvicorn_process
+from main import app
+
+# (method, path template) pairs deliberately not measured
+SKIPPED_ROUTES = {
+    # Never-ending SSE streams; benchmarks/bench_changes.py measures them
+    ("GET", "/api/changes/stream"),
+    ("GET", "/api/profiles/{profile_ref}/changes/stream"),
+}
+
+
+def routes(profile_slug: str, project_id: int) -> list:
+    """(route template, method, path, body) for every route in main.py"""
+    scoped = f"/api/profiles/{profile_slug}"
+    import_line = orjson.dumps({"name": "Load Test", "email": "load@example.com", "skills": ["Python"]}) + b"\n"
+    batch = {"operations": [
+        {"op": "update", "type": "project", "id": project_id, "data": {"description": "Updated by the load test"}},
+    ]}
+    return [
+        ("/health", "GET", "/health", None),
+        ("/health/live", "GET", "/health/live", None),
+        ("/health/ready", "GET", "/health/ready", None),
+        ("/metrics", "GET", "/metrics", None),
+        ("/api/cache/stats", "GET", "/api/cache/stats", None),
+        ("/api/profiles", "GET", "/api/profiles?limit=50", None),
+        ("/api/profiles/{profile_ref}", "GET", scoped, None),
+        ("/api/profile", "GET", "/api/profile", None),
+        ("/api/profiles/{profile_ref}", "PUT", f"{scoped}?bio=Load+test", None),
+        ("/api/profile", "PUT", "/api/profile?location=Benchmark", None),
+        ("/api/profiles/{profile_ref}/projects", "GET", f"{scoped}/projects?limit=50", None),
+        ("/api/projects", "GET", "/api/projects?limit=50", None),
+        ("/api/projects", "GET", "/api/projects?skill=python&limit=50", None),
+        ("/api/skills", "GET", "/api/skills", None),
+        ("/api/profiles/{profile_ref}/skills", "GET", f"{scoped}/skills", None),
+        ("/api/work", "GET", "/api/work", None),
+        ("/api/profiles/{profile_ref}/work", "GET", f"{scoped}/work", None),
+        ("/api/education", "GET", "/api/education", None),
+        ("/api/profiles/{profile_ref}/education", "GET", f"{scoped}/education", None),
+        ("/api/skills/top", "GET", "/api/skills/top", None),
+        ("/api/profiles/{profile_ref}/skills/top", "GET", f"{scoped}/skills/top", None),
+        ("/api/search", "GET", "/api/search?q=python", None),
+        ("/api/search", "GET", "/api/search?q=pythn+fastap&fuzzy=true", None),
+        ("/api/profiles/{profile_ref}/search", "GET", f"{scoped}/search?q=python", None),
+        ("/api/changes", "GET", "/api/changes?since=0&limit=50", None),
+        ("/api/profiles/{profile_ref}/changes", "GET", f"{scoped}/changes?since=0&limit=50", None),
+        ("/api/batch", "PATCH", "/api/batch", batch),
+        ("/api/import", "POST", "/api/import", import_line),
+        ("/api/export", "GET", "/api/export", None),
+    ]
+
+
+def check_coverage(entries: list):
+    covered = {(method, template) for template, method, _, _ in entries}
+    missing = [
+        (method, route.path)
+        for route in app.routes if isinstance(route, APIRoute)
+        for method in route.methods
+        if (method, route.path) not in covered and (method, route.path) not in SKIPPED_ROUTES
+    ]
+    if missing:
+        raise SystemExit(f"routes without a benchmark entry: {sorted(missing)}")
+
+
+def rss_mb(pid: str = "self") -> dict:
+    """Current and peak resident memory of a process (Linux /proc, else this process's peak)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return {"rss_mb": int(fields["VmRSS"].split()[0]) / 1024, "peak_rss_mb": int(fields["VmHWM"].split()[0]) / 1024}
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"rss_mb": None, "peak_rss_mb": peak / (1024 * 1024 if sys.platform == "darwin" else 1024)}
+
+
+def scrape_statements(base_url: str) -> dict:
+    """{(method, route): statement count} from the server's /metrics"""
+    text = httpx.get(f"{base_url}/metrics").text
+    totals = {}
+    for family in text_string_to_metric_families(text):
+        if family.name == "db_statements_per_request":
+            for sample in family.samples:
+                if sample.name.endswith("_sum"):
+                    totals[(sample.labels["method"], sample.labels["route"])] = sample.value
+    return totals
+
+
+async def run_inprocess(entries: list, clients: int, duration: float) -> list:
+    # Unhandled exceptions become 500s and count as errors, as they would behind uvicorn
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    results = []
+    for template, method, path, body in entries:
+        request = [(method, path, body)]
+        await drive_async("http://bench", request, clients, min(duration, 1.0), transport)  # warm up
+        with count_queries() as queries:
+            result = await drive_async("http://bench", request, clients, duration, transport)
+        results.append({
+            "mode": "inprocess", "route": template, "method": method, "path": path, **result,
+            "sql_per_request": round(queries["count"] / max(result["requests"], 1), 2),
+            **rss_mb(),
+        })
+        print_row(results[-1])
+    return results
+
+
+def run_server(entries: list, clients: int, duration: float, env: dict) -> list:
+    results = []
+    with uvicorn_process({**env, "METRICS_ENABLED": "1"}) as (base_url, process):
+        for template, method, path, body in entries:
+            request = [(method, path, body)]
+            asyncio.run(drive_async(base_url, request, clients, min(duration, 1.0)))  # warm up
+            before = scrape_statements(base_url).get((method, template), 0)
+            result = asyncio.run(drive_async(base_url, request, clients, duration))
+            after = scrape_statements(base_url).get((method, template), 0)
+            results.append({
+                "mode": "server", "route": template, "method": method, "path": path, **result,
+                "sql_per_request": round((after - before) / max(result["requests"], 1), 2),
+                **rss_mb(str(process.pid)),
+            })
+            print_row(results[-1])
+    return results
+
+
+def print_row(r: dict):
+    print(f"{r['mode']:<9} {r['method']:<5} {r['path'][:48]:<48} {r['rps']:>9.1f} {r['p50_ms']:>8.2f} "
+          f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['errors']:>6} {r['sql_per_request']:>6.2f} {r['peak_rss_mb']:>8.1f}")
+
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path, "rb") as f:
+        baseline = {(r["mode"], r["method"], r["path"]): r for r in orjson.loads(f.read())["results"]}
+    print(f"\nvs {baseline_path}")
+    print(f"{'mode':<9} {'route':<54} {'rps':>9} {'p95':>9} {'sql/req':>9}")
+    for r in results:
+        old = baseline.get((r["mode"], r["method"], r["path"]))
+        if old is None:
+            continue
+        rps = (r["rps"] - old["rps"]) / old["rps"] * 100 if old["rps"] else 0.0
+        p95 = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0.0
+        print(f"{r['mode']:<9} {r['method'] + ' ' + r['path'][:48]:<54} {rps:>+8.1f}% {p95:>+8.1f}% "
+              f"{r['sql_per_request'] - old['sql_per_request']:>+9.2f}")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--profiles", type=int, default=100)
+    parser.add_argument("--projects", type=int, default=10, help="projects per profile")
+    parser.add_argument("--first-profile-projects", type=int, default=1000,
+                        help="projects of the first profile, which the unscoped /api/... routes serve")
+    parser.add_argument("--links", type=int, default=2, help="links per project")
+    parser.add_argument("--mode", choices=["inprocess", "server", "both"], default="both")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per route")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response cache")
+    parser.add_argument("--routes", help="only run routes whose path contains this string")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to diff against")
+    args = parser.parse_args()
+
+    reset_database()
+    start = time.perf_counter()
+    dataset = load_dataset(args.profiles, args.projects, args.links, args.first_profile_projects)
+    print(f"dataset: {dataset['profiles']:,} profiles, {dataset['rows']:,} rows in {time.perf_counter() - start:.1f}s")
+
+    entries = routes("user-0", project_id=1)
+    check_coverage(entries)
+    if args.routes:
+        entries = [e for e in entries if args.routes in e[2]]
+
+    if args.no_cache:
+        response_cache.max_entries = 0
+    print(f"{'mode':<9} {'verb':<5} {'path':<48} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6} "
+          f"{'sql/req':>6} {'peak MB':>8}")
+    results = []
+    if args.mode in ("inprocess", "both"):
+        results += asyncio.run(run_inprocess(entries, args.clients, args.duration))
+    if args.mode in ("server", "both"):
+        env = {"DATABASE_URL": os.environ["DATABASE_URL"], "CACHE_MAX_ENTRIES": "0" if args.no_cache else os.getenv("CACHE_MAX_ENTRIES", "256")}
+        results += run_server(entries, args.clients, args.duration, env)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "dataset": dataset,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+        print(f"wrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
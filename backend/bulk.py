@@ -0,0 +1,263 @@
+"""Bulk NDJSON import/export of profiles with their nested collections.
+
+One line per profile, in the same shape as ``GET /api/profile``::
+
+    {"name": "...", "email": "...", "skills": [{"name": "Python"}],
+     "projects": [{"title": "...", "description": "...", "technologies": ["Python"],
+                   "links": [{"platform": "github", "url": "..."}]}],
+     "education": [...], "work": [...], "links": [...]}
+
+Imports insert each batch of profiles with one executemany per table and a
+single commit; exports stream profiles in id order, one batch at a time.
+
+Usage:
+    python bulk.py import profiles.ndjson [--batch-size 1000]
+    python bulk.py export profiles.ndjson
+"""
+import argparse
+import sys
+import time
+from typing import AsyncIterator, Iterable, Iterator, List
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from cache import response_cache
+from changes import record_imports
+from database import engine, read_engine, create_db_and_tables
+from models import (
+    Profile, Skill, Project, Education, WorkExperience, Link, ProjectLink, ProjectTechnology,
+    check_slug, claim_slugs, slugify, split_technologies,
+)
+from schemas import EducationIn, LinkIn, ProfileIn, ProjectIn, SkillIn, WorkIn
+from search_index import add_documents, education_document, project_document, skill_document, work_document
+from skill_stats import rebuild_skill_stats
+from serializers import profile_query, serialize_profile
+
+IMPORT_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+
+def _validate(schema, data, location: tuple = ()) -> dict:
+    """``data`` checked against ``schema``; errors name the field, e.g. ``projects[0].links[1].url``"""
+    try:
+        return schema.model_validate(data).model_dump()
+    except ValidationError as exc:
+        error = exc.errors()[0]
+        path = "".join(f"[{part}]" if isinstance(part, int) else f".{part}" for part in (*location, *error["loc"]))
+        raise ValueError(f"{path.lstrip('.')}: {error['msg']}") from None
+
+
+def _entries(schema, data: dict, key: str, normalize=None) -> List[dict]:
+    """Validate the nested ``key`` entries of a record against ``schema``, after ``normalize`` if given"""
+    entries = data.get(key) or []
+    if not isinstance(entries, list):
+        raise ValueError(f"'{key}' must be a list")
+    return [_validate(schema, normalize(e) if normalize else e, (key, i)) for i, e in enumerate(entries)]
+
+
+def _skill(entry):
+    return {"name": entry} if isinstance(entry, str) else entry
+
+
+def _project(entry):
+    # technologies may also be one comma-separated string
+    if isinstance(entry, dict) and isinstance(entry.get("technologies"), str):
+        return {**entry, "technologies": split_technologies(entry["technologies"])}
+    return entry
+
+
+def parse_record(data: dict) -> dict:
+    """Validate one decoded line and normalize it for insertion"""
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    for key in ("name", "email"):
+        if not isinstance(data.get(key), str) or not data[key]:
+            raise ValueError(f"'{key}' is required")
+    profile = _validate(ProfileIn, data)
+    projects = [
+        {
+            "title": p["title"],
+            "description": p["description"],
+            "technologies": ",".join(p["technologies"] or []),
+            "links": p["links"] or [],
+        }
+        for p in _entries(ProjectIn, data, "projects", _project)
+    ]
+    return {
+        **profile,
+        "slug": check_slug(profile["slug"]) if profile["slug"] else slugify(profile["name"]),
+        "skills": [s["name"] for s in _entries(SkillIn, data, "skills", _skill)],
+        "projects": projects,
+        "education": _entries(EducationIn, data, "education"),
+        "work": _entries(WorkIn, data, "work"),
+        "links": _entries(LinkIn, data, "links"),
+    }
+
+
+def _insert_returning_ids(session: Session, model, rows: List[dict]) -> List[int]:
+    if not rows:
+        return []
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return list(session.execute(statement, rows).scalars())
+
+
+def import_batch(session: Session, records: List[dict]) -> dict:
+    """Insert parsed records in one transaction with one executemany per table"""
+    slugs = claim_slugs(session, [r["slug"] for r in records])
+    profiles = [
+        {"slug": slug, "name": r["name"], "email": r["email"], "bio": r["bio"], "location": r["location"]}
+        for r, slug in zip(records, slugs)
+    ]
+    profile_ids = _insert_returning_ids(session, Profile, profiles)
+
+    skills, projects, education, work, links = [], [], [], [], []
+    for profile_id, r in zip(profile_ids, records):
+        skills += [{"name": name, "profile_id": profile_id} for name in r["skills"]]
+        projects += [{**p, "profile_id": profile_id} for p in r["projects"]]
+        education += [{**e, "profile_id": profile_id} for e in r["education"]]
+        work += [{**w, "profile_id": profile_id} for w in r["work"]]
+        links += [{**l, "profile_id": profile_id} for l in r["links"]]
+
+    skill_ids = _insert_returning_ids(session, Skill, skills)
+    project_ids = _insert_returning_ids(session, Project, [
+        {k: p[k] for k in ("title", "description", "technologies", "profile_id")} for p in projects
+    ])
+    education_ids = _insert_returning_ids(session, Education, education)
+    work_ids = _insert_returning_ids(session, WorkExperience, work)
+
+    project_links, technologies = [], []
+    for project_id, p in zip(project_ids, projects):
+        project_links += [{**l, "project_id": project_id} for l in p["links"]]
+        technologies += [
+            {"name": name, "name_lower": name.lower(), "project_id": project_id}
+            for name in split_technologies(p["technologies"])
+        ]
+    for model, rows in ((Link, links), (ProjectLink, project_links), (ProjectTechnology, technologies)):
+        if rows:
+            session.execute(insert(model), rows)
+
+    add_documents(session.connection(), [
+        *(skill_document(i, s["profile_id"], s["name"]) for i, s in zip(skill_ids, skills)),
+        *(project_document(i, p["profile_id"], p["title"], p["description"], p["technologies"])
+          for i, p in zip(project_ids, projects)),
+        *(education_document(i, e["profile_id"], e["institution"], e["degree"], e["field_of_study"])
+          for i, e in zip(education_ids, education)),
+        *(work_document(i, w["profile_id"], w["company"], w["position"], w["description"])
+          for i, w in zip(work_ids, work)),
+    ])
+    rebuild_skill_stats(session.connection(), profile_ids=profile_ids)
+    record_imports(session, [{"id": i, **p} for i, p in zip(profile_ids, profiles)])
+    session.commit()
+    response_cache.bump()
+
+    return {
+        "profiles": len(profile_ids),
+        "rows": len(profile_ids) + len(skills) + len(projects) + len(education) + len(work)
+                + len(links) + len(project_links) + len(technologies),
+    }
+
+
+class ImportReport:
+    """Running totals for an import, including the first few rejected lines"""
+
+    def __init__(self):
+        self.profiles = 0
+        self.rows = 0
+        self.errors: List[dict] = []
+        self.error_count = 0
+
+    def add(self, counts: dict):
+        self.profiles += counts["profiles"]
+        self.rows += counts["rows"]
+
+    def parse(self, line_number: int, line: bytes):
+        """Decode one NDJSON line; blank and invalid lines return ``None``"""
+        if not line.strip():
+            return None
+        try:
+            return parse_record(orjson.loads(line))
+        except (ValueError, KeyError, TypeError, AttributeError) as exc:
+            self.error_count += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append({"line": line_number, "error": str(exc) or type(exc).__name__})
+            return None
+
+    def as_dict(self) -> dict:
+        return {"profiles": self.profiles, "rows": self.rows, "error_count": self.error_count, "errors": self.errors}
+
+
+async def aiter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a stream of byte chunks into lines"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def import_ndjson(lines: Iterable[bytes], batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Import an NDJSON stream, committing every ``batch_size`` profiles"""
+    report = ImportReport()
+    batch = []
+    with Session(engine) as session:
+        for line_number, line in enumerate(lines, start=1):
+            record = report.parse(line_number, line)
+            if record is not None:
+                batch.append(record)
+            if len(batch) >= batch_size:
+                report.add(import_batch(session, batch))
+                batch = []
+        if batch:
+            report.add(import_batch(session, batch))
+    return report.as_dict()
+
+
+def export_ndjson(batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Yield every profile as one NDJSON line, loading ``batch_size`` profiles at a time"""
+    cursor = 0
+    with Session(read_engine) as session:
+        while True:
+            profiles = session.exec(
+                profile_query().where(Profile.id > cursor).order_by(Profile.id).limit(batch_size)
+            ).all()
+            if not profiles:
+                return
+            yield b"".join(orjson.dumps(serialize_profile(p)) + b"\n" for p in profiles)
+            cursor = profiles[-1].id
+            session.expunge_all()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk NDJSON import/export of profiles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="load profiles from an NDJSON file ('-' for stdin)")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    export_parser = commands.add_parser("export", help="write every profile to an NDJSON file ('-' for stdout)")
+    export_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    create_db_and_tables()
+    start = time.perf_counter()
+    if args.command == "import":
+        stream = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+        with stream:
+            report = import_ndjson(stream, batch_size=args.batch_size)
+        print(orjson.dumps({**report, "seconds": round(time.perf_counter() - start, 2)}).decode(), file=sys.stderr)
+    else:
+        stream = sys.stdout.buffer if args.path == "-" else open(args.path, "wb")
+        with stream:
+            for chunk in export_ndjson():
+                stream.write(chunk)
+        print(f"exported in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from compression import COMPRESSION_MIN_BYTES, ENCODINGS, compress, negotiate
+from profiling import span
+
+CACHE_CONTROL = os.getenv("CACHE_CONTROL", "public, max-age=0, must-revalidate")
+
+
+class ResponseCache:
+    """Size-bounded LRU cache with per-entry TTL and version-based invalidation.
+
+    Every write path calls ``bump()``; entries built under an older version are
+    treated as misses, so the cache never serves data from before a write.
+    Writes made by other processes are picked up through ``watch()``.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.external_invalidations = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._source: Optional[Callable[[], int]] = None
+        self._source_version: Optional[int] = None
+
+    def watch(self, source: Callable[[], int]):
+        """Invalidate whenever ``source()`` changes, e.g. ``database.data_version``.
+
+        ``source`` is called once per lookup, so it has to be cheap; it lets
+        several worker processes share one database without serving each
+        other's stale entries.
+        """
+        self._source = source
+        self._source_version = None
+
+    def refresh(self) -> int:
+        """Apply writes committed elsewhere, then return the current version"""
+        if self._source is not None:
+            seen = self._source()
+            if seen != self._source_version:
+                with self._lock:
+                    if seen != self._source_version:
+                        if self._source_version is not None:
+                            self.external_invalidations += 1
+                        self._source_version = seen
+                        self.version += 1
+                        self._entries.clear()
+        return self.version
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value for ``key`` or ``None``"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, expires_at, value = entry
+                if version == self.version and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, version: int) -> Any:
+        """Store ``value`` unless the data changed since ``version`` was read"""
+        with self._lock:
+            if version != self.version or self.max_entries <= 0:
+                return value
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def bump(self):
+        """Invalidate every entry; call after any write to the database"""
+        # Read the source first: a commit it already reflects is covered by
+        # this bump, a later one will change it again
+        seen = self._source() if self._source is not None else None
+        with self._lock:
+            self._source_version = seen
+            self.version += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "external_invalidations": self.external_invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def cache_key(request: Request) -> tuple:
+    """Cache key made of the path plus sorted, non-empty query parameters"""
+    params = tuple(sorted((k, v) for k, v in request.query_params.multi_items() if v != ""))
+    return (request.url.path, params)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, the app's default response class"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+class RenderedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    encoded: Dict[str, bytes]  # compressed variants, filled on first request for each encoding
+
+    def variant(self, encoding: Optional[str]) -> Tuple[bytes, str]:
+        """Body and ETag for ``encoding``, compressing at most once per entry"""
+        if encoding is None:
+            return self.body, self.etag
+        body = self.encoded.get(encoding)
+        if body is None:
+            body = self.encoded[encoding] = compress(self.body, encoding)
+        # A strong ETag must differ between content codings of the same resource
+        return body, f'{self.etag[:-1]}-{encoding}"'
+
+
+def render(payload: Any) -> RenderedResponse:
+    """Serialize ``payload`` once and derive a strong ETag from the bytes"""
+    body = orjson.dumps(payload)
+    return RenderedResponse(body, '"%s"' % hashlib.sha256(body).hexdigest()[:32], {})
+
+
+def _strip_encoding(tag: str) -> str:
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match header covers ``etag``, in any content coding"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return "*" in candidates or any(_strip_encoding(tag.removeprefix("W/")) == etag for tag in candidates)
+
+
+async def cached_json_response(request: Request, build: Callable[[], Awaitable[Any]]) -> Response:
+    """Serve the payload awaited from ``build()`` through the response cache.
+
+    Cache hits never touch the database, and compressed variants are kept on
+    the cache entry. Conditional requests whose ``If-None-Match`` matches get
+    an empty 304.
+    """
+    key = cache_key(request)
+    version = response_cache.refresh()
+    rendered = response_cache.get(key)
+    if rendered is None:
+        with span("handler"):
+            payload = await build()
+        with span("json"):
+            rendered = render(payload)
+        rendered = response_cache.set(key, rendered, version)
+    encoding = None
+    if len(rendered.body) >= COMPRESSION_MIN_BYTES:
+        encoding = negotiate(request.headers.get("accept-encoding"))
+    with span("compress"):
+        body, etag = rendered.variant(encoding)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(request, rendered.etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "256")),
+    ttl=float(os.getenv("CACHE_TTL_SECONDS", "60")),
+)
@@ -0,0 +1,290 @@
+"""Append-only change log (the ``changes`` table) and its live feed.
+
+Every flush that creates, updates or deletes a profile or one of its rows
+appends one ``Change`` per row in the same transaction, so the log commits
+(or rolls back) together with the data. A row moved to another profile is
+logged under both profiles. ``seq`` follows commit order because
+SQLite has a single writer. Clients read the log with
+``GET /api/changes?since=<seq>`` or follow it over Server-Sent Events.
+
+``ChangeFeed`` serves the SSE subscribers of one worker. A single poller task
+reads new log rows and hands each encoded event to every subscriber's queue,
+so an idle subscriber costs a coroutine and a queue, never a query. The poller
+is woken when this process commits. Commits from other workers are noticed by
+``database.data_version``, which it checks every ``CHANGE_POLL_SECONDS``.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from functools import partial
+from typing import List, Optional, Set
+
+import orjson
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, func, select
+
+from database import data_version, run_db
+from models import Change, Education, Link, Profile, Project, ProjectLink, Skill, WorkExperience
+
+CHANGE_POLL_SECONDS = float(os.getenv("CHANGE_POLL_SECONDS", "0.5"))
+CHANGE_KEEPALIVE_SECONDS = float(os.getenv("CHANGE_KEEPALIVE_SECONDS", "15"))
+CHANGE_QUEUE_SIZE = int(os.getenv("CHANGE_QUEUE_SIZE", "1000"))
+CHANGE_READ_BATCH = 500
+
+# Logged models and their entity names (the type names of /api/batch)
+ENTITIES = {
+    Profile: "profile",
+    Skill: "skill",
+    Project: "project",
+    ProjectLink: "project_link",
+    Education: "education",
+    WorkExperience: "work",
+    Link: "link",
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+def _columns(obj, only_changed: bool = False) -> dict:
+    state = inspect(obj)
+    values = {}
+    for attr in state.mapper.column_attrs:
+        if only_changed:
+            added = state.attrs[attr.key].history.added
+            if added:
+                values[attr.key] = added[0]
+        else:
+            values[attr.key] = getattr(obj, attr.key)
+    return values
+
+
+def _values(obj, key: str) -> list:
+    """The current value of ``key``, then the one this flush replaced, if any"""
+    return [getattr(obj, key), *inspect(obj).attrs[key].history.deleted]
+
+
+def _profile_ids(session, obj, projects: dict) -> List[Optional[int]]:
+    """Profiles a write to ``obj`` concerns: its own, and the one it left if it moved.
+
+    ``projects`` holds this flush's projects by id. A project deleted in the
+    flush can no longer be loaded, but the links deleted with it still belong
+    to its profile.
+    """
+    if isinstance(obj, Profile):
+        return [obj.id]
+    if isinstance(obj, ProjectLink):
+        owners = []
+        for project_id in _values(obj, "project_id"):
+            project = projects.get(project_id)
+            if project is None and project_id is not None:
+                project = session.get(Project, project_id)
+            owners.append(project.profile_id if project is not None else None)
+    else:
+        owners = _values(obj, "profile_id")
+    owners = list(dict.fromkeys(owners))
+    return [owner for owner in owners if owner is not None] or [None]
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _record_changes(session, flush_context):
+    """Append a change row for every logged object this flush wrote, under each profile it concerns"""
+    rows = []
+    now = _now()
+    projects = {
+        obj.id: obj for objects in (session.new, session.dirty, session.deleted)
+        for obj in objects if isinstance(obj, Project)
+    }
+    for op, objects in (("create", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            entity = ENTITIES.get(type(obj))
+            if entity is None:
+                continue
+            data = None
+            if op == "create":
+                data = _columns(obj)
+            elif op == "update":
+                data = _columns(obj, only_changed=True)
+                if not data:  # only relationships changed
+                    continue
+            data = orjson.dumps(data, default=str).decode() if data is not None else None
+            rows += [
+                {"profile_id": profile_id, "entity": entity, "entity_id": obj.id, "op": op, "data": data, "created_at": now}
+                for profile_id in _profile_ids(session, obj, projects)
+            ]
+    if rows:
+        session.connection().execute(insert(Change), rows)
+        session.info["changes_recorded"] = True
+
+
+def record_imports(session: Session, profiles: List[dict]):
+    """Log profiles inserted with Core statements, which bypass the flush hook.
+
+    One ``import`` change per profile carries the profile's own columns;
+    clients fetch the profile to get its projects, skills and so on.
+    """
+    now = _now()
+    session.execute(insert(Change), [
+        {"profile_id": p["id"], "entity": "profile", "entity_id": p["id"], "op": "import",
+         "data": orjson.dumps(p).decode(), "created_at": now}
+        for p in profiles
+    ])
+    session.info["changes_recorded"] = True
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _wake_feed(session):
+    if session.info.pop("changes_recorded", False):
+        change_feed.wake()
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _forget_changes(session):
+    session.info.pop("changes_recorded", None)
+
+
+def read_changes(session: Session, since: int, limit: int, profile_id: Optional[int] = None) -> List[Change]:
+    query = select(Change).where(Change.seq > since)
+    if profile_id is not None:
+        query = query.where(Change.profile_id == profile_id)
+    return list(session.exec(query.order_by(Change.seq).limit(limit)))
+
+
+def latest_seq(session: Session) -> int:
+    return session.exec(select(func.max(Change.seq))).one() or 0
+
+
+def serialize_change(change: Change) -> dict:
+    return {
+        "seq": change.seq,
+        "profile_id": change.profile_id,
+        "entity": change.entity,
+        "id": change.entity_id,
+        "op": change.op,
+        "data": orjson.loads(change.data) if change.data is not None else None,
+        "at": change.created_at,
+    }
+
+
+def sse_event(change: Change) -> bytes:
+    return b"id: %d\nevent: change\ndata: %s\n\n" % (change.seq, orjson.dumps(serialize_change(change)))
+
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+class Subscriber:
+    __slots__ = ("profile_id", "queue")
+
+    def __init__(self, profile_id: int, queue_size: int):
+        self.profile_id = profile_id
+        # (seq, encoded event), or None once the subscriber fell too far behind
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+
+class ChangeFeed:
+    """Fans new change-log rows out to the SSE subscribers of this worker"""
+
+    def __init__(self, poll_seconds: float = CHANGE_POLL_SECONDS, queue_size: int = CHANGE_QUEUE_SIZE):
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        self.subscribers: Set[Subscriber] = set()
+        self.last_seq = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def subscribe(self, profile_id: int) -> Subscriber:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop, self._wakeup = loop, asyncio.Event()
+            self.subscribers = set()
+            self._task = loop.create_task(self._poll())
+        subscriber = Subscriber(profile_id, self.queue_size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def wake(self):
+        """Tell the poller new changes were committed; safe to call from any thread"""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    async def _poll(self):
+        seen_version = data_version() if data_version is not None else None
+        self.last_seq = await run_db(latest_seq, read_only=True)
+        while self.subscribers:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            woken = self._wakeup.is_set()
+            self._wakeup.clear()
+            if data_version is not None:
+                version = data_version()
+                if not woken and version == seen_version:
+                    continue  # nothing committed anywhere since the last read
+                seen_version = version
+            await self._publish()
+
+    async def _publish(self):
+        while True:
+            changes = await run_db(partial(read_changes, since=self.last_seq, limit=CHANGE_READ_BATCH), read_only=True)
+            for change in changes:
+                message = (change.seq, sse_event(change))
+                for subscriber in list(self.subscribers):
+                    if subscriber.profile_id == change.profile_id:
+                        self._deliver(subscriber, message)
+                self.last_seq = change.seq
+            if len(changes) < CHANGE_READ_BATCH:
+                return
+
+    def _deliver(self, subscriber: Subscriber, message: tuple):
+        try:
+            subscriber.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too slow to keep up: end its stream, and it resumes from Last-Event-ID
+            self.subscribers.discard(subscriber)
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+
+
+async def stream_changes(profile_id: int, since: Optional[int]):
+    """SSE body for one subscriber: the log after ``since``, then live changes"""
+    subscriber = change_feed.subscribe(profile_id)
+    try:
+        yield b"retry: 1000\n\n"
+        if since is not None:
+            # Subscribed first, so nothing committed during the replay is missed;
+            # the queue may repeat replayed changes, which are skipped below
+            while True:
+                changes = await run_db(
+                    partial(read_changes, since=since, limit=CHANGE_READ_BATCH, profile_id=profile_id), read_only=True
+                )
+                for change in changes:
+                    yield sse_event(change)
+                    since = change.seq
+                if len(changes) < CHANGE_READ_BATCH:
+                    break
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), CHANGE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE  # keeps proxies from closing an idle stream
+                continue
+            if message is None:
+                return
+            seq, body = message
+            if since is None or seq > since:
+                yield body
+    finally:
+        change_feed.unsubscribe(subscriber)
+
+
+change_feed = ChangeFeed()
@@ -1,21 +1,185 @@
-from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlmodel import create_engine, Session
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
+from typing import Callable, Optional, TypeVar
+import os
+import sqlite3
+import threading
+
+from profiling import thread_profile
 
 # Create database directory if it doesn't exist
 DB_DIR = Path(__file__).parent
 DB_PATH = DB_DIR / "database.db"
 
+# SQLite tuning, applied to every new connection (see configure_sqlite)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
+# Connection pools: one for writes, a separate read-only one for GET endpoints
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "10"))
+
+
+def py_lower(value: Optional[str]) -> Optional[str]:
+    """``str.lower`` as an SQL function: SQLite's own ``lower()`` only folds ASCII.
+
+    Lowercased keys such as ``projecttechnology.name_lower`` are computed in
+    Python, so SQL that compares against them must lowercase the same way.
+    """
+    return value.lower() if isinstance(value, str) else value
+
+
+def configure_sqlite(dbapi_connection, read_only: bool = False):
+    """Apply journal, durability and cache pragmas to a fresh SQLite connection"""
+    dbapi_connection.create_function("py_lower", 1, py_lower, deterministic=True)
+    cursor = dbapi_connection.cursor()
+    try:
+        if not read_only:
+            # journal_mode is persistent in the database file, so writers set it
+            cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size = {-SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA temp_store = {SQLITE_TEMP_STORE}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+    finally:
+        cursor.close()
+
+
+def begin_write(connection):
+    """Take SQLite's write lock now, unless this transaction already holds it.
+
+    Python's sqlite3 only begins a transaction at the first write, so code
+    that reads and then writes what it read (e.g. picking a free slug) can
+    race another writer in between.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    raw = connection.connection.dbapi_connection
+    in_transaction = getattr(raw, "in_transaction", None)
+    if in_transaction is None:  # aiosqlite's adapter wraps an aiosqlite.Connection
+        in_transaction = raw._connection.in_transaction
+    if not in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def make_engine(url: str, read_only: bool = False, pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW):
+    """Create a pooled engine; SQLite connections get the pragmas above"""
+    if not url.startswith("sqlite"):
+        return create_engine(url, echo=False, pool_size=pool_size, max_overflow=max_overflow)
+
+    if "+aiosqlite" in url:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        factory, poolclass = create_async_engine, AsyncAdaptedQueuePool
+    else:
+        factory, poolclass = create_engine, QueuePool
+    new_engine = factory(
+        url,
+        echo=False,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        poolclass=poolclass,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+    sync_engine = getattr(new_engine, "sync_engine", new_engine)
+    event.listen(sync_engine, "connect", lambda conn, record: configure_sqlite(conn, read_only))
+    return new_engine
+
+
 # Create engine
-sqlite_url = f"sqlite:///{DB_PATH}"
-engine = create_engine(sqlite_url, echo=False)
+sqlite_url = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
+engine = make_engine(sqlite_url)
+read_engine = make_engine(sqlite_url, read_only=True, pool_size=DB_READ_POOL_SIZE) if DB_READ_POOL_SIZE > 0 else engine
+
+# Optional async engines (SQLAlchemy AsyncEngine over aiosqlite), enabled with ASYNC_DB=1
+ASYNC_DB = os.getenv("ASYNC_DB", "0").lower() in ("1", "true", "yes")
+async_engine = async_read_engine = None
+if ASYNC_DB:
+    async_url = os.getenv("ASYNC_DATABASE_URL", sqlite_url.replace("sqlite:", "sqlite+aiosqlite:", 1))
+    async_engine = make_engine(async_url)
+    async_read_engine = (
+        make_engine(async_url, read_only=True, pool_size=DB_READ_POOL_SIZE) if DB_READ_POOL_SIZE > 0 else async_engine
+    )
+
+
+class DataVersion:
+    """Number that changes whenever any connection, in any process, commits to the database.
+
+    Reads ``PRAGMA data_version`` on a dedicated autocommit connection, so the
+    pooled connections' own writes count as changes too. The pragma only
+    compares a counter SQLite already keeps (in WAL shared memory), which
+    makes it cheap enough to call before every cache lookup.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def __call__(self) -> int:
+        with self._lock:
+            try:
+                if self._conn is None:
+                    # mode=rw: never create the file (health.py reports it missing)
+                    self._conn = sqlite3.connect(
+                        f"file:{self.path}?mode=rw", uri=True, check_same_thread=False, isolation_level=None
+                    )
+                return self._conn.execute("PRAGMA data_version").fetchone()[0]
+            except sqlite3.Error:
+                self._conn = None
+                return -1
+
+
+def sqlite_file(url: str) -> Optional[str]:
+    """Path of the SQLite database file behind ``url``, or None for other databases and :memory:"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return None
+    return parsed.database
+
+
+# Shared cache invalidation for multi-worker deployments (CACHE_COHERENCE=0 turns it off)
+CACHE_COHERENCE = os.getenv("CACHE_COHERENCE", "1").lower() in ("1", "true", "yes")
+data_version = DataVersion(sqlite_file(sqlite_url)) if CACHE_COHERENCE and sqlite_file(sqlite_url) else None
+
+T = TypeVar("T")
 
 
 def create_db_and_tables():
-    """Create all tables in the database"""
-    SQLModel.metadata.create_all(engine)
+    """Create or upgrade the schema by applying pending migrations (see migrations.py)"""
+    import migrations
+
+    migrations.upgrade(engine)
+
+
+def _run_with_session(fn: Callable[[Session], T], bind) -> T:
+    with Session(bind) as session, thread_profile():
+        return fn(session)
+
+
+async def run_db(fn: Callable[[Session], T], read_only: bool = False) -> T:
+    """Run ``fn(session)`` without blocking the event loop.
 
+    With ``ASYNC_DB`` enabled the work goes through an ``AsyncSession`` on the
+    aiosqlite engine; otherwise it runs on a sync ``Session`` in the threadpool.
+    ``fn`` is ordinary sync ORM code either way. ``read_only`` work is sent to
+    the read pool, whose connections refuse writes.
+    """
+    if async_engine is not None:
+        from sqlmodel.ext.asyncio.session import AsyncSession
 
-def get_session():
-    """Get a database session"""
-    with Session(engine) as session:
-        yield session
+        async with AsyncSession(async_read_engine if read_only else async_engine) as session:
+            return await session.run_sync(fn)
+    return await run_in_threadpool(_run_with_session, fn, read_engine if read_only else engine)
@@ -0,0 +1,146 @@
+"""Liveness and readiness checks for load balancers and orchestrators.
+
+Readiness runs a query through each connection pool with a time limit. The
+result is reused for ``READINESS_CACHE_SECONDS``, so aggressive probes do not
+add load to the database. Concurrent probes share a single check, and a ping
+that outlives its probe is waited on by the next probe instead of being
+joined by another one, so a hung database ties up at most one thread per pool.
+"""
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from database import SQLITE_BUSY_TIMEOUT_MS, async_engine, async_read_engine, engine, read_engine
+
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "1.0"))
+READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "2.0"))
+
+READINESS_QUERY = text("SELECT 1")
+# SELECT 1 alone never opens the SQLite file; reading the schema does, so a
+# locked database shows up as a timeout
+SQLITE_READINESS_QUERY = text("SELECT count(*) FROM sqlite_master")
+# Wait for a lock no longer than the probe does, so the ping does not hold
+# its connection for the whole busy timeout
+PROBE_BUSY_TIMEOUT = f"PRAGMA busy_timeout = {int(READINESS_TIMEOUT_SECONDS * 1000)}"
+RESTORE_BUSY_TIMEOUT = f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}"
+
+
+def pool_status(pool_engine) -> dict:
+    """Checkout counts of an engine's QueuePool and how close it is to exhausted"""
+    pool = getattr(pool_engine, "sync_engine", pool_engine).pool
+    if not hasattr(pool, "checkedout"):
+        return {"class": type(pool).__name__}
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    return {
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "saturation": round(pool.checkedout() / capacity, 3) if capacity else 0.0,
+    }
+
+
+def _database_file(pool_engine) -> Optional[Path]:
+    url = getattr(pool_engine, "sync_engine", pool_engine).url
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    return Path(url.database)
+
+
+def _ping(pool_engine) -> None:
+    with pool_engine.connect() as conn:
+        if conn.dialect.name != "sqlite":
+            conn.execute(READINESS_QUERY).scalar()
+            return
+        conn.exec_driver_sql(PROBE_BUSY_TIMEOUT)
+        try:
+            conn.execute(SQLITE_READINESS_QUERY).scalar()
+        finally:
+            conn.exec_driver_sql(RESTORE_BUSY_TIMEOUT)
+
+
+async def _async_ping(pool_engine) -> None:
+    async with pool_engine.connect() as conn:
+        if conn.dialect.name != "sqlite":
+            await conn.execute(READINESS_QUERY)
+            return
+        await conn.exec_driver_sql(PROBE_BUSY_TIMEOUT)
+        try:
+            await conn.execute(SQLITE_READINESS_QUERY)
+        finally:
+            await conn.exec_driver_sql(RESTORE_BUSY_TIMEOUT)
+
+
+# Pings by pool name, kept until they finish even if their probe gave up
+_pings: Dict[str, asyncio.Future] = {}
+
+
+def _running_ping(name: str, pool_engine, async_pool_engine=None) -> asyncio.Future:
+    ping = _pings.get(name)
+    if ping is None or ping.done():
+        if async_pool_engine is not None:
+            ping = asyncio.ensure_future(_async_ping(async_pool_engine))
+        else:
+            ping = asyncio.ensure_future(run_in_threadpool(_ping, pool_engine))
+        _pings[name] = ping
+    return ping
+
+
+async def check_pool(name: str, pool_engine, async_pool_engine=None) -> dict:
+    """Time the readiness query on one pool, giving up after the timeout"""
+    result = {"pool": name, "ok": False, **pool_status(async_pool_engine or pool_engine)}
+    database_file = _database_file(pool_engine)
+    # Connecting would silently create a missing SQLite file, so check for it first
+    if database_file is not None and not database_file.exists():
+        result["error"] = f"database file {database_file} is missing"
+        return result
+
+    start = time.perf_counter()
+    try:
+        # shield: a timeout stops this probe waiting, not the ping
+        ping = _running_ping(name, pool_engine, async_pool_engine)
+        await asyncio.wait_for(asyncio.shield(ping), READINESS_TIMEOUT_SECONDS)
+        result["ok"] = True
+    except asyncio.TimeoutError:
+        result["error"] = f"query did not finish within {READINESS_TIMEOUT_SECONDS}s"
+    except Exception as exc:
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return result
+
+
+class ReadinessCheck:
+    """Runs the pool checks at most once per ``ttl`` seconds"""
+
+    def __init__(self, ttl: float = READINESS_CACHE_SECONDS):
+        self.ttl = ttl
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def run(self) -> dict:
+        if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+            return {**self._result, "cached": True}
+        async with self._lock:
+            # Another probe may have refreshed the result while this one waited
+            if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+                return {**self._result, "cached": True}
+            checks = [check_pool("write", engine, async_engine)]
+            if read_engine is not engine:
+                checks.append(check_pool("read", read_engine, async_read_engine))
+            pools = await asyncio.gather(*checks)
+            self._result = {
+                "status": "ready" if all(p["ok"] for p in pools) else "not_ready",
+                "checked_at": time.time(),
+                "pools": pools,
+            }
+            self._checked_at = time.monotonic()
+        return {**self._result, "cached": False}
+
+
+readiness = ReadinessCheck()
@@ -1,14 +1,54 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from functools import partial
 from sqlmodel import Session, select
-from typing import List, Optional
-from database import get_session, create_db_and_tables
-from models import Profile, Skill, Project, Education, WorkExperience, Link, ProjectLink
+from sqlalchemy.orm import selectinload
+from typing import List, Optional, Union
+from database import async_engine, async_read_engine, data_version, engine, read_engine, run_db, create_db_and_tables
+from batch import BatchError, apply_operations
+from bulk import IMPORT_BATCH_SIZE, ImportReport, aiter_lines, export_ndjson, import_batch
+from compression import CompressionMiddleware
+from cache import ORJSONResponse, response_cache, cached_json_response
+from changes import read_changes, serialize_change, stream_changes
+from health import readiness
+from profiling import PROFILING_ENABLED, ProfilingMiddleware, span, trace_engine
+from ratelimit import MAX_IN_FLIGHT, RATE_LIMIT_ENABLED, RateLimitMiddleware
+import migrations
+import snapshot
+import skill_stats  # noqa: F401 registers the flush hooks maintaining skill rankings
+from metrics import (
+    CONTENT_TYPE_LATEST, METRICS_ENABLED, REGISTRY, MetricsMiddleware, ResponseCacheCollector, instrument_engine, render_metrics,
+)
+from search_index import fuzzy_search_hits, search_hits
+from pagination import keyset_page, keyset_slice
+from schemas import (
+    BatchOut, BatchRequest, ChangesOut, EducationListOut, ImportReportOut, LegacySearchOut, ProfileListOut, ProfileOut,
+    ProfileUpdateOut, ProjectsOut, SearchOut, SkillsOut, TopSkillsOut, WorkListOut,
+)
+from serializers import (
+    PROFILE_INCLUDES, PROJECT_FIELDS, parse_selection, profile_query, project_options,
+    serialize_education, serialize_profile, serialize_profile_summary, serialize_project, serialize_skill, serialize_work,
+)
+from models import Profile, Skill, SkillStat, Project, Education, WorkExperience, Link, ProjectLink, ProjectTechnology
+from snapshot import SNAPSHOT_MODE, ProfileSnap, Snapshot, snapshot_store
+from static_render import STATIC_RENDER_ENABLED, StaticRenderApp, static_renderer
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Documents the {profile_ref} path parameter, which handlers read via resolve_profile_id
+PROFILE_REF_PARAM = {
+    "parameters": [
+        {"name": "profile_ref", "in": "path", "required": True, "schema": {"type": "string"}, "description": "Profile id or slug"}
+    ]
+}
 
 app = FastAPI(
     title="Me-API Playground",
     description="Personal profile API for candidate information",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 import os
@@ -19,20 +59,105 @@ origins = [
     os.getenv("FRONTEND_URL", "")
 ]
 
+# Inside CORS, so 429/503 responses still carry the CORS headers browsers need to read them
+if RATE_LIMIT_ENABLED or MAX_IN_FLIGHT > 0:
+    app.add_middleware(RateLimitMiddleware, routes=app.routes)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+app.add_middleware(CompressionMiddleware)
+
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+    for traced in {engine, read_engine, async_engine, async_read_engine} - {None}:
+        trace_engine(traced)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    for instrumented in {engine, read_engine, async_engine, async_read_engine} - {None}:
+        instrument_engine(instrumented)
+    REGISTRY.register(ResponseCacheCollector(response_cache))
+
+if data_version is not None:
+    # Other workers' writes invalidate this worker's cache on its next lookup
+    response_cache.watch(data_version)
+
+if STATIC_RENDER_ENABLED:
+    # The rendered profile and project responses, for a CDN to pull
+    app.mount("/static", StaticRenderApp(), name="static")
+
+
+# What the app does to the database when a worker starts:
+#   migrate - apply pending migrations and seed an empty database (development default)
+#   check   - no DDL; refuse to start while migrations are pending (run `python manage.py migrate` first)
+#   skip    - nothing
+STARTUP_MODE = os.getenv("STARTUP_MODE", "migrate")
+
+
+def migrate():
+    """Bring the schema up to date and seed an empty database"""
+    from seed import seed_database
+
+    with migrations.migration_lock(engine):
+        create_db_and_tables()
+        seed_database()
+
 
-from seed import seed_database
 @app.on_event("startup")
 def on_startup():
-    create_db_and_tables()
-    seed_database()
+    if STARTUP_MODE == "migrate":
+        migrate()
+    elif STARTUP_MODE == "check":
+        migrations.check(engine)
+    if SNAPSHOT_MODE:
+        snapshot_store.start()
+    if STATIC_RENDER_ENABLED:
+        static_renderer.start()
+
+
+def resolve_profile_id(session: Session, request: Request) -> int:
+    """Id of the profile a request addresses.
+
+    Routes under ``/api/profiles/{profile_ref}`` take an id or a slug; the
+    unscoped ``/api/...`` routes serve the first profile.
+    """
+    ref = request.path_params.get("profile_ref")
+    if ref is None:
+        query = select(Profile.id).order_by(Profile.id).limit(1)
+    elif ref.isdigit():
+        query = select(Profile.id).where(Profile.id == int(ref))
+    else:
+        query = select(Profile.id).where(Profile.slug == ref)
+    profile_id = session.exec(query).first()
+    
+    if profile_id is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return profile_id
+
+
+def snapshot_profile(snap: Snapshot, request: Request) -> ProfileSnap:
+    """``resolve_profile_id`` against the snapshot"""
+    profile = snap.resolve(request.path_params.get("profile_ref"))
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+async def read_response(request: Request, build, from_snapshot):
+    """Cached response built by ``from_snapshot(snapshot)`` in snapshot mode, else by ``build(session)`` on the read pool"""
+    if SNAPSHOT_MODE and from_snapshot is not None:
+        async def from_memory():
+            return from_snapshot(snapshot_store.get())
+        return await cached_json_response(request, from_memory)
+    return await cached_json_response(request, lambda: run_db(build, read_only=True))
 
 
 @app.get("/health")
@@ -41,177 +166,402 @@ def health_check():
     return {"status": "healthy", "message": "API is running"}
 
 
-@app.get("/api/profile")
-def get_profile(session: Session = Depends(get_session)):
+@app.get("/health/live")
+def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: every connection pool answers a query within the timeout"""
+    result = await readiness.run()
+    return ORJSONResponse(result, status_code=200 if result["status"] == "ready" else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics in the text exposition format"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Response cache hit/miss counters"""
+    return response_cache.stats()
+
+
+@app.get("/api/profiles", response_model=ProfileListOut)
+async def list_profiles(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[int] = Query(None, ge=0, description="next_cursor from the previous page")
+):
+    """List profiles, paginated by id"""
+    def build(session: Session):
+        profiles, next_cursor = keyset_page(session, select(Profile), Profile.id, cursor, limit)
+        return {"profiles": [serialize_profile_summary(p) for p in profiles], "next_cursor": next_cursor}
+    
+    def from_snapshot(snap: Snapshot):
+        profiles, next_cursor = keyset_slice(snap.ordered, cursor, limit)
+        return {"profiles": [serialize_profile_summary(p) for p in profiles], "next_cursor": next_cursor}
+    
+    return await read_response(request, build, from_snapshot)
+
+
+@app.get("/api/profiles/{profile_ref}", openapi_extra=PROFILE_REF_PARAM, response_model=ProfileOut, response_model_exclude_none=True)
+@app.get("/api/profile", response_model=ProfileOut, response_model_exclude_none=True)
+async def get_profile(
+    request: Request,
+    include: Optional[str] = Query(None, description="Comma-separated collections to embed: skills,projects,education,work,links"),
+    fields: Optional[str] = Query(None, description="Comma-separated project fields: id,title,description,technologies,links")
+):
     """Get complete profile with all related data"""
-    profile = session.exec(select(Profile)).first()
+    included = parse_selection(include, PROFILE_INCLUDES, "include")
+    project_fields = parse_selection(fields, PROJECT_FIELDS, "fields")
     
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found")
+    def build(session: Session):
+        profile_id = resolve_profile_id(session, request)
+        profile = session.exec(profile_query(included, project_fields).where(Profile.id == profile_id)).one()
+        with span("serialize"):
+            return serialize_profile(profile, included, project_fields)
     
-    # Manually construct response with relationships
-    return {
-        "id": profile.id,
-        "name": profile.name,
-        "email": profile.email,
-        "bio": profile.bio,
-        "location": profile.location,
-        "skills": [{"id": s.id, "name": s.name} for s in profile.skills],
-        "projects": [
-            {
-                "id": p.id,
-                "title": p.title,
-                "description": p.description,
-                "technologies": p.technologies.split(","),
-                "links": [{"platform": l.platform, "url": l.url} for l in p.links]
-            }
-            for p in profile.projects
-        ],
-        "education": [
-            {
-                "id": e.id,
-                "institution": e.institution,
-                "degree": e.degree,
-                "field_of_study": e.field_of_study,
-                "start_date": e.start_date,
-                "end_date": e.end_date
-            }
-            for e in profile.education
-        ],
-        "work": [
-            {
-                "id": w.id,
-                "company": w.company,
-                "position": w.position,
-                "description": w.description,
-                "start_date": w.start_date,
-                "end_date": w.end_date
-            }
-            for w in profile.work
-        ],
-        "links": [{"platform": l.platform, "url": l.url} for l in profile.links]
-    }
+    def from_snapshot(snap: Snapshot):
+        profile = snapshot_profile(snap, request)
+        with span("serialize"):
+            return serialize_profile(profile, included, project_fields)
+    
+    return await read_response(request, build, from_snapshot)
 
 
-@app.put("/api/profile")
-def update_profile(
+@app.put("/api/profiles/{profile_ref}", openapi_extra=PROFILE_REF_PARAM, response_model=ProfileUpdateOut)
+@app.put("/api/profile", response_model=ProfileUpdateOut)
+async def update_profile(
+    request: Request,
     name: Optional[str] = None,
     email: Optional[str] = None,
     bio: Optional[str] = None,
-    location: Optional[str] = None,
-    session: Session = Depends(get_session)
+    location: Optional[str] = None
 ):
     """Update profile information"""
-    profile = session.exec(select(Profile)).first()
-    
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found")
+    def update(session: Session):
+        profile = session.get(Profile, resolve_profile_id(session, request))
+        
+        if name:
+            profile.name = name
+        if email:
+            profile.email = email
+        if bio:
+            profile.bio = bio
+        if location:
+            profile.location = location
+        
+        session.add(profile)
+        session.commit()
+        session.refresh(profile)
+        response_cache.bump()
+        
+        return {"message": "Profile updated successfully", "profile": serialize_profile_summary(profile)}
     
-    if name:
-        profile.name = name
-    if email:
-        profile.email = email
-    if bio:
-        profile.bio = bio
-    if location:
-        profile.location = location
-    
-    session.add(profile)
-    session.commit()
-    session.refresh(profile)
-    
-    return {"message": "Profile updated successfully", "profile": profile}
+    return await run_db(update)
 
 
-@app.get("/api/projects")
-def get_projects(
+@app.get("/api/profiles/{profile_ref}/projects", openapi_extra=PROFILE_REF_PARAM, response_model=ProjectsOut, response_model_exclude_none=True)
+@app.get("/api/projects", response_model=ProjectsOut, response_model_exclude_none=True)
+async def get_projects(
+    request: Request,
     skill: Optional[str] = Query(None, description="Filter projects by skill/technology"),
-    session: Session = Depends(get_session)
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit to return every project"),
+    cursor: Optional[int] = Query(None, ge=0, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated project fields: id,title,description,technologies,links")
 ):
     """Get all projects, optionally filtered by skill"""
-    profile = session.exec(select(Profile)).first()
+    project_fields = parse_selection(fields, PROJECT_FIELDS, "fields")
     
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found")
+    def build(session: Session):
+        profile_id = resolve_profile_id(session, request)
+        
+        query = (
+            select(Project)
+            .where(Project.profile_id == profile_id)
+            .options(*project_options(project_fields))
+        )
+        
+        # Filter by skill if provided, probing the (name_lower, project_id)
+        # index once per project of this profile
+        if skill:
+            query = query.where(
+                select(ProjectTechnology.id)
+                .where(
+                    ProjectTechnology.project_id == Project.id,
+                    ProjectTechnology.name_lower == skill.strip().lower()
+                )
+                .exists()
+            )
+        
+        projects, next_cursor = keyset_page(session, query, Project.id, cursor, limit)
+        return projects_response(projects, next_cursor)
     
-    projects = profile.projects
-    
-    # Filter by skill if provided
-    if skill:
-        skill_lower = skill.lower()
-        projects = [
-            p for p in projects
-            if any(tech.strip().lower() == skill_lower for tech in p.technologies.split(","))
-        ]
-    
-    return {
-        "projects": [
-            {
-                "id": p.id,
-                "title": p.title,
-                "description": p.description,
-                "technologies": p.technologies.split(","),
-                "links": [{"platform": l.platform, "url": l.url} for l in p.links]
-            }
-            for p in projects
-        ]
-    }
+    def from_snapshot(snap: Snapshot):
+        profile = snapshot_profile(snap, request)
+        projects = profile.projects_by_technology.get(skill.strip().lower(), ()) if skill else profile.projects
+        return projects_response(*keyset_slice(projects, cursor, limit))
+    
+    def projects_response(projects, next_cursor):
+        with span("serialize"):
+            response = {"projects": [serialize_project(p, project_fields) for p in projects]}
+        if limit is not None:
+            response["next_cursor"] = next_cursor
+        return response
+    
+    return await read_response(request, build, from_snapshot)
+
+
+def collection_endpoint(path: str, model, key: str, serialize, response_model, description: str):
+    """Register a keyset-paginated GET endpoint listing one profile collection"""
+    async def list_collection(
+        request: Request,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+        cursor: Optional[int] = Query(None, ge=0, description="next_cursor from the previous page")
+    ):
+        def build(session: Session):
+            profile_id = resolve_profile_id(session, request)
+            query = select(model).where(model.profile_id == profile_id)
+            rows, next_cursor = keyset_page(session, query, model.id, cursor, limit)
+            return {key: [serialize(row) for row in rows], "next_cursor": next_cursor}
+        
+        def from_snapshot(snap: Snapshot):
+            rows, next_cursor = keyset_slice(getattr(snapshot_profile(snap, request), key), cursor, limit)
+            return {key: [serialize(row) for row in rows], "next_cursor": next_cursor}
+        
+        return await read_response(request, build, from_snapshot)
+    
+    list_collection.__doc__ = description
+    app.get(f"/api{path}", name=f"list_{key}", response_model=response_model)(list_collection)
+    app.get(
+        f"/api/profiles/{{profile_ref}}{path}",
+        name=f"list_profile_{key}",
+        response_model=response_model,
+        openapi_extra=PROFILE_REF_PARAM
+    )(list_collection)
+
+
+collection_endpoint("/skills", Skill, "skills", serialize_skill, SkillsOut, "List skills, paginated by id")
+collection_endpoint("/work", WorkExperience, "work", serialize_work, WorkListOut, "List work experience, paginated by id")
+collection_endpoint("/education", Education, "education", serialize_education, EducationListOut, "List education, paginated by id")
 
 
-@app.get("/api/skills/top")
-def get_top_skills(
-    limit: int = Query(10, description="Number of skills to return"),
-    session: Session = Depends(get_session)
+@app.get("/api/profiles/{profile_ref}/skills/top", openapi_extra=PROFILE_REF_PARAM, response_model=TopSkillsOut)
+@app.get("/api/skills/top", response_model=TopSkillsOut)
+async def get_top_skills(
+    request: Request,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE, description="Number of skills to return"),
+    min_score: int = Query(0, ge=0, description="Only skills used by at least this many projects")
 ):
-    """Get top skills"""
-    skills = session.exec(select(Skill).limit(limit)).all()
-    return {"skills": [{"id": s.id, "name": s.name} for s in skills]}
+    """Get top skills, ranked by how many projects use them and then by most recent use"""
+    def build(session: Session):
+        profile_id = resolve_profile_id(session, request)
+        rows = session.exec(
+            select(Skill, SkillStat.project_count)
+            .join(SkillStat, SkillStat.skill_id == Skill.id)
+            .where(SkillStat.profile_id == profile_id, SkillStat.project_count >= min_score)
+            .order_by(SkillStat.project_count.desc(), SkillStat.last_project_id.desc(), SkillStat.skill_id.desc())
+            .limit(limit)
+        ).all()
+        return {"skills": [{**serialize_skill(skill), "score": score} for skill, score in rows]}
+    
+    def from_snapshot(snap: Snapshot):
+        # Ranked by score, so the skills passing min_score are a prefix
+        ranked = snapshot_profile(snap, request).top_skills
+        return {"skills": [{**serialize_skill(skill), "score": score} for skill, score in ranked[:limit] if score >= min_score]}
+    
+    return await read_response(request, build, from_snapshot)
 
 
-@app.get("/api/search")
-def search(
+@app.get("/api/profiles/{profile_ref}/search", openapi_extra=PROFILE_REF_PARAM, response_model=Union[SearchOut, LegacySearchOut])
+@app.get("/api/search", response_model=Union[SearchOut, LegacySearchOut])
+async def search(
+    request: Request,
     q: str = Query(..., description="Search query"),
-    session: Session = Depends(get_session)
+    response_format: str = Query("ranked", alias="format", pattern="^(ranked|legacy)$", description="ranked hits or the legacy projects/skills shape"),
+    kinds: Optional[List[str]] = Query(None, alias="type", description="Restrict hits to project, skill, work or education"),
+    limit: int = Query(20, ge=1, le=100, description="Hits per page (ranked format)"),
+    offset: int = Query(0, ge=0, description="Hits to skip (ranked format)"),
+    fuzzy: bool = Query(False, description="Also match misspelled and split words, ranked by similarity")
 ):
-    """Search across projects, skills, and profile"""
-    profile = session.exec(select(Profile)).first()
+    """Full-text search across projects, skills, work experience and education"""
+    find_hits = fuzzy_search_hits if fuzzy else search_hits
     
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found")
+    def build(session: Session):
+        profile_id = resolve_profile_id(session, request)
+        
+        if response_format == "legacy":
+            return legacy_search(session, profile_id)
+        
+        total, hits = find_hits(session, q, profile_id, kinds=kinds, limit=limit, offset=offset)
+        return ranked_response(total, hits)
     
-    query_lower = q.lower()
+    def from_snapshot(snap: Snapshot):
+        profile = snapshot_profile(snap, request)
+        
+        if response_format == "legacy":
+            _, hits = snapshot.search_hits(snap, profile, q, kinds=["project", "skill"], limit=None)
+            projects = {p.id: p for p in profile.projects}
+            skills = {s.id: s for s in profile.skills}
+            return legacy_response(hits, projects, skills)
+        
+        return ranked_response(*snapshot.search_hits(snap, profile, q, kinds=kinds, limit=limit, offset=offset))
     
-    # Search in projects
-    matching_projects = [
-        {
-            "id": p.id,
-            "title": p.title,
-            "description": p.description,
-            "technologies": p.technologies.split(","),
-            "links": [{"platform": l.platform, "url": l.url} for l in p.links]
+    def ranked_response(total, hits):
+        return {
+            "query": q,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "hits": hits
         }
-        for p in profile.projects
-        if query_lower in p.title.lower() 
-        or query_lower in p.description.lower()
-        or query_lower in p.technologies.lower()
-    ]
     
-    # Search in skills
-    matching_skills = [
-        {"id": s.id, "name": s.name}
-        for s in profile.skills
-        if query_lower in s.name.lower()
-    ]
+    def legacy_search(session: Session, profile_id: int):
+        # Same shape as before ranking was added: every matching project and skill
+        _, hits = find_hits(session, q, profile_id, kinds=["project", "skill"], limit=None)
+        project_ids = [h["id"] for h in hits if h["type"] == "project"]
+        skill_ids = [h["id"] for h in hits if h["type"] == "skill"]
+        
+        projects = {
+            p.id: p
+            for p in session.exec(
+                select(Project).where(Project.id.in_(project_ids)).options(selectinload(Project.links))
+            )
+        }
+        skills = {s.id: s for s in session.exec(select(Skill).where(Skill.id.in_(skill_ids)))}
+        return legacy_response(hits, projects, skills)
+    
+    def legacy_response(hits, projects, skills):
+        project_ids = [h["id"] for h in hits if h["type"] == "project"]
+        skill_ids = [h["id"] for h in hits if h["type"] == "skill"]
+        with span("serialize"):
+            return {
+                "query": q,
+                "results": {
+                    "projects": [serialize_project(projects[i]) for i in project_ids if i in projects],
+                    "skills": [serialize_skill(skills[i]) for i in skill_ids if i in skills]
+                }
+            }
     
-    return {
-        "query": q,
-        "results": {
-            "projects": matching_projects,
-            "skills": matching_skills
+    # The trigram index is only in SQLite, so fuzzy search reads it even in snapshot mode
+    return await read_response(request, build, None if fuzzy else from_snapshot)
+
+
+@app.get("/api/profiles/{profile_ref}/changes", openapi_extra=PROFILE_REF_PARAM, response_model=ChangesOut)
+@app.get("/api/changes", response_model=ChangesOut)
+async def list_changes(
+    request: Request,
+    since: int = Query(0, ge=0, description="Return changes after this seq (last_seq of the previous call)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size")
+):
+    """Changes to the profile and its rows committed after ``since``, oldest first"""
+    def build(session: Session):
+        profile_id = resolve_profile_id(session, request)
+        changes = read_changes(session, since, limit + 1, profile_id)
+        page = changes[:limit]
+        return {
+            "changes": [serialize_change(c) for c in page],
+            "last_seq": page[-1].seq if page else since,
+            "has_more": len(changes) > limit,
         }
-    }
+
+    return await cached_json_response(request, lambda: run_db(build, read_only=True))
+
+
+@app.get("/api/profiles/{profile_ref}/changes/stream", openapi_extra=PROFILE_REF_PARAM)
+@app.get("/api/changes/stream")
+async def stream_profile_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Replay changes after this seq before streaming live ones"),
+    last_event_id: Optional[str] = Header(None, description="Sent by EventSource on reconnect; overrides since")
+):
+    """Server-Sent Events stream of the profile's changes, one ``change`` event per row"""
+    profile_id = await run_db(partial(resolve_profile_id, request=request), read_only=True)
+    if last_event_id is not None and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        stream_changes(profile_id, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # nginx must not buffer the stream
+    )
+
+
+@app.patch("/api/batch", response_model=BatchOut)
+async def batch_update(batch: BatchRequest):
+    """Apply create/update/delete operations across profiles and their collections in one transaction.
+
+    Either every operation is applied or none is; a failure reports the index
+    of the operation that caused it.
+    """
+    def apply(session: Session):
+        try:
+            return apply_operations(session, batch.operations)
+        except BatchError as exc:
+            raise HTTPException(status_code=exc.status_code, detail={"index": exc.index, "error": exc.message})
+    
+    results = await run_db(apply)
+    response_cache.bump()
+    return {"results": results}
+
+
+@app.post("/api/import", response_model=ImportReportOut)
+async def import_profiles(
+    request: Request,
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=10000, description="Profiles per transaction")
+):
+    """Bulk-import profiles from an NDJSON request body.
+
+    Every ``batch_size`` profiles are committed together, so a failed request
+    keeps the batches before it. Invalid lines are skipped and reported.
+    """
+    report = ImportReport()
+    batch = []
+    line_number = 0
+    async for line in aiter_lines(request.stream()):
+        line_number += 1
+        record = report.parse(line_number, line)
+        if record is not None:
+            batch.append(record)
+        if len(batch) >= batch_size:
+            report.add(await run_db(partial(import_batch, records=batch)))
+            batch = []
+    if batch:
+        report.add(await run_db(partial(import_batch, records=batch)))
+    return report.as_dict()
+
+
+@app.get("/api/export")
+def export_profiles():
+    """Stream every profile as NDJSON, one line per profile"""
+    if SNAPSHOT_MODE:
+        return StreamingResponse(snapshot.export_ndjson(snapshot_store.get()), media_type="application/x-ndjson")
+    return StreamingResponse(export_ndjson(), media_type="application/x-ndjson")
 
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    # WEB_CONCURRENCY is also what `uvicorn --workers` and gunicorn default to
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    host, port = os.getenv("HOST", "0.0.0.0"), int(os.getenv("PORT", "8000"))
+    if workers > 1:
+        # Migrate once here, so the workers only verify the schema when they boot
+        if STARTUP_MODE == "migrate":
+            migrate()
+            engine.dispose()
+            os.environ["STARTUP_MODE"] = "check"
+        # Hand over to the uvicorn CLI: its spawned workers would otherwise
+        # import this file twice, as __mp_main__ and as main
+        os.execv(sys.executable, [
+            sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port), "--workers", str(workers),
+        ])
+    else:
+        uvicorn.run(app, host=host, port=port)
@@ -0,0 +1,50 @@
+"""Database management commands, run once per deploy rather than in every worker.
+
+Usage:
+    python manage.py migrate   # apply pending schema migrations
+    python manage.py seed      # migrate, then load the sample profile into an empty database
+    python manage.py status    # list applied and pending migrations
+    python manage.py render    # render profiles changed since the last run to STATIC_DIR (--full: all)
+"""
+import argparse
+import sys
+
+from database import engine
+import migrations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Database migrations and seeding")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="apply pending schema migrations")
+    commands.add_parser("seed", help="migrate, then seed an empty database with the sample profile")
+    commands.add_parser("status", help="list applied and pending migrations")
+    render = commands.add_parser("render", help="write static renders of profiles changed since the last run")
+    render.add_argument("--full", action="store_true", help="render every profile again")
+    args = parser.parse_args(argv)
+
+    if args.command in ("migrate", "seed"):
+        with migrations.migration_lock(engine):
+            applied = migrations.upgrade(engine)
+            for m in applied:
+                print(f"applied {m.version}: {m.description}")
+            if not applied:
+                print("schema is up to date")
+            if args.command == "seed":
+                from seed import seed_database
+                seed_database()
+    elif args.command == "status":
+        pending = {m.version for m in migrations.pending_migrations(engine)}
+        for m in migrations.MIGRATIONS:
+            print(f"{'pending' if m.version in pending else 'applied':<8} {m.version}: {m.description}")
+    elif args.command == "render":
+        from static_render import STATIC_DIR, render_pending
+
+        result = render_pending(full=args.full)
+        print(f"rendered {result['profiles']} profiles to {STATIC_DIR} up to change {result['seq']} "
+              f"({result['changed']} responses changed)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Prometheus metrics for HTTP requests and SQL statements, served on ``/metrics``.
+
+``MetricsMiddleware`` is a plain ASGI middleware (no per-request task or
+``Request`` object) recording, per method and route template:
+
+* ``http_requests_total`` by status, ``http_request_duration_seconds``,
+  ``http_response_size_bytes`` and ``http_requests_in_flight``;
+* ``db_statements_per_request`` and ``db_time_per_request_seconds``, fed by
+  cursor-execute listeners that ``instrument_engine`` attaches to an engine.
+
+Statements executed outside a request (startup, CLI tools) only count towards
+``db_statement_duration_seconds``. Metrics are per process unless
+``PROMETHEUS_MULTIPROC_DIR`` is set, in which case every worker writes its
+samples there and ``/metrics`` reports the sum over all workers.
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, REGISTRY
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+# Must name an empty directory shared by all workers of one server
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+REQUESTS = Counter("http_requests_total", "HTTP requests", ["method", "route", "status"])
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time until the last response byte was sent", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size", ["method", "route"], buckets=SIZE_BUCKETS)
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served", multiprocess_mode="livesum")
+REQUEST_STATEMENTS = Histogram(
+    "db_statements_per_request", "SQL statements executed per request", ["method", "route"],
+    buckets=STATEMENT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "db_time_per_request_seconds", "Time spent executing SQL per request", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "Duration of single SQL statements", buckets=LATENCY_BUCKETS,
+)
+
+UNMATCHED_ROUTE = "unmatched"  # keeps label cardinality bounded for 404s
+
+# [statement count, seconds] of the current request; the threadpool copies the context
+_request_sql: ContextVar[Optional[List]] = ContextVar("request_sql", default=None)
+
+# Labelled children are looked up once per (method, route), not on every request
+_route_children: Dict[Tuple[str, str], tuple] = {}
+_status_children: Dict[Tuple[str, str, int], Counter] = {}
+
+
+def _observe(method: str, route: str, status: int, seconds: float, size: int, sql: List):
+    children = _route_children.get((method, route))
+    if children is None:
+        children = _route_children[(method, route)] = tuple(
+            metric.labels(method, route) for metric in (REQUEST_DURATION, RESPONSE_SIZE, REQUEST_STATEMENTS, REQUEST_DB_TIME)
+        )
+    requests = _status_children.get((method, route, status))
+    if requests is None:
+        requests = _status_children[(method, route, status)] = REQUESTS.labels(method, route, status)
+    requests.inc()
+    duration, response_size, statements, db_time = children
+    duration.observe(seconds)
+    response_size.observe(size)
+    statements.observe(sql[0])
+    db_time.observe(sql[1])
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        sql = [0, 0.0]
+        token = _request_sql.set(sql)
+        status, size = 500, 0
+
+        async def send_with_metrics(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            IN_FLIGHT.dec()
+            _request_sql.reset(token)
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            _observe(scope["method"], route, status, time.perf_counter() - start, size, sql)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+    STATEMENT_DURATION.observe(elapsed)
+    sql = _request_sql.get()
+    if sql is not None:
+        sql[0] += 1
+        sql[1] += elapsed
+
+
+def instrument_engine(engine):
+    """Time every statement executed on ``engine`` (sync or async)"""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class ResponseCacheCollector:
+    """Exports ``response_cache.stats()`` at scrape time"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def collect(self):
+        stats = self.cache.stats()
+        yield CounterMetricFamily("response_cache_hits", "Response cache hits", value=stats["hits"])
+        yield CounterMetricFamily("response_cache_misses", "Response cache misses", value=stats["misses"])
+        yield GaugeMetricFamily("response_cache_entries", "Entries in the response cache", value=stats["entries"])
+
+
+def render_metrics() -> bytes:
+    if MULTIPROCESS:
+        # Aggregates the files of every worker; collectors registered on
+        # REGISTRY (the response cache counters) are per process and left out
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
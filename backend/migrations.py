@@ -0,0 +1,203 @@
+"""Versioned schema migrations.
+
+Every migration has a version number and an ``upgrade(session)`` function and
+is applied at most once; applied versions are recorded in ``schema_migrations``.
+New schema changes are appended with the next version number. SQLite commits
+some DDL implicitly, so a migration should be safe to re-run after a crash.
+
+Migrations 1-6 are the upgrade steps that used to run on every startup. They
+are idempotent, so databases created before versioning are brought up to date
+and stamped the first time they are migrated.
+
+    python manage.py migrate   # apply pending migrations
+    python manage.py status    # show the current and pending versions
+"""
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, List, NamedTuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run `manage.py migrate` before starting workers
+    fcntl = None
+
+from sqlalchemy import text
+from sqlmodel import SQLModel, Session, select
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Session], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """Register ``fn`` as the migration to ``version``"""
+    def register(fn):
+        assert not MIGRATIONS or MIGRATIONS[-1].version < version, "migrations must be added in version order"
+        MIGRATIONS.append(Migration(version, description, fn))
+        return fn
+    return register
+
+
+class PendingMigrationsError(RuntimeError):
+    pass
+
+
+@migration(1, "create missing tables")
+def _create_tables(session: Session):
+    import search_index  # noqa: F401 registers the FTS5 table DDL on the metadata
+    import skill_stats  # noqa: F401 registers the skill_stats flush hooks
+
+    SQLModel.metadata.create_all(session.connection())
+
+
+@migration(2, "add profile.slug and fill it from names")
+def _profile_slugs(session: Session):
+    from models import Profile, slugify
+
+    columns = {row[1] for row in session.connection().exec_driver_sql("PRAGMA table_info(profile)")}
+    if "slug" not in columns:
+        session.connection().exec_driver_sql("ALTER TABLE profile ADD COLUMN slug VARCHAR")
+    taken = set(session.exec(select(Profile.slug).where(Profile.slug.is_not(None))))
+    for profile in session.exec(select(Profile).where(Profile.slug.is_(None))):
+        slug, n = slugify(profile.name), 1
+        while slug in taken:
+            n += 1
+            slug = f"{slugify(profile.name)}-{n}"
+        profile.slug = slug
+        taken.add(slug)
+        session.add(profile)
+
+
+@migration(3, "create missing indexes")
+def _indexes(session: Session):
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(session.connection(), checkfirst=True)
+
+
+@migration(4, "backfill projecttechnology from project.technologies")
+def _project_technologies(session: Session):
+    from models import Project, ProjectTechnology, technology_rows
+
+    indexed = select(ProjectTechnology.project_id).distinct()
+    for project in session.exec(select(Project).where(Project.id.not_in(indexed))).all():
+        for row in technology_rows(project.technologies):
+            row.project_id = project.id
+            session.add(row)
+
+
+@migration(5, "build the search index")
+def _search_index(session: Session):
+    import search_index
+
+    search_index.ensure_search_index(session)
+
+
+@migration(6, "backfill skill_stats")
+def _skill_stats(session: Session):
+    import skill_stats
+
+    skill_stats.ensure_skill_stats(session.connection())
+
+
+@migration(7, "create the changes table")
+def _changes(session: Session):
+    from models import Change
+
+    Change.__table__.create(session.connection(), checkfirst=True)
+
+
+@migration(8, "build the fuzzy search vocabulary")
+def _search_words(session: Session):
+    import search_index
+
+    search_index.ensure_search_words(session)
+
+
+@migration(9, "derive search_index rowids from (kind, ref_id)")
+def _search_rowids(session: Session):
+    import search_index
+
+    search_index.ensure_search_rowids(session)
+
+
+@migration(10, "recount skill_stats for skills with non-ASCII names")
+def _skill_stats_unicode(session: Session):
+    import skill_stats
+
+    skill_ids = session.connection().exec_driver_sql("SELECT id FROM skill WHERE py_lower(name) != lower(name)")
+    skill_stats.rebuild_skill_stats(session.connection(), skill_ids=[row[0] for row in skill_ids])
+
+
+def _ensure_version_table(session: Session):
+    session.connection().exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, description VARCHAR NOT NULL, applied_at VARCHAR NOT NULL)"
+    )
+
+
+def applied_versions(session: Session) -> set:
+    exists = session.connection().exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+    ).first()
+    if exists is None:
+        return set()
+    return {row[0] for row in session.connection().exec_driver_sql("SELECT version FROM schema_migrations")}
+
+
+def pending_migrations(engine) -> List[Migration]:
+    with Session(engine) as session:
+        applied = applied_versions(session)
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+def upgrade(engine) -> List[Migration]:
+    """Apply pending migrations in order, each in its own transaction, and return them"""
+    pending = pending_migrations(engine)
+    for m in pending:
+        with Session(engine) as session:
+            _ensure_version_table(session)
+            m.upgrade(session)
+            session.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": m.version, "d": m.description, "t": datetime.now(timezone.utc).isoformat()},
+            )
+            session.commit()
+    return pending
+
+
+@contextmanager
+def migration_lock(engine):
+    """Hold an exclusive file lock next to the database while migrating or seeding.
+
+    Workers started together in ``migrate`` mode take turns, and the ones that
+    get the lock later find nothing left to do.
+    """
+    from database import sqlite_file
+
+    path = sqlite_file(str(engine.url))
+    if fcntl is None or path is None:
+        yield
+        return
+    with open(f"{path}.migrate-lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def check(engine):
+    """Raise ``PendingMigrationsError`` unless the schema is at the latest version.
+
+    Runs a single query and no DDL, for processes that must not migrate.
+    """
+    pending = pending_migrations(engine)
+    if pending:
+        versions = ", ".join(str(m.version) for m in pending)
+        raise PendingMigrationsError(f"database has pending migrations ({versions}); run `python manage.py migrate`")
@@ -1,4 +1,7 @@
+import re
 from typing import Optional, List
+from sqlalchemy import Index, event, inspect, select
+from sqlalchemy.orm import Session as OrmSession
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 
@@ -6,15 +9,45 @@ from datetime import datetime
 class Skill(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True)
-    profile_id: Optional[int] = Field(default=None, foreign_key="profile.id")
+    profile_id: Optional[int] = Field(default=None, foreign_key="profile.id", index=True)
     profile: Optional["Profile"] = Relationship(back_populates="skills")
 
 
+class SkillStat(SQLModel, table=True):
+    """Materialized ranking data for a skill, maintained by skill_stats.py"""
+    __tablename__ = "skill_stats"
+    __table_args__ = (
+        Index("ix_skill_stats_ranking", "profile_id", "project_count", "last_project_id"),
+    )
+
+    skill_id: int = Field(foreign_key="skill.id", primary_key=True)
+    profile_id: Optional[int] = None
+    project_count: int = 0  # projects of the same profile listing this skill as a technology
+    last_project_id: Optional[int] = None  # most recent such project, used as a tie-breaker
+
+
+class Change(SQLModel, table=True):
+    """One row written by a committed transaction, appended by changes.py"""
+    __tablename__ = "changes"
+    __table_args__ = (
+        Index("ix_changes_profile_seq", "profile_id", "seq"),
+        {"sqlite_autoincrement": True},  # seq is never reused, even after old rows are deleted
+    )
+
+    seq: Optional[int] = Field(default=None, primary_key=True)
+    profile_id: Optional[int] = None
+    entity: str  # type name as in batch operations: profile, project, skill, ...
+    entity_id: int
+    op: str  # create, update, delete, or import for profiles loaded by bulk.import_batch
+    data: Optional[str] = None  # JSON: all columns for create/import, the changed ones for update
+    created_at: str
+
+
 class Link(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     platform: str  # github, linkedin, portfolio
     url: str
-    profile_id: Optional[int] = Field(default=None, foreign_key="profile.id")
+    profile_id: Optional[int] = Field(default=None, foreign_key="profile.id", index=True)
     profile: Optional["Profile"] = Relationship(back_populates="links")
 
 
@@ -25,7 +58,7 @@ class Education(SQLModel, table=True):
     field_of_study: str
     start_date: str
     end_date: Optional[str] = None
-    profile_id: Optional[int] = Field(default=None, foreign_key="profile.id")
+    profile_id: Optional[int] = Field(default=None, foreign_key="profile.id", index=True)
     profile: Optional["Profile"] = Relationship(back_populates="education")
 
 
@@ -36,7 +69,7 @@ class WorkExperience(SQLModel, table=True):
     description: str
     start_date: str
     end_date: Optional[str] = None
-    profile_id: Optional[int] = Field(default=None, foreign_key="profile.id")
+    profile_id: Optional[int] = Field(default=None, foreign_key="profile.id", index=True)
     profile: Optional["Profile"] = Relationship(back_populates="work")
 
 
@@ -44,30 +77,123 @@ class ProjectLink(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     platform: str  # github, demo, docs
     url: str
-    project_id: Optional[int] = Field(default=None, foreign_key="project.id")
+    project_id: Optional[int] = Field(default=None, foreign_key="project.id", index=True)
     project: Optional["Project"] = Relationship(back_populates="links")
 
 
+class ProjectTechnology(SQLModel, table=True):
+    """One row per technology of a project, derived from ``Project.technologies``"""
+    __table_args__ = (
+        Index("ix_projecttechnology_name_lower_project_id", "name_lower", "project_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+    name_lower: str
+    project_id: Optional[int] = Field(default=None, foreign_key="project.id", index=True)
+    project: Optional["Project"] = Relationship(back_populates="technology_index")
+
+
 class Project(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str = Field(index=True)
     description: str
     technologies: str  # comma-separated for simplicity
-    profile_id: Optional[int] = Field(default=None, foreign_key="profile.id")
+    profile_id: Optional[int] = Field(default=None, foreign_key="profile.id", index=True)
     profile: Optional["Profile"] = Relationship(back_populates="projects")
-    links: List["ProjectLink"] = Relationship(back_populates="project")
+    links: List["ProjectLink"] = Relationship(
+        back_populates="project",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan"},
+    )
+    technology_index: List["ProjectTechnology"] = Relationship(
+        back_populates="project",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan"},
+    )
 
 
 class Profile(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
+    slug: Optional[str] = Field(default=None, unique=True, index=True)  # derived from name when not set
     name: str
     email: str
     bio: Optional[str] = None
     location: Optional[str] = None
     
-    # Relationships
-    skills: List["Skill"] = Relationship(back_populates="profile")
-    projects: List["Project"] = Relationship(back_populates="profile")
-    education: List["Education"] = Relationship(back_populates="profile")
-    work: List["WorkExperience"] = Relationship(back_populates="profile")
-    links: List["Link"] = Relationship(back_populates="profile")
+    # Relationships (children are deleted with their profile)
+    skills: List["Skill"] = Relationship(back_populates="profile", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    projects: List["Project"] = Relationship(back_populates="profile", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    education: List["Education"] = Relationship(back_populates="profile", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    work: List["WorkExperience"] = Relationship(back_populates="profile", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    links: List["Link"] = Relationship(back_populates="profile", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+
+
+def split_technologies(technologies: str) -> List[str]:
+    """Split a comma-separated technologies string, dropping blanks and duplicates"""
+    seen = set()
+    names = []
+    for name in technologies.split(","):
+        name = name.strip()
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+def technology_rows(technologies: str) -> List[ProjectTechnology]:
+    return [ProjectTechnology(name=name, name_lower=name.lower()) for name in split_technologies(technologies)]
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _sync_project_technologies(session, flush_context, instances):
+    """Keep ``ProjectTechnology`` rows in step with ``Project.technologies``"""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Project):
+            continue
+        if obj in session.new or inspect(obj).attrs.technologies.history.has_changes():
+            obj.technology_index = technology_rows(obj.technologies or "")
+
+
+def slugify(value: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")
+    # All-digit slugs would be ambiguous with ids in /api/profiles/{id_or_slug}
+    return slug if slug and not slug.isdigit() else f"profile-{slug}".rstrip("-")
+
+
+def check_slug(slug) -> str:
+    """Return a client-supplied ``slug`` if ``slugify`` would produce it, else raise ``ValueError``"""
+    if not isinstance(slug, str) or slugify(slug) != slug:
+        raise ValueError("'slug' must be lowercase letters, digits and hyphens, and not only digits")
+    return slug
+
+
+def claim_slugs(session, bases: List[str]) -> List[str]:
+    """Unique slugs for ``bases``, avoiding each other and slugs already stored.
+
+    Holds the write lock from the read on, so concurrent writers claiming the
+    same slug take turns instead of one failing on the unique index.
+    """
+    from database import begin_write
+
+    begin_write(session.connection())
+    with session.no_autoflush:
+        taken = set(session.execute(select(Profile.slug).where(Profile.slug.in_(set(bases)))).scalars())
+        for base in taken.copy():
+            taken.update(session.execute(select(Profile.slug).where(Profile.slug.like(f"{base}-%"))).scalars())
+    slugs = []
+    for base in bases:
+        slug, n = base, 1
+        while slug in taken:
+            n += 1
+            slug = f"{base}-{n}"
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _assign_profile_slugs(session, flush_context, instances):
+    """Give new profiles without a slug a unique one derived from their name"""
+    profiles = [obj for obj in session.new if isinstance(obj, Profile) and not obj.slug]
+    if profiles:
+        for profile, slug in zip(profiles, claim_slugs(session, [slugify(p.name) for p in profiles])):
+            profile.slug = slug
@@ -0,0 +1,35 @@
+from bisect import bisect_right
+from typing import List, Optional, Sequence, Tuple
+
+from sqlmodel import Session
+
+
+def keyset_page(session: Session, query, id_column, cursor: Optional[int], limit: Optional[int]) -> Tuple[List, Optional[int]]:
+    """Fetch one page of ``query`` ordered by ``id_column``.
+
+    ``cursor`` is the last id of the previous page; rows after it are returned.
+    One extra row is fetched to tell whether another page exists, in which case
+    the last id of this page is returned as the next cursor.
+    """
+    query = query.order_by(id_column)
+    if cursor is not None:
+        query = query.where(id_column > cursor)
+    if limit is None:
+        return session.exec(query).all(), None
+
+    rows = session.exec(query.limit(limit + 1)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
+
+def keyset_slice(rows: Sequence, cursor: Optional[int], limit: Optional[int]) -> Tuple[Sequence, Optional[int]]:
+    """``keyset_page`` over rows already in memory and sorted by ``id``"""
+    start = 0 if cursor is None else bisect_right(rows, cursor, key=lambda row: row.id)
+    if limit is None:
+        return rows[start:], None
+    page = rows[start:start + limit]
+    if len(rows) > start + limit:
+        return page, page[-1].id
+    return page, None
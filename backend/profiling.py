@@ -0,0 +1,348 @@
+"""Opt-in request profiling: phase timings, a slow-request log and on-demand profiles.
+
+Off unless ``PROFILING_ENABLED=1``. ``ProfilingMiddleware`` then gives every
+request a ``RequestTrace``, kept in a context variable so threadpool work
+reports to it too. The trace collects:
+
+* ``sql``: statement count and time, from cursor listeners that
+  ``trace_engine`` attaches to an engine, plus the statements themselves;
+* spans opened with ``span(name)``: ``handler`` (building the payload,
+  queries included), ``serialize`` (rows to dicts), ``json`` (encoding and
+  ETag) and ``compress``. ``orm`` is derived: handler time spent neither in
+  SQL nor in serializers, i.e. hydrating ORM objects and the handler's own code.
+
+Requests slower than ``SLOW_REQUEST_MS`` are logged with their phases and
+SQL. A request with ``X-Debug-Token: <PROFILE_TOKEN>`` gets a ``Server-Timing``
+header; adding ``X-Profile: cprofile`` or ``X-Profile: pyinstrument`` replaces
+its body with a profile of the request. ``PROFILE_SAMPLE_RATE`` profiles that
+fraction of all requests into ``PROFILE_DIR``.
+"""
+import cProfile
+import hmac
+import io
+import itertools
+import logging
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from functools import reduce
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import pyinstrument
+    from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer
+    from pyinstrument.session import Session as ProfileSession
+except ImportError:  # optional; cProfile is always available
+    pyinstrument = None
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0").lower() in ("1", "true", "yes")
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))  # 0 turns the slow log off
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")  # empty: no Server-Timing and no X-Profile
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILER = os.getenv("PROFILER", "cprofile")  # cprofile or pyinstrument, for sampled profiles
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "me-api-profiles"))
+PROFILE_TOP_FUNCTIONS = 40
+LOGGED_STATEMENT_CHARS = 1000
+
+# sql counts cursor.execute only; fetching the rows falls in orm
+PHASE_ORDER = {name: i for i, name in enumerate(("total", "handler", "sql", "orm", "serialize", "json", "compress"))}
+
+PROFILERS = ("cprofile", "pyinstrument") if pyinstrument is not None else ("cprofile",)
+
+logger = logging.getLogger(__name__)
+
+
+class Capture:
+    """Profile of one request: a profiler on the event loop plus one per threadpool call.
+
+    A profiler on the event loop thread also sees whatever other requests run
+    there while this one awaits.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._threads = []
+        self._lock = threading.Lock()
+        self._main = self._start(in_task=True)
+
+    def _start(self, in_task: bool):
+        if self.kind == "pyinstrument":
+            profiler = pyinstrument.Profiler(interval=0.0005, async_mode="enabled" if in_task else "disabled")
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def _stop(self, profiler):
+        if self.kind == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+
+    def enter_thread(self):
+        return self._start(in_task=False)
+
+    def exit_thread(self, profiler):
+        self._stop(profiler)
+        with self._lock:
+            self._threads.append(profiler)
+
+    def stop(self):
+        self._stop(self._main)
+
+    def _combined(self):
+        profilers = [self._main] + self._threads
+        if self.kind == "pyinstrument":
+            return reduce(ProfileSession.combine, [p.last_session for p in profilers])
+        return pstats.Stats(*profilers)
+
+    def report(self) -> Tuple[bytes, str]:
+        """Human-readable profile and its media type"""
+        if self.kind == "pyinstrument":
+            return ConsoleRenderer(unicode=True, show_all=False).render(self._combined()).encode(), "text/plain; charset=utf-8"
+        out = io.StringIO()
+        stats = self._combined()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        return out.getvalue().encode(), "text/plain; charset=utf-8"
+
+    def save(self, name: str) -> str:
+        """Write the profile to PROFILE_DIR: .prof for cProfile (snakeviz, pstats), .html for pyinstrument"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if self.kind == "pyinstrument":
+            path = os.path.join(PROFILE_DIR, f"{name}.html")
+            with open(path, "w") as f:
+                f.write(HTMLRenderer().render(self._combined()))
+        else:
+            path = os.path.join(PROFILE_DIR, f"{name}.prof")
+            self._combined().dump_stats(path)
+        return path
+
+
+class RequestTrace:
+    __slots__ = ("start", "phases", "sql_count", "sql_seconds", "statements", "capture")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements: List[Tuple[float, str]] = []  # (seconds, SQL), the first SLOW_REQUEST_MAX_STATEMENTS
+        self.capture: Optional[Capture] = None
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def timings(self) -> Dict[str, float]:
+        """Milliseconds per phase, starting with the total so far"""
+        phases = {"total": time.perf_counter() - self.start, "sql": self.sql_seconds, **self.phases}
+        if "handler" in phases:
+            phases["orm"] = max(phases["handler"] - self.sql_seconds - phases.get("serialize", 0.0), 0.0)
+        ordered = sorted(phases, key=lambda name: PHASE_ORDER.get(name, len(PHASE_ORDER)))
+        return {name: phases[name] * 1000 for name in ordered}
+
+
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+class span:
+    """``with span("serialize"): ...`` adds the block's time to the current request's phases"""
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = _trace.get()
+        if self.trace is not None:
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            self.trace.add(self.name, time.perf_counter() - self.start)
+
+
+class thread_profile:
+    """Profile threadpool work when its request is being profiled (see ``database.run_db``)"""
+    __slots__ = ("capture", "profiler")
+
+    def __enter__(self):
+        trace = _trace.get()
+        self.capture = trace.capture if trace is not None else None
+        if self.capture is not None:
+            self.profiler = self.capture.enter_thread()
+
+    def __exit__(self, *exc):
+        if self.capture is not None:
+            self.capture.exit_thread(self.profiler)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profiling_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["profiling_query_start"].pop()
+    trace = _trace.get()
+    if trace is not None:
+        trace.sql_count += 1
+        trace.sql_seconds += elapsed
+        if len(trace.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+            trace.statements.append((elapsed, statement))
+
+
+def trace_engine(engine):
+    """Count and time the statements ``engine`` executes for the current request"""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def server_timing(trace: RequestTrace) -> str:
+    parts = []
+    for name, ms in trace.timings().items():
+        desc = f';desc="{trace.sql_count} statements"' if name == "sql" else ""
+        parts.append(f"{name};dur={ms:.2f}{desc}")
+    return ", ".join(parts)
+
+
+def _statement_text(statement: str) -> str:
+    statement = " ".join(statement.split())
+    statement = re.sub(r"\?(?:, \?){3,}", lambda m: f"?, ... {m.group().count('?')} parameters", statement)
+    return statement if len(statement) <= LOGGED_STATEMENT_CHARS else statement[:LOGGED_STATEMENT_CHARS] + " ..."
+
+
+def log_slow_request(scope, status: int, trace: RequestTrace):
+    timings = trace.timings()
+    path = scope["path"] + (f"?{scope['query_string'].decode()}" if scope.get("query_string") else "")
+    lines = [
+        f"slow request {scope['method']} {path} -> {status} in {timings.pop('total'):.1f} ms: "
+        + ", ".join(f"{name} {ms:.1f} ms" for name, ms in timings.items())
+        + f" ({trace.sql_count} statements)"
+    ]
+    lines += [f"  {seconds * 1000:8.2f} ms  {_statement_text(statement)}" for seconds, statement in trace.statements]
+    if trace.sql_count > len(trace.statements):
+        lines.append(f"  ... {trace.sql_count - len(trace.statements)} more statements")
+    logger.warning("\n".join(lines))
+
+
+_profile_numbers = itertools.count(1)
+
+
+def _profile_name(scope) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", scope["path"]).strip("-") or "root"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_profile_numbers)}-{scope['method']}-{slug}"
+
+
+# cProfile and pyinstrument each allow one active profiler per thread, so a
+# worker profiles one request at a time
+_capturing = threading.Lock()
+
+
+async def _send_body(send, status: int, body: bytes, media_type: str, headers: List[Tuple[bytes, bytes]] = ()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", media_type.encode()), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class ProfilingMiddleware:
+    """Per-request phase timings, slow-request log and header-triggered profiles"""
+
+    def __init__(
+        self,
+        app,
+        token: str = PROFILE_TOKEN,
+        slow_ms: float = SLOW_REQUEST_MS,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        profiler: str = PROFILER,
+    ):
+        self.app = app
+        self.token = token.encode()
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.profiler = profiler if profiler in PROFILERS else "cprofile"
+
+    def _debug(self, headers: Headers) -> bool:
+        given = headers.get("x-debug-token")
+        return bool(self.token) and given is not None and hmac.compare_digest(given.encode(), self.token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        debug = self._debug(headers)
+        requested = headers.get("x-profile") if debug else None
+        kind = None
+        if requested:
+            if requested not in PROFILERS:
+                await _send_body(send, 400, orjson.dumps({"detail": f"X-Profile must be one of {', '.join(PROFILERS)}"}),
+                                 "application/json")
+                return
+            kind = requested
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            kind = self.profiler
+        if kind is not None and not _capturing.acquire(blocking=False):
+            if requested:
+                await _send_body(send, 409, b'{"detail":"Another request is being profiled"}', "application/json")
+                return
+            kind = None  # skip this sample
+
+        trace = RequestTrace()
+        if kind is not None:
+            try:
+                trace.capture = Capture(kind)
+            except Exception:
+                _capturing.release()
+                logger.exception("could not start the %s profiler", kind)
+                if requested:
+                    await _send_body(send, 500, b'{"detail":"The profiler could not be started"}', "application/json")
+                    return
+        token = _trace.set(trace)
+        status = 500
+
+        async def send_traced(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if debug and not requested:
+                    MutableHeaders(scope=message).append("Server-Timing", server_timing(trace))
+            if not requested:  # a requested profile replaces the response
+                await send(message)
+
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            _trace.reset(token)
+            if trace.capture is not None:
+                trace.capture.stop()
+                _capturing.release()
+            if self.slow_ms > 0 and (time.perf_counter() - trace.start) * 1000 >= self.slow_ms:
+                log_slow_request(scope, status, trace)
+
+        if requested:
+            body, media_type = trace.capture.report()
+            await _send_body(send, 200, body, media_type, [
+                (b"server-timing", server_timing(trace).encode()),
+                (b"x-profiled-status", str(status).encode()),
+            ])
+        elif trace.capture is not None:
+            await run_in_threadpool(trace.capture.save, _profile_name(scope))
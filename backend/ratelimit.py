@@ -0,0 +1,271 @@
+"""Per-client rate limiting and load shedding.
+
+``RateLimitMiddleware`` runs two checks before a request reaches its handler:
+
+* a token bucket per client and route. Each budget refills at ``rate``
+  requests per second up to ``burst``; an empty bucket answers 429 with
+  ``Retry-After``;
+* a cap on requests in flight in this worker. Past ``MAX_IN_FLIGHT`` a new
+  request gets 503 with ``Retry-After`` instead of queueing for the threadpool.
+
+Clients are identified by their ``X-API-Key`` when it is one of ``API_KEYS``
+(unknown keys would let a client mint fresh budgets), otherwise by IP address.
+Buckets live in memory, or in the SQLite file ``RATE_LIMIT_SQLITE_PATH`` that
+all workers on a host share. SQLite takes run on a thread of their own, off
+the event loop; if the file is locked or broken, requests are let through.
+Health checks and ``/metrics`` are never limited.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import orjson
+from starlette.datastructures import Headers
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "0").lower() in ("1", "true", "yes")
+RATE_LIMITS = os.getenv("RATE_LIMITS", "")  # "route template=rate/burst,...", overrides DEFAULT_BUDGETS
+RATE_LIMIT_DEFAULT = os.getenv("RATE_LIMIT_DEFAULT", "")  # budget for every other route, e.g. "50/100"
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0").lower() in ("1", "true", "yes")
+API_KEYS = frozenset(key for key in os.getenv("API_KEYS", "").split(",") if key)
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "0"))  # 0 disables shedding
+SHED_RETRY_AFTER_SECONDS = int(os.getenv("SHED_RETRY_AFTER_SECONDS", "1"))
+
+logger = logging.getLogger(__name__)
+
+EXEMPT_PATHS = ("/health", "/metrics")
+# Long-lived streams that hold no threadpool slot while idle; not counted by MAX_IN_FLIGHT
+STREAM_SUFFIXES = ("/changes/stream",)
+
+
+class Budget(NamedTuple):
+    rate: float  # tokens added per second
+    burst: float  # bucket capacity
+
+    @classmethod
+    def parse(cls, spec: str) -> "Budget":
+        """``"rate/burst"``, or just ``"rate"`` for a burst of the same size"""
+        rate, _, burst = spec.partition("/")
+        return cls(float(rate), float(burst or rate))
+
+
+# The endpoints that do the most work per request; every method of a route shares its budget
+DEFAULT_BUDGETS = {
+    "/api/search": Budget(10, 20),
+    "/api/profiles/{profile_ref}/search": Budget(10, 20),
+    "/api/profile": Budget(20, 40),
+    "/api/profiles/{profile_ref}": Budget(20, 40),
+    "/api/batch": Budget(5, 10),
+    "/api/import": Budget(1, 5),
+    "/api/export": Budget(0.2, 2),
+}
+
+
+def parse_budgets(spec: str) -> Dict[str, Budget]:
+    budgets = {}
+    for item in spec.split(","):
+        if item.strip():
+            route, _, budget = item.rpartition("=")
+            budgets[route.strip()] = Budget.parse(budget.strip())
+    return budgets
+
+
+class MemoryBucketStore:
+    """Buckets in a dict, private to this worker"""
+
+    executor = None  # takes are cheap enough for the event loop
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, List[float]] = {}  # key -> [tokens, updated_at]
+
+    def take(self, key: str, budget: Budget, now: float, idle_after: float) -> float:
+        """Take one token; 0.0 if granted, otherwise seconds until one is available"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now, idle_after)
+            bucket = self._buckets[key] = [budget.burst, now]
+        tokens = min(budget.burst, bucket[0] + (now - bucket[1]) * budget.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / budget.rate
+
+    def _prune(self, now: float, idle_after: float):
+        # A bucket idle long enough to refill is the same as a missing one
+        self._buckets = {k: b for k, b in self._buckets.items() if now - b[1] < idle_after}
+        if len(self._buckets) >= self.max_keys:
+            for key in list(self._buckets)[: len(self._buckets) // 2]:  # oldest first
+                del self._buckets[key]
+
+
+_TAKE = """
+INSERT INTO rate_limit_buckets (key, tokens, updated_at) VALUES (:key, :burst - 1, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:burst, tokens + (:now - updated_at) * :rate) - 1,
+    updated_at = :now
+WHERE min(:burst, tokens + (:now - updated_at) * :rate) >= 1
+RETURNING tokens
+"""
+
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file, so every worker on the host draws on the same budget.
+
+    Use a file of its own: every request writes a row, which in the main
+    database would change ``data_version`` and clear every response cache.
+    A refused request writes nothing; its refill is derived from the time of
+    the last granted one.
+    """
+
+    PRUNE_EVERY = 1000
+    # Seconds to wait for another worker's write before the request is let through
+    BUSY_TIMEOUT = 0.25
+
+    def __init__(self, path: str):
+        # One thread owns the connection; the middleware runs every take there
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="ratelimit")
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=self.BUSY_TIMEOUT)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = OFF")  # losing the last buckets in a crash is harmless
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._takes = 0
+
+    def take(self, key: str, budget: Budget, now: float, idle_after: float) -> float:
+        params = {"key": key, "rate": budget.rate, "burst": budget.burst, "now": now}
+        self._takes += 1
+        if self._takes % self.PRUNE_EVERY == 0:
+            self._conn.execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (now - idle_after,))
+        if self._conn.execute(_TAKE, params).fetchone() is not None:
+            return 0.0
+        row = self._conn.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+        if row is None:  # pruned by another worker in between
+            return 0.0
+        tokens = min(budget.burst, row[0] + (now - row[1]) * budget.rate)
+        return max(1 - tokens, 0.0) / budget.rate
+
+
+def default_store():
+    return SQLiteBucketStore(RATE_LIMIT_SQLITE_PATH) if RATE_LIMIT_SQLITE_PATH else MemoryBucketStore()
+
+
+def client_id(scope) -> str:
+    """Rate-limit identity of a request: a known API key, else the client IP"""
+    headers = Headers(scope=scope)
+    api_key = headers.get("x-api-key")
+    if api_key and api_key in API_KEYS:
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:16]
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def reject(send, status: int, retry_after: float, detail: str):
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """Token-bucket rate limits per client and route, plus an in-flight cap"""
+
+    def __init__(
+        self,
+        app,
+        routes: list,
+        budgets: Optional[Dict[str, Budget]] = None,
+        default_budget: Optional[Budget] = None,
+        store=None,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        enabled: bool = RATE_LIMIT_ENABLED,
+    ):
+        self.app = app
+        # app.routes is still being filled when middleware is added, so routes are resolved on first use
+        self._all_routes = routes
+        self._routes: Optional[List[Tuple[object, Budget]]] = None
+        if budgets is None:
+            budgets = {**DEFAULT_BUDGETS, **parse_budgets(RATE_LIMITS)}
+        if default_budget is None and RATE_LIMIT_DEFAULT:
+            default_budget = Budget.parse(RATE_LIMIT_DEFAULT)
+        self.budgets = budgets if enabled else {}
+        self.default_budget = default_budget if enabled else None
+        self.store = store or default_store()
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        # Buckets untouched for this long are full again and can be forgotten
+        all_budgets = list(self.budgets.values()) + ([self.default_budget] if self.default_budget else [])
+        self.idle_after = max((b.burst / b.rate for b in all_budgets), default=0.0)
+
+    async def _take(self, key: str, budget: Budget) -> float:
+        now = time.time()
+        try:
+            if self.store.executor is None:
+                return self.store.take(key, budget, now, self.idle_after)
+            return await asyncio.get_running_loop().run_in_executor(
+                self.store.executor, self.store.take, key, budget, now, self.idle_after
+            )
+        except sqlite3.Error as exc:
+            # Fail open: a busy or broken bucket file must not turn requests into 500s
+            logger.warning("rate limit store unavailable, letting the request through: %s", exc)
+            return 0.0
+
+    def _budget_for(self, scope) -> Tuple[Optional[object], Optional[Budget]]:
+        if self._routes is None:
+            self._routes = [(r, self.budgets[r.path]) for r in self._all_routes if getattr(r, "path", None) in self.budgets]
+        path = scope["path"]
+        for route, budget in self._routes:
+            if route.path_regex.match(path):
+                return route, budget
+        return None, self.default_budget
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path.startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        route, budget = self._budget_for(scope)
+        if budget is not None:
+            if route is not None:
+                scope["route"] = route  # labels the 429 with its route in the metrics
+            template = route.path if route is not None else "*"
+            wait = await self._take(f"{template}|{client_id(scope)}", budget)
+            if wait > 0:
+                await reject(send, 429, wait, "Rate limit exceeded")
+                return
+
+        if self.max_in_flight <= 0 or path.endswith(STREAM_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+        if self.in_flight >= self.max_in_flight:
+            await reject(send, 503, SHED_RETRY_AFTER_SECONDS, "Server is busy")
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,205 @@
+"""Response models shared by the endpoints.
+
+Handlers return pre-rendered bytes from the response cache, so these models
+document the API (OpenAPI schema, typed clients) without adding a validation
+pass to the hot path.
+"""
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import Field
+
+from sqlmodel import SQLModel
+
+
+class LinkIn(SQLModel):
+    platform: str
+    url: str
+
+
+class LinkOut(LinkIn):
+    pass
+
+
+class SkillIn(SQLModel):
+    name: str
+
+
+class SkillOut(SkillIn):
+    id: int
+
+
+class ProjectIn(SQLModel):
+    title: str
+    description: str = ""
+    technologies: Optional[List[str]] = None
+    links: Optional[List[LinkIn]] = None
+
+
+class ProjectOut(SQLModel):
+    # Every field is optional because clients can select fields with ?fields=
+    id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    technologies: Optional[List[str]] = None
+    links: Optional[List[LinkOut]] = None
+
+
+class EducationIn(SQLModel):
+    institution: str
+    degree: str
+    field_of_study: str
+    start_date: str
+    end_date: Optional[str] = None
+
+
+class EducationOut(EducationIn):
+    id: int
+
+
+class WorkIn(SQLModel):
+    company: str
+    position: str
+    description: str
+    start_date: str
+    end_date: Optional[str] = None
+
+
+class WorkOut(WorkIn):
+    id: int
+
+
+class ProfileIn(SQLModel):
+    slug: Optional[str] = None
+    name: str
+    email: str
+    bio: Optional[str] = None
+    location: Optional[str] = None
+
+
+class ProfileSummaryOut(ProfileIn):
+    id: int
+
+
+class ProfileOut(ProfileSummaryOut):
+    # Collections are omitted when left out of ?include=
+    skills: Optional[List[SkillOut]] = None
+    projects: Optional[List[ProjectOut]] = None
+    education: Optional[List[EducationOut]] = None
+    work: Optional[List[WorkOut]] = None
+    links: Optional[List[LinkOut]] = None
+
+
+class ProfileListOut(SQLModel):
+    profiles: List[ProfileSummaryOut]
+    next_cursor: Optional[int] = None
+
+
+class ProjectsOut(SQLModel):
+    projects: List[ProjectOut]
+    next_cursor: Optional[int] = None
+
+
+class SkillsOut(SQLModel):
+    skills: List[SkillOut]
+    next_cursor: Optional[int] = None
+
+
+class RankedSkillOut(SkillOut):
+    score: int  # projects of the profile that use the skill
+
+
+class TopSkillsOut(SQLModel):
+    skills: List[RankedSkillOut]
+
+
+class ChangeOut(SQLModel):
+    seq: int
+    profile_id: Optional[int] = None
+    entity: str
+    id: int
+    op: Literal["create", "update", "delete", "import"]
+    data: Optional[Dict[str, Any]] = None  # all columns for create/import, the changed ones for update
+    at: str
+
+
+class ChangesOut(SQLModel):
+    changes: List[ChangeOut]
+    last_seq: int  # pass as ?since= to get the next changes
+    has_more: bool
+
+
+class WorkListOut(SQLModel):
+    work: List[WorkOut]
+    next_cursor: Optional[int] = None
+
+
+class EducationListOut(SQLModel):
+    education: List[EducationOut]
+    next_cursor: Optional[int] = None
+
+
+class SearchHit(SQLModel):
+    type: str
+    id: int
+    title: str
+    snippet: str
+    score: float
+
+
+class SearchOut(SQLModel):
+    query: str
+    total: int
+    limit: int
+    offset: int
+    hits: List[SearchHit]
+
+
+class LegacySearchResults(SQLModel):
+    projects: List[ProjectOut]
+    skills: List[SkillOut]
+
+
+class LegacySearchOut(SQLModel):
+    query: str
+    results: LegacySearchResults
+
+
+class ProfileUpdateOut(SQLModel):
+    message: str
+    profile: ProfileSummaryOut
+
+
+class ImportLineError(SQLModel):
+    line: int
+    error: str
+
+
+class ImportReportOut(SQLModel):
+    profiles: int
+    rows: int
+    error_count: int
+    errors: List[ImportLineError]
+
+
+class BatchOperation(SQLModel):
+    op: Literal["create", "update", "delete"]
+    type: Literal["profile", "skill", "project", "project_link", "education", "work", "link"]
+    id: Optional[int] = None  # required for update and delete
+    ref: Optional[str] = None  # name a created row so later operations can use "$ref"
+    data: Dict[str, Any] = {}
+
+
+class BatchRequest(SQLModel):
+    operations: List[BatchOperation] = Field(min_length=1, max_length=1000)
+
+
+class BatchResult(SQLModel):
+    index: int
+    op: str
+    type: str
+    id: int
+    status: str
+
+
+class BatchOut(SQLModel):
+    results: List[BatchResult]
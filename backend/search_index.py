@@ -0,0 +1,461 @@
+"""SQLite FTS5 full-text index over projects, skills, work experience and education.
+
+The ``search_index`` virtual table is created and dropped together with the
+SQLModel tables, and an ``after_flush`` hook keeps it in step with every ORM
+write, including ``seed_database``.
+
+Fuzzy search (``fuzzy_search_hits``) also needs the words that are indexed:
+``search_words`` holds each distinct word once, and ``search_trigrams`` is an
+FTS5 trigram index over it. Writes only ever add words; words that no longer
+occur anywhere are dropped by ``rebuild_search_index``.
+"""
+import re
+import unicodedata
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import DDL, event, text
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import SQLModel, Session, select
+
+from models import Project, Skill, WorkExperience, Education
+from profiling import span
+
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+# snippet() window, in tokens
+SNIPPET_TOKENS = 16
+
+# bm25() weights, one per column: kind, ref_id, profile_id, title, body
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+# profile_id is an indexed column so a search is scoped by intersecting its
+# posting list inside FTS5 rather than filtering every match afterwards
+CREATE_SEARCH_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "kind UNINDEXED, ref_id UNINDEXED, profile_id, title, body, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+# A row's rowid is derived from its (kind, ref_id): kind and ref_id are
+# UNINDEXED, so filtering on them would scan the whole table, while a rowid
+# lookup is a b-tree seek
+KINDS = ("project", "skill", "work", "education")
+
+# The distinct indexed words and a trigram index over them, for fuzzy search.
+# Words shorter than a trigram, and numbers, are left out.
+CREATE_SEARCH_WORDS = (
+    "CREATE TABLE IF NOT EXISTS search_words (id INTEGER PRIMARY KEY, word VARCHAR NOT NULL UNIQUE)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_trigrams USING fts5("
+    "word, content = 'search_words', content_rowid = 'id', tokenize = 'trigram')",
+    "CREATE TRIGGER IF NOT EXISTS search_words_insert AFTER INSERT ON search_words BEGIN "
+    "INSERT INTO search_trigrams (rowid, word) VALUES (new.id, new.word); END",
+)
+
+event.listen(SQLModel.metadata, "after_create", DDL(CREATE_SEARCH_INDEX))
+for _statement in CREATE_SEARCH_WORDS:
+    event.listen(SQLModel.metadata, "after_create", DDL(_statement))
+event.listen(SQLModel.metadata, "before_drop", DDL("DROP TABLE IF EXISTS search_index"))
+event.listen(SQLModel.metadata, "before_drop", DDL("DROP TABLE IF EXISTS search_trigrams"))
+event.listen(SQLModel.metadata, "before_drop", DDL("DROP TABLE IF EXISTS search_words"))
+
+# Lowest trigram similarity (defined as in pg_trgm, whose default this is) of a fuzzy match
+FUZZY_THRESHOLD = 0.3
+# Similar words tried in place of each query word
+FUZZY_EXPANSIONS = 5
+# Words fetched from search_trigrams per query word before computing similarity
+FUZZY_CANDIDATE_WORDS = 100
+# Best BM25 matches re-ranked by similarity; hits past them are not returned
+FUZZY_CANDIDATES = 1000
+FUZZY_MAX_WORDS = 8
+
+# FTS5's unicode61 tokenizer: runs of letters and digits, case- and diacritic-folded
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def fold(token: str) -> str:
+    if token.isascii():
+        return token.lower()
+    decomposed = unicodedata.normalize("NFKD", token.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokens(text: str) -> List[str]:
+    if text.isascii():
+        return TOKEN_PATTERN.findall(text.lower())
+    return [fold(token) for token in TOKEN_PATTERN.findall(text)]
+
+
+def project_document(ref_id, profile_id, title, description, technologies):
+    technologies = ", ".join(t.strip() for t in technologies.split(","))
+    return ("project", ref_id, profile_id, title, f"{description}\n{technologies}")
+
+
+def skill_document(ref_id, profile_id, name):
+    return ("skill", ref_id, profile_id, name, "")
+
+
+def work_document(ref_id, profile_id, company, position, description):
+    return ("work", ref_id, profile_id, f"{position} at {company}", description)
+
+
+def education_document(ref_id, profile_id, institution, degree, field_of_study):
+    return ("education", ref_id, profile_id, f"{degree}, {institution}", field_of_study)
+
+
+def document(obj) -> Optional[Tuple[str, int, Optional[int], str, str]]:
+    """Return the ``(kind, ref_id, profile_id, title, body)`` row indexed for ``obj``"""
+    if isinstance(obj, Project):
+        return project_document(obj.id, obj.profile_id, obj.title, obj.description, obj.technologies)
+    if isinstance(obj, Skill):
+        return skill_document(obj.id, obj.profile_id, obj.name)
+    if isinstance(obj, WorkExperience):
+        return work_document(obj.id, obj.profile_id, obj.company, obj.position, obj.description)
+    if isinstance(obj, Education):
+        return education_document(obj.id, obj.profile_id, obj.institution, obj.degree, obj.field_of_study)
+    return None
+
+
+def document_words(docs: Iterable[tuple]) -> Set[str]:
+    """Distinct words of ``docs`` that fuzzy search can correct to"""
+    words = set()
+    for _, _, _, title, body in docs:
+        words.update(tokens(title))
+        words.update(tokens(body))
+    return {word for word in words if len(word) >= 3 and not word.isdigit()}
+
+
+def doc_rowid(kind: str, ref_id: int) -> int:
+    return ref_id * len(KINDS) + KINDS.index(kind)
+
+
+_DELETE = text("DELETE FROM search_index WHERE rowid = :rowid")
+_INSERT = text(
+    "INSERT INTO search_index (rowid, kind, ref_id, profile_id, title, body) "
+    "VALUES (:rowid, :kind, :ref_id, :profile_id, :title, :body)"
+)
+_INSERT_WORD = text("INSERT OR IGNORE INTO search_words (word) VALUES (:word)")
+
+
+def _row(doc):
+    kind, ref_id, profile_id, title, body = doc
+    return {
+        "rowid": doc_rowid(kind, ref_id), "kind": kind, "ref_id": ref_id,
+        "profile_id": profile_id, "title": title, "body": body,
+    }
+
+
+def add_documents(connection, docs):
+    """Index rows inserted without the ORM (e.g. bulk imports) with one executemany"""
+    rows = [_row(doc) for doc in docs]
+    if rows:
+        # Ids can be reused after a delete; drop any row a reused id left behind
+        connection.execute(_DELETE, [{"rowid": row["rowid"]} for row in rows])
+        connection.execute(_INSERT, rows)
+        add_words(connection, document_words(docs))
+
+
+def add_words(connection, words: Iterable[str]):
+    rows = [{"word": word} for word in sorted(words)]
+    if rows:
+        connection.execute(_INSERT_WORD, rows)
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _sync_search_index(session, flush_context):
+    deletes, inserts, docs = [], [], []
+    for obj in session.deleted:
+        doc = document(obj)
+        if doc:
+            deletes.append({"rowid": doc_rowid(doc[0], doc[1])})
+    for obj in list(session.new) + [o for o in session.dirty if session.is_modified(o)]:
+        doc = document(obj)
+        if doc:
+            deletes.append({"rowid": doc_rowid(doc[0], doc[1])})
+            inserts.append(_row(doc))
+            docs.append(doc)
+    if not deletes:
+        return
+    connection = session.connection()
+    connection.execute(_DELETE, deletes)
+    if inserts:
+        connection.execute(_INSERT, inserts)
+        add_words(connection, document_words(docs))
+
+
+def rebuild_search_index(session: Session):
+    """Re-index every searchable row from scratch"""
+    connection = session.connection()
+    connection.execute(text("DELETE FROM search_index"))
+    for model in (Project, Skill, WorkExperience, Education):
+        rows = [_row(document(obj)) for obj in session.exec(select(model))]
+        if rows:
+            connection.execute(_INSERT, rows)
+    rebuild_search_words(connection)
+    session.commit()
+
+
+def ensure_search_rowids(session: Session):
+    """Re-index databases whose rows predate rowids derived from ``(kind, ref_id)``"""
+    expected = "ref_id * %d + CASE kind %s END" % (
+        len(KINDS), " ".join(f"WHEN '{kind}' THEN {i}" for i, kind in enumerate(KINDS))
+    )
+    connection = session.connection()
+    stale = connection.execute(text(f"SELECT 1 FROM search_index WHERE rowid IS NOT {expected} LIMIT 1")).first()
+    if stale is not None:
+        rebuild_search_index(session)
+
+
+def rebuild_search_words(connection):
+    """Refill ``search_words`` with exactly the words in ``search_index``.
+
+    The words are folded by ``tokens``, like the words ``add_words`` is given
+    and the query words, rather than read from FTS5's own vocabulary.
+    """
+    connection.execute(text("DELETE FROM search_words"))
+    connection.execute(text("INSERT INTO search_trigrams (search_trigrams) VALUES ('delete-all')"))
+    docs = connection.execute(text("SELECT kind, ref_id, profile_id, title, body FROM search_index"))
+    add_words(connection, document_words(docs))
+
+
+def ensure_search_index(session: Session):
+    """Build the index for databases created before it existed or with an older layout"""
+    connection = session.connection()
+    ddl = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = 'search_index'")).scalar()
+    if ddl and "profile_id UNINDEXED" in ddl:
+        connection.execute(text("DROP TABLE search_index"))
+        connection.execute(text(CREATE_SEARCH_INDEX))
+    indexed = connection.execute(text("SELECT 1 FROM search_index LIMIT 1")).first()
+    if indexed is None and session.exec(select(Project.id).limit(1)).first() is not None:
+        rebuild_search_index(session)
+
+
+def ensure_search_words(session: Session):
+    """Create the fuzzy search vocabulary and fill it from an existing index"""
+    connection = session.connection()
+    for statement in CREATE_SEARCH_WORDS:
+        connection.execute(text(statement))
+    if connection.execute(text("SELECT 1 FROM search_words LIMIT 1")).first() is None:
+        rebuild_search_words(connection)
+
+
+def match_expression(q: str, profile_id: int) -> Optional[str]:
+    """Turn free text into a safe FTS5 query scoped to one profile.
+
+    Every word must match the title or body as a prefix.
+    """
+    tokens = re.findall(r"\w+", q.lower())
+    if not tokens:
+        return None
+    words = " ".join(f'"{token}"*' for token in tokens)
+    return f'profile_id : "{int(profile_id)}" AND {{title body}} : ({words})'
+
+
+def _where(expression: str, kinds: Optional[List[str]]) -> Tuple[str, dict]:
+    where = "search_index MATCH :q"
+    params = {"q": expression}
+    if kinds:
+        where += " AND kind IN (%s)" % ", ".join(f":kind{i}" for i in range(len(kinds)))
+        params.update({f"kind{i}": kind for i, kind in enumerate(kinds)})
+    return where, params
+
+
+def search_hits(
+    session: Session,
+    q: str,
+    profile_id: int,
+    kinds: Optional[List[str]] = None,
+    limit: Optional[int] = 20,
+    offset: int = 0,
+) -> Tuple[int, List[dict]]:
+    """Return ``(total, hits)`` for ``q``, best BM25 score first"""
+    expression = match_expression(q, profile_id)
+    if expression is None:
+        return 0, []
+
+    where, params = _where(expression, kinds)
+    connection = session.connection()
+    total = connection.execute(text(f"SELECT count(*) FROM search_index WHERE {where}"), params).scalar()
+    rows = connection.execute(
+        text(
+            "SELECT kind, ref_id, "
+            f"highlight(search_index, 3, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}') AS title, "
+            f"snippet(search_index, 4, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet, "
+            f"bm25(search_index, 0, 0, 0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+            f"FROM search_index WHERE {where} ORDER BY score LIMIT :limit OFFSET :offset"
+        ),
+        {**params, "limit": -1 if limit is None else limit, "offset": offset},
+    ).all()
+    with span("serialize"):
+        hits = [
+            {
+                "type": row.kind,
+                "id": row.ref_id,
+                "title": row.title,
+                "snippet": row.snippet,
+                "score": round(-row.score, 4),
+            }
+            for row in rows
+        ]
+    return total, hits
+
+
+class FuzzyWord(NamedTuple):
+    """A query word: the words a match is compared with, and the prefix terms that match it"""
+    sources: Tuple[str, ...]
+    terms: Tuple[str, ...]
+
+
+def trigrams(word: str) -> Set[str]:
+    """pg_trgm's trigrams: the word padded with two spaces in front and one behind"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: str, b: str) -> float:
+    ta, tb = trigrams(a), trigrams(b)
+    return len(ta & tb) / len(ta | tb)
+
+
+def similar_words(connection, word: str) -> List[str]:
+    """Indexed words at least ``FUZZY_THRESHOLD`` similar to ``word``, most similar first.
+
+    The trigram index narrows the vocabulary to the ``FUZZY_CANDIDATE_WORDS``
+    words sharing the most (and rarest) trigrams, so the cost does not grow
+    with the number of documents.
+    """
+    grams = sorted({word[i:i + 3] for i in range(len(word) - 2)})
+    if not grams:
+        return []
+    rows = connection.execute(
+        text("SELECT word FROM search_trigrams WHERE search_trigrams MATCH :q ORDER BY rank LIMIT :limit"),
+        {"q": " OR ".join(f'"{gram}"' for gram in grams), "limit": FUZZY_CANDIDATE_WORDS},
+    ).scalars()
+    scored = sorted(((similarity(word, candidate), candidate) for candidate in rows), reverse=True)
+    return [candidate for score, candidate in scored[:FUZZY_EXPANSIONS] if score >= FUZZY_THRESHOLD]
+
+
+def fuzzy_words(connection, q: str) -> List[FuzzyWord]:
+    """The query words with the terms each one may match.
+
+    A word matches itself as a prefix. A word that is not in the index also
+    matches its similar indexed words, and a word also matches an indexed word
+    it forms with a neighbour ("tensor flow" -> "tensorflow").
+    """
+    words = tokens(q)[:FUZZY_MAX_WORDS]
+    joined = [a + b for a, b in zip(words, words[1:])]
+    candidates = sorted(set(words + joined))
+    known = set(connection.execute(
+        text("SELECT word FROM search_words WHERE word IN (%s)" % ", ".join(f":w{i}" for i in range(len(candidates)))),
+        {f"w{i}": word for i, word in enumerate(candidates)},
+    ).scalars()) if candidates else set()
+
+    result = []
+    for i, word in enumerate(words):
+        sources = [word] + [j for j in joined[max(i - 1, 0):i + 1] if j in known]
+        terms = list(sources)
+        if word not in known:
+            terms += [t for t in similar_words(connection, word) if t not in terms]
+        result.append(FuzzyWord(tuple(sources), tuple(terms)))
+    return result
+
+
+def fuzzy_expression(words: List[FuzzyWord], profile_id: int) -> Optional[str]:
+    if not words:
+        return None
+    groups = " AND ".join("(%s)" % " OR ".join(f'"{term}"*' for term in word.terms) for word in words)
+    return f'profile_id : "{int(profile_id)}" AND {{title body}} : ({groups})'
+
+
+def _similarity(words: List[FuzzyWord], text_tokens: Set[str], seen: dict) -> float:
+    """Mean over query words of the best similarity to a token the word matches.
+
+    ``seen`` memoizes per (word, token), since the candidates share most tokens.
+    """
+    total = 0.0
+    for i, word in enumerate(words):
+        best = 0.0
+        for token in text_tokens:
+            if token.startswith(word.terms):
+                score = seen.get((i, token))
+                if score is None:
+                    score = seen[i, token] = max(similarity(source, token) for source in word.sources)
+                best = max(best, score)
+        total += best
+    return total / len(words)
+
+
+def fuzzy_search_hits(
+    session: Session,
+    q: str,
+    profile_id: int,
+    kinds: Optional[List[str]] = None,
+    limit: Optional[int] = 20,
+    offset: int = 0,
+) -> Tuple[int, List[dict]]:
+    """Like ``search_hits``, also matching misspelled and split words.
+
+    Scores are trigram similarity to the query, 1.0 when every word matches a
+    whole token as typed, with BM25 breaking ties. Only the
+    ``FUZZY_CANDIDATES`` best BM25 matches are re-ranked, which bounds the
+    work per request; ``total`` counts at most that many, since pages past
+    them are not returned.
+    """
+    connection = session.connection()
+    words = fuzzy_words(connection, q)
+    expression = fuzzy_expression(words, profile_id)
+    if expression is None:
+        return 0, []
+
+    where, params = _where(expression, kinds)
+    # Rank on rowids alone: selecting the text here would copy every match into the sorter
+    ranked = connection.execute(
+        text(
+            f"SELECT rowid, bm25(search_index, 0, 0, 0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+            f"FROM search_index WHERE {where} ORDER BY score LIMIT {FUZZY_CANDIDATES}"
+        ),
+        params,
+    ).all()
+    if not ranked:
+        return 0, []
+    texts = dict(connection.execute(text(
+        "SELECT rowid, title || ' ' || body FROM search_index WHERE rowid IN (%s)"
+        % ", ".join(str(rowid) for rowid, _ in ranked)
+    )).all())
+
+    with span("serialize"):
+        seen = {}
+        scored = sorted(
+            (-_similarity(words, set(tokens(texts[rowid])), seen), score, rowid)
+            for rowid, score in ranked
+        )
+    end = None if limit is None else offset + limit
+    page = scored[offset:end]
+    if not page:
+        return len(ranked), []
+    # Highlight only the page, with the same functions as search_hits
+    rows = {
+        row.rowid: row
+        for row in connection.execute(
+            text(
+                "SELECT rowid, kind, ref_id, "
+                f"highlight(search_index, 3, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}') AS title, "
+                f"snippet(search_index, 4, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet "
+                "FROM search_index WHERE search_index MATCH :q AND rowid IN (%s)"
+                % ", ".join(str(rowid) for _, _, rowid in page)
+            ),
+            {"q": expression},
+        )
+    }
+    with span("serialize"):
+        hits = [
+            {
+                "type": rows[rowid].kind,
+                "id": rows[rowid].ref_id,
+                "title": rows[rowid].title,
+                "snippet": rows[rowid].snippet,
+                "score": round(-score, 4),
+            }
+            for score, _, rowid in page
+        ]
+    return len(ranked), hits
@@ -1,12 +1,12 @@
 from sqlmodel import Session
 from database import engine, create_db_and_tables
+from cache import response_cache
 from models import Profile, Skill, Project, Education, WorkExperience, Link, ProjectLink
+import changes, search_index, skill_stats  # noqa: F401,E401 register the flush hooks kept in step with every write
 
 
 def seed_database():
-    """Seed the database with sample data"""
-    create_db_and_tables()
-    
+    """Seed an empty database with sample data; the schema must already be migrated"""
     with Session(engine) as session:
         # Check if data already exists
         existing_profile = session.query(Profile).first()
@@ -325,8 +325,10 @@ def seed_database():
             session.add(link)
         
         session.commit()
+        response_cache.bump()
         print("✅ Database seeded successfully!")
 
 
 if __name__ == "__main__":
+    create_db_and_tables()
     seed_database()
@@ -0,0 +1,141 @@
+"""Turn ORM rows into response dicts, optionally keeping only requested fields.
+
+Each serializer only touches the attributes it is asked for, and
+``profile_query``/``project_options`` build the matching loader options, so a
+field selection never triggers a lazy load.
+"""
+from typing import Callable, Dict, FrozenSet, Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import load_only, selectinload
+from sqlmodel import select
+
+from models import Profile, Skill, Project, Education, WorkExperience
+
+
+def serialize_link(link) -> dict:
+    return {"platform": link.platform, "url": link.url}
+
+
+PROJECT_FIELDS: Dict[str, Callable[[Project], object]] = {
+    "id": lambda p: p.id,
+    "title": lambda p: p.title,
+    "description": lambda p: p.description,
+    "technologies": lambda p: p.technologies.split(","),
+    "links": lambda p: [serialize_link(l) for l in p.links],
+}
+
+# Project columns needed to serialize each field (used with load_only)
+PROJECT_COLUMNS = {
+    "id": Project.id,
+    "title": Project.title,
+    "description": Project.description,
+    "technologies": Project.technologies,
+}
+
+PROFILE_INCLUDES = ("skills", "projects", "education", "work", "links")
+
+
+def profile_query(
+    include: FrozenSet[str] = frozenset(PROFILE_INCLUDES),
+    project_fields: FrozenSet[str] = frozenset(PROJECT_FIELDS),
+):
+    """Select the profile with the requested relationships eager-loaded.
+
+    Each collection is fetched with a single ``SELECT ... IN`` so building the
+    full profile response takes a fixed number of queries regardless of how
+    many projects (and project links) the profile has. Relationships left out
+    of ``include`` are never loaded.
+    """
+    options = [
+        selectinload(getattr(Profile, name))
+        for name in ("skills", "education", "work", "links")
+        if name in include
+    ]
+    if "projects" in include:
+        options.append(selectinload(Profile.projects).options(*project_options(project_fields)))
+    return select(Profile).options(*options)
+
+
+def project_options(fields: FrozenSet[str]):
+    """Loader options limiting projects to the columns and relationships ``fields`` needs"""
+    columns = [column for name, column in PROJECT_COLUMNS.items() if name in fields]
+    options = [load_only(*columns) if columns else load_only(Project.id)]
+    if "links" in fields:
+        options.append(selectinload(Project.links))
+    return options
+
+
+def parse_selection(value: Optional[str], allowed: Iterable[str], param: str) -> FrozenSet[str]:
+    """Parse a comma-separated ``fields``/``include`` value; ``None`` selects everything"""
+    allowed = tuple(allowed)
+    if value is None:
+        return frozenset(allowed)
+    selected = frozenset(part.strip() for part in value.split(",") if part.strip())
+    unknown = selected - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown {param}: {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}"
+        )
+    return selected
+
+
+def serialize_project(project: Project, fields: FrozenSet[str] = frozenset(PROJECT_FIELDS)) -> dict:
+    return {name: get(project) for name, get in PROJECT_FIELDS.items() if name in fields}
+
+
+def serialize_skill(skill: Skill) -> dict:
+    return {"id": skill.id, "name": skill.name}
+
+
+def serialize_education(education: Education) -> dict:
+    return {
+        "id": education.id,
+        "institution": education.institution,
+        "degree": education.degree,
+        "field_of_study": education.field_of_study,
+        "start_date": education.start_date,
+        "end_date": education.end_date
+    }
+
+
+def serialize_work(work: WorkExperience) -> dict:
+    return {
+        "id": work.id,
+        "company": work.company,
+        "position": work.position,
+        "description": work.description,
+        "start_date": work.start_date,
+        "end_date": work.end_date
+    }
+
+
+def serialize_profile_summary(profile: Profile) -> dict:
+    return {
+        "id": profile.id,
+        "slug": profile.slug,
+        "name": profile.name,
+        "email": profile.email,
+        "bio": profile.bio,
+        "location": profile.location,
+    }
+
+
+def serialize_profile(
+    profile: Profile,
+    include: FrozenSet[str] = frozenset(PROFILE_INCLUDES),
+    project_fields: FrozenSet[str] = frozenset(PROJECT_FIELDS),
+) -> dict:
+    data = serialize_profile_summary(profile)
+    if "skills" in include:
+        data["skills"] = [serialize_skill(s) for s in profile.skills]
+    if "projects" in include:
+        data["projects"] = [serialize_project(p, project_fields) for p in profile.projects]
+    if "education" in include:
+        data["education"] = [serialize_education(e) for e in profile.education]
+    if "work" in include:
+        data["work"] = [serialize_work(w) for w in profile.work]
+    if "links" in include:
+        data["links"] = [serialize_link(l) for l in profile.links]
+    return data
@@ -0,0 +1,131 @@
+"""Incrementally maintained skill ranking (the ``skill_stats`` table).
+
+A skill's score is the number of its profile's projects that list it as a
+technology; ties go to the skill used by the most recent project. Rows are
+kept current by flush hooks, so ``/api/skills/top`` is an indexed top-K read:
+
+* a new project adds 1 to the matching skills and may become their latest use;
+* removing a technology (edit or delete) recomputes only the affected skills;
+* a project moved to another profile counts as removed from the old profile
+  and new in the other;
+* new or renamed skills are computed from the profile's projects.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, event, inspect, text
+from sqlalchemy.orm import Session as OrmSession
+
+from models import Project, Skill, split_technologies
+
+_REBUILD = """
+INSERT OR REPLACE INTO skill_stats (skill_id, profile_id, project_count, last_project_id)
+SELECT s.id, s.profile_id, count(p.id), max(p.id)
+FROM skill s
+LEFT JOIN project p ON p.profile_id = s.profile_id AND EXISTS (
+    SELECT 1 FROM projecttechnology pt WHERE pt.project_id = p.id AND pt.name_lower = py_lower(s.name)
+)
+WHERE {where}
+GROUP BY s.id
+"""
+
+_INCREMENT = text("""
+UPDATE skill_stats
+SET project_count = project_count + 1,
+    last_project_id = max(coalesce(last_project_id, 0), :project_id)
+WHERE skill_id IN (SELECT id FROM skill WHERE profile_id = :profile_id AND py_lower(name) = :name_lower)
+""")
+
+_SKILLS_NAMED = "s.profile_id = :profile_id AND py_lower(s.name) = :name_lower"
+
+
+def rebuild_skill_stats(connection, profile_ids: Optional[Iterable[int]] = None, skill_ids: Optional[Iterable[int]] = None):
+    """Recompute stats for the given profiles or skills (everything when neither is given)"""
+    if skill_ids is not None:
+        statement = text(_REBUILD.format(where="s.id IN :ids")).bindparams(bindparam("ids", expanding=True))
+        params = {"ids": list(skill_ids)}
+    elif profile_ids is not None:
+        statement = text(_REBUILD.format(where="s.profile_id IN :ids")).bindparams(bindparam("ids", expanding=True))
+        params = {"ids": list(profile_ids)}
+    else:
+        statement, params = text(_REBUILD.format(where="1")), {}
+    if params and not params["ids"]:
+        return
+    connection.execute(statement, params)
+
+
+def _technologies(value: Optional[str]) -> set:
+    return {name.lower() for name in split_technologies(value or "")}
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _collect_skill_stat_changes(session, flush_context, instances):
+    """Work out which (profile, technology) pairs gain or lose projects in this flush"""
+    added, removed, skills, deleted_skills = [], set(), [], []
+    for obj in session.new:
+        if isinstance(obj, Project):
+            added += [(obj, name) for name in _technologies(obj.technologies)]
+        elif isinstance(obj, Skill):
+            skills.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Project):
+            state = inspect(obj).attrs
+            technologies, owner = state.technologies.history, state.profile_id.history
+            if technologies.has_changes() or owner.has_changes():
+                if technologies.has_changes():
+                    old = _technologies(technologies.deleted[0] if technologies.deleted else "")
+                else:
+                    old = _technologies(obj.technologies)
+                old_profile_id = owner.deleted[0] if owner.deleted else obj.profile_id
+                new = _technologies(obj.technologies)
+                if old_profile_id != obj.profile_id:
+                    # A move removes every technology from the old profile and adds it to the new one
+                    added += [(obj, name) for name in new]
+                    removed.update((old_profile_id, name) for name in old)
+                else:
+                    added += [(obj, name) for name in new - old]
+                    removed.update((obj.profile_id, name) for name in old - new)
+        elif isinstance(obj, Skill):
+            state = inspect(obj).attrs
+            if state.name.history.has_changes() or state.profile_id.history.has_changes():
+                skills.append(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Project):
+            removed.update((obj.profile_id, name) for name in _technologies(obj.technologies))
+        elif isinstance(obj, Skill):
+            deleted_skills.append(obj.id)
+    if added or removed or skills or deleted_skills:
+        session.info["skill_stats"] = (added, removed, skills, deleted_skills)
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _apply_skill_stat_changes(session, flush_context):
+    changes = session.info.pop("skill_stats", None)
+    if changes is None:
+        return
+    added, removed, skills, deleted_skills = changes
+    connection = session.connection()
+
+    if deleted_skills:
+        connection.execute(
+            text("DELETE FROM skill_stats WHERE skill_id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": deleted_skills},
+        )
+    # Removals can change a skill's latest project, so those are recomputed
+    for profile_id, name_lower in removed:
+        connection.execute(text(_REBUILD.format(where=_SKILLS_NAMED)), {"profile_id": profile_id, "name_lower": name_lower})
+    increments = [
+        {"project_id": project.id, "profile_id": project.profile_id, "name_lower": name}
+        for project, name in added
+        if (project.profile_id, name) not in removed
+    ]
+    if increments:
+        connection.execute(_INCREMENT, increments)
+    # New and renamed skills last, so they see this flush's projects exactly once
+    rebuild_skill_stats(connection, skill_ids=[s.id for s in skills if s.id not in deleted_skills])
+
+
+def ensure_skill_stats(connection):
+    """Fill ``skill_stats`` for databases created before it existed"""
+    stats = connection.execute(text("SELECT 1 FROM skill_stats LIMIT 1")).first()
+    if stats is None and connection.execute(text("SELECT 1 FROM skill LIMIT 1")).first() is not None:
+        rebuild_skill_stats(connection)
@@ -0,0 +1,529 @@
+"""Read-through snapshot of every profile, so GET endpoints need no database.
+
+With ``SNAPSHOT_MODE`` on, each worker loads every profile graph into
+immutable slotted dataclasses, with per-profile indexes for the projects'
+``skill`` filter, the top-skills ranking and search. The dataclasses keep the
+attribute names of the ORM models, so the same serializers render them.
+
+Writes still go to the database. After every commit in this worker, and when
+``database.data_version`` shows a commit from another one, a background thread
+reads the change log past the snapshot's ``last_seq``, reloads only the
+profiles it names, and swaps in a new ``Snapshot`` sharing every unchanged
+profile with the old one. A reader holds one snapshot for the whole request,
+so it never sees half a rebuild; until the swap it sees the previous one.
+"""
+import logging
+import math
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, func, select
+
+from bulk import EXPORT_BATCH_SIZE
+from cache import response_cache
+from database import data_version, read_engine
+from models import Change, Education, Link, Profile, Project, ProjectLink, Skill, WorkExperience, split_technologies
+from search_index import (
+    BODY_WEIGHT, HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN, SNIPPET_TOKENS, TITLE_WEIGHT, TOKEN_PATTERN,
+    education_document, fold, project_document, skill_document, tokens, work_document,
+)
+from serializers import serialize_profile
+
+SNAPSHOT_MODE = os.getenv("SNAPSHOT_MODE", "0").lower() in ("1", "true", "yes")
+# How often the refresher checks data_version for other workers' commits
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "0.5"))
+# Past this many changed profiles a refresh reloads everything instead
+SNAPSHOT_FULL_RELOAD = int(os.getenv("SNAPSHOT_FULL_RELOAD", "1000"))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class LinkSnap:
+    platform: str
+    url: str
+
+
+@dataclass(frozen=True, slots=True)
+class SkillSnap:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class EducationSnap:
+    id: int
+    institution: str
+    degree: str
+    field_of_study: str
+    start_date: str
+    end_date: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class WorkSnap:
+    id: int
+    company: str
+    position: str
+    description: str
+    start_date: str
+    end_date: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class ProjectSnap:
+    id: int
+    title: str
+    description: str
+    technologies: str
+    links: Tuple[LinkSnap, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class SearchDoc:
+    kind: str
+    ref_id: int
+    title: str
+    body: str
+    length: int  # tokens in the row, as bm25() counts them
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class SearchIndex:
+    """Inverted index over one profile's search documents"""
+    documents: Tuple[SearchDoc, ...]
+    vocabulary: Tuple[str, ...]  # sorted, for prefix lookups
+    postings: Dict[str, Tuple[int, ...]]  # token -> positions in documents
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class ProfileSnap:
+    id: int
+    slug: Optional[str]
+    name: str
+    email: str
+    bio: Optional[str]
+    location: Optional[str]
+    # Every collection is ordered by id
+    skills: Tuple[SkillSnap, ...]
+    projects: Tuple[ProjectSnap, ...]
+    education: Tuple[EducationSnap, ...]
+    work: Tuple[WorkSnap, ...]
+    links: Tuple[LinkSnap, ...]
+    projects_by_technology: Dict[str, Tuple[ProjectSnap, ...]]  # lowercased technology -> projects
+    top_skills: Tuple[Tuple[SkillSnap, int], ...]  # (skill, project count), in /api/skills/top order
+    search: SearchIndex
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Snapshot:
+    profiles: Dict[int, ProfileSnap]
+    ordered: Tuple[ProfileSnap, ...]  # by id
+    slugs: Dict[str, ProfileSnap]
+    last_seq: int  # change-log position the snapshot reflects
+    # Whole-corpus statistics, so search scores match bm25() over the full index
+    documents: int
+    total_length: int
+    document_frequency: Dict[str, int]
+    vocabulary: Tuple[str, ...]
+
+    def resolve(self, ref: Optional[str]) -> Optional[ProfileSnap]:
+        """Profile for an id or slug; ``None`` addresses the first profile"""
+        if ref is None:
+            return self.ordered[0] if self.ordered else None
+        if ref.isdigit():
+            return self.profiles.get(int(ref))
+        return self.slugs.get(ref)
+
+    def replace(self, loaded: Dict[int, ProfileSnap], changed: Iterable[int], last_seq: int) -> "Snapshot":
+        """A new snapshot with the ``changed`` profiles swapped for ``loaded`` (absent ones are deleted)"""
+        profiles = dict(self.profiles)
+        frequency = Counter(self.document_frequency)
+        documents, total_length = self.documents, self.total_length
+        for profile_id in changed:
+            old, new = profiles.pop(profile_id, None), loaded.get(profile_id)
+            if new is not None:
+                profiles[profile_id] = new
+            for profile, sign in ((old, -1), (new, 1)):
+                if profile is not None:
+                    documents += sign * len(profile.search.documents)
+                    total_length += sign * sum(doc.length for doc in profile.search.documents)
+                    for token, postings in profile.search.postings.items():
+                        frequency[token] += sign * len(postings)
+        frequency = +frequency  # drop tokens no document has any more
+        vocabulary = self.vocabulary if frequency.keys() == self.document_frequency.keys() else tuple(sorted(frequency))
+        return _snapshot(profiles, last_seq, documents, total_length, dict(frequency), vocabulary)
+
+
+def _snapshot(profiles, last_seq, documents=None, total_length=None, frequency=None, vocabulary=None) -> Snapshot:
+    if frequency is None:
+        counted = Counter()
+        documents = total_length = 0
+        for profile in profiles.values():
+            documents += len(profile.search.documents)
+            total_length += sum(doc.length for doc in profile.search.documents)
+            for token, postings in profile.search.postings.items():
+                counted[token] += len(postings)
+        frequency, vocabulary = dict(counted), tuple(sorted(counted))
+    ordered = tuple(sorted(profiles.values(), key=lambda p: p.id))
+    return Snapshot(
+        profiles=profiles,
+        ordered=ordered,
+        slugs={p.slug: p for p in ordered if p.slug is not None},
+        last_seq=last_seq,
+        documents=documents,
+        total_length=total_length,
+        document_frequency=frequency,
+        vocabulary=vocabulary,
+    )
+
+
+def build_search_index(docs: Iterable[tuple]) -> SearchIndex:
+    documents, postings = [], defaultdict(list)
+    for kind, ref_id, _, title, body in docs:
+        title_tokens, body_tokens = tokens(title), tokens(body)
+        for token in set(title_tokens).union(body_tokens):
+            postings[token].append(len(documents))
+        # +1 for the profile_id column, which FTS5 also counts
+        documents.append(SearchDoc(kind, ref_id, title, body, len(title_tokens) + len(body_tokens) + 1))
+    return SearchIndex(tuple(documents), tuple(sorted(postings)), {t: tuple(p) for t, p in postings.items()})
+
+
+def _rank_skills(skills: Tuple[SkillSnap, ...], projects: Tuple[ProjectSnap, ...]) -> Tuple[Tuple[SkillSnap, int], ...]:
+    # Same ranking skill_stats maintains: project count, then the most recent project, then skill id
+    used: Dict[str, List[int]] = {}
+    for project in projects:
+        for name in split_technologies(project.technologies):
+            count = used.setdefault(name.lower(), [0, 0])
+            count[0] += 1
+            count[1] = project.id
+    ranked = sorted(
+        ((skill, *used.get(skill.name.lower(), (0, 0))) for skill in skills),
+        key=lambda row: (-row[1], -row[2], -row[0].id),
+    )
+    return tuple((skill, count) for skill, count, _ in ranked)
+
+
+def build_profile(row, skills, projects, education, work, links) -> ProfileSnap:
+    by_technology = defaultdict(list)
+    for project in projects:
+        for name in split_technologies(project.technologies):
+            by_technology[name.lower()].append(project)
+    docs = (
+        [project_document(p.id, row.id, p.title, p.description, p.technologies) for p in projects]
+        + [skill_document(s.id, row.id, s.name) for s in skills]
+        + [work_document(w.id, row.id, w.company, w.position, w.description) for w in work]
+        + [education_document(e.id, row.id, e.institution, e.degree, e.field_of_study) for e in education]
+    )
+    return ProfileSnap(
+        id=row.id, slug=row.slug, name=row.name, email=row.email, bio=row.bio, location=row.location,
+        skills=skills, projects=projects, education=education, work=work, links=links,
+        projects_by_technology={name: tuple(found) for name, found in by_technology.items()},
+        top_skills=_rank_skills(skills, projects),
+        search=build_search_index(docs),
+    )
+
+
+def load_profiles(session: Session, profile_ids: Optional[List[int]] = None) -> Dict[int, ProfileSnap]:
+    """Load whole profile graphs with one plain query per table (all profiles when ``profile_ids`` is None)"""
+    def rows(model, *columns, scope, join=None):
+        query = select(model.id, *columns).order_by(model.id)
+        if join is not None:
+            query = query.join(*join)
+        if profile_ids is not None:
+            query = query.where(scope.in_(profile_ids))
+        return session.execute(query)
+
+    def grouped(model, make, *columns):
+        groups = defaultdict(list)
+        for row in rows(model, *columns, model.profile_id, scope=model.profile_id):
+            groups[row[-1]].append(make(*row[:-1]))
+        return groups
+
+    project_links = defaultdict(list)
+    for _, project_id, platform, url in rows(
+        ProjectLink, ProjectLink.project_id, ProjectLink.platform, ProjectLink.url,
+        scope=Project.profile_id, join=(Project, Project.id == ProjectLink.project_id),
+    ):
+        project_links[project_id].append(LinkSnap(platform, url))
+
+    skills = grouped(Skill, SkillSnap, Skill.name)
+    education = grouped(
+        Education, EducationSnap,
+        Education.institution, Education.degree, Education.field_of_study, Education.start_date, Education.end_date,
+    )
+    work = grouped(
+        WorkExperience, WorkSnap,
+        WorkExperience.company, WorkExperience.position, WorkExperience.description,
+        WorkExperience.start_date, WorkExperience.end_date,
+    )
+    links = grouped(Link, lambda _, platform, url: LinkSnap(platform, url), Link.platform, Link.url)
+    projects = grouped(
+        Project, lambda id, title, description, technologies: ProjectSnap(
+            id, title, description, technologies, tuple(project_links.get(id, ()))
+        ),
+        Project.title, Project.description, Project.technologies,
+    )
+
+    profiles = {}
+    for row in rows(Profile, Profile.slug, Profile.name, Profile.email, Profile.bio, Profile.location, scope=Profile.id):
+        profiles[row.id] = build_profile(
+            row,
+            tuple(skills.get(row.id, ())),
+            tuple(projects.get(row.id, ())),
+            tuple(education.get(row.id, ())),
+            tuple(work.get(row.id, ())),
+            tuple(links.get(row.id, ())),
+        )
+    return profiles
+
+
+def _latest_seq(session: Session) -> int:
+    return session.exec(select(func.max(Change.seq))).one() or 0
+
+
+def build_snapshot(engine=read_engine) -> Snapshot:
+    with Session(engine) as session:
+        # The log position is read first: a commit landing during the load is
+        # applied again by the next refresh, never skipped
+        last_seq = _latest_seq(session)
+        return _snapshot(load_profiles(session), last_seq)
+
+
+class SnapshotStore:
+    """Holds the current ``Snapshot`` and replaces it from a background thread"""
+
+    def __init__(self, engine=read_engine, poll_seconds: float = SNAPSHOT_POLL_SECONDS, full_reload: int = SNAPSHOT_FULL_RELOAD):
+        self.engine = engine
+        self.poll_seconds = poll_seconds
+        self.full_reload = full_reload
+        self.current: Optional[Snapshot] = None
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._stale = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self) -> Snapshot:
+        snapshot = self.current
+        return snapshot if snapshot is not None else self.start()
+
+    def start(self) -> Snapshot:
+        """Load the first snapshot if there is none and make sure the refresher runs"""
+        with self._lock:
+            if self.current is None:
+                self.current = build_snapshot(self.engine)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="snapshot-refresh", daemon=True)
+                self._thread.start()
+            return self.current
+
+    def wake(self):
+        """Tell the refresher something was committed; safe to call from any thread"""
+        self._stale.set()
+
+    def _run(self):
+        seen_version = data_version() if data_version is not None else None
+        while True:
+            woken = self._stale.wait(self.poll_seconds)
+            self._stale.clear()
+            if data_version is not None:
+                version = data_version()
+                if not woken and version == seen_version:
+                    continue
+                seen_version = version
+            elif not woken:
+                continue
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("snapshot refresh failed; retrying on the next commit")
+
+    def refresh(self) -> bool:
+        """Apply changes logged since the current snapshot; True if it was replaced"""
+        with self._lock:
+            old = self.current
+            with Session(self.engine) as session:
+                last_seq = _latest_seq(session)
+                if old is None:
+                    new = _snapshot(load_profiles(session), last_seq)
+                else:
+                    if last_seq == old.last_seq:
+                        return False
+                    changed = set(session.exec(
+                        select(Change.profile_id).where(Change.seq > old.last_seq, Change.seq <= last_seq).distinct()
+                    )) - {None}
+                    if len(changed) > self.full_reload:
+                        new = _snapshot(load_profiles(session), last_seq)
+                    else:
+                        new = old.replace(load_profiles(session, sorted(changed)), changed, last_seq)
+            self.current = new
+            self.refreshes += 1
+        # Responses cached from the old snapshot are stale now
+        response_cache.bump()
+        return True
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _snapshot_stale(session):
+    snapshot_store.wake()
+
+
+# Search over a profile's index, mirroring search_index.search_hits
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def _prefixed(vocabulary: Tuple[str, ...], prefix: str) -> Iterator[str]:
+    for i in range(bisect_left(vocabulary, prefix), len(vocabulary)):
+        if not vocabulary[i].startswith(prefix):
+            return
+        yield vocabulary[i]
+
+
+def _marked(text: str, terms: List[str], start: int = 0, end: Optional[int] = None) -> str:
+    """``text[start:end]`` with every token matching a term as a prefix highlighted"""
+    end = len(text) if end is None else end
+    out, position = [], start
+    for match in TOKEN_PATTERN.finditer(text, start, end):
+        token = fold(match.group())
+        if any(token.startswith(term) for term in terms):
+            out += [text[position:match.start()], HIGHLIGHT_OPEN, match.group(), HIGHLIGHT_CLOSE]
+            position = match.end()
+    out.append(text[position:end])
+    return "".join(out)
+
+
+def _sentence_starts(text: str, found: list) -> List[int]:
+    # A token after whitespace that follows a '.' or ':' starts a sentence
+    starts = [0]
+    for i in range(1, len(found)):
+        gap = text[found[i - 1].end():found[i].start()]
+        stripped = gap.rstrip(" \t\n\r")
+        if len(stripped) < len(gap) and stripped.endswith((".", ":")):
+            starts.append(i)
+    return starts
+
+
+def _snippet(text: str, terms: List[str]) -> str:
+    """snippet(search_index, 4, ..., '…', 16), choosing its window the way FTS5 does"""
+    found = list(TOKEN_PATTERN.finditer(text))
+    size = len(found)
+    if size <= SNIPPET_TOKENS:
+        return _marked(text, terms)
+    instances = [
+        (position, phrase)
+        for position, match in enumerate(found)
+        for phrase, term in enumerate(terms)
+        if fold(match.group()).startswith(term)
+    ]
+
+    def score(start: int) -> Tuple[int, int]:
+        # 1000 per distinct term in the window, 1 per repeat; plus the window
+        # start that centres the hits
+        seen, total, first, last = set(), 0, None, 0
+        for position, phrase in instances:
+            if start <= position < start + SNIPPET_TOKENS:
+                total += 1 if phrase in seen else 1000
+                seen.add(phrase)
+                first = position if first is None else first
+                last = position + 1
+        if first is None:
+            return 0, start
+        adjusted = first - (SNIPPET_TOKENS - (last - first)) // 2
+        return total, max(min(adjusted, size - SNIPPET_TOKENS), 0)
+
+    sentences = _sentence_starts(text, found)
+    best, best_score = 0, 0
+    for position, _ in instances:
+        if position < best:
+            continue
+        total, adjusted = score(position)
+        if total > best_score:
+            best, best_score = adjusted, total
+        # The same hits seen from the start of their sentence score a bonus
+        sentence = sentences[bisect_right(sentences, position) - 1]
+        if sentence < position:
+            total = score(sentence)[0] + (120 if sentence == 0 else 100)
+            if total > best_score:
+                best, best_score = sentence, total
+
+    last = best + SNIPPET_TOKENS - 1
+    start = found[best].start() if best > 0 else 0
+    end = found[last].end() if last < size - 1 else len(text)
+    return ("…" if best > 0 else "") + _marked(text, terms, start, end) + ("…" if last < size - 1 else "")
+
+
+def search_hits(
+    snapshot: Snapshot,
+    profile: ProfileSnap,
+    q: str,
+    kinds: Optional[List[str]] = None,
+    limit: Optional[int] = 20,
+    offset: int = 0,
+) -> Tuple[int, List[dict]]:
+    """Return ``(total, hits)`` for ``q``, best BM25 score first, as the FTS5 search does"""
+    terms = tokens(q)
+    if not terms:
+        return 0, []
+    index = profile.search
+    matches = []
+    for term in terms:
+        matched = set()
+        for token in _prefixed(index.vocabulary, term):
+            matched.update(index.postings[token])
+        matches.append(matched)
+    candidates = set.intersection(*matches)
+    if kinds:
+        candidates = {i for i in candidates if index.documents[i].kind in kinds}
+    if not candidates:
+        return 0, []
+
+    # bm25() over the whole corpus; a prefix term's frequency is the sum over the tokens it matches
+    n = snapshot.documents
+    average_length = snapshot.total_length / n
+    idf = []
+    for term in terms:
+        frequency = min(n, sum(snapshot.document_frequency[t] for t in _prefixed(snapshot.vocabulary, term)))
+        idf.append(max(math.log((n - frequency + 0.5) / (frequency + 0.5)), 1e-6))
+    scored = []
+    for i in candidates:
+        doc = index.documents[i]
+        title, body = tokens(doc.title), tokens(doc.body)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc.length / average_length)
+        score = 0.0
+        for term, weight in zip(terms, idf):
+            tf = (TITLE_WEIGHT * sum(1 for t in title if t.startswith(term))
+                  + BODY_WEIGHT * sum(1 for t in body if t.startswith(term)))
+            score += weight * tf * (BM25_K1 + 1) / (tf + norm)
+        scored.append((-score, i))
+    scored.sort()
+
+    page = scored[offset:] if limit is None else scored[offset:offset + limit]
+    hits = []
+    for score, i in page:
+        doc = index.documents[i]
+        hits.append({
+            "type": doc.kind,
+            "id": doc.ref_id,
+            "title": _marked(doc.title, terms),
+            "snippet": _snippet(doc.body, terms),
+            "score": round(-score, 4),
+        })
+    return len(scored), hits
+
+
+def export_ndjson(snapshot: Snapshot, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """``bulk.export_ndjson`` over the snapshot"""
+    for start in range(0, len(snapshot.ordered), batch_size):
+        yield b"".join(orjson.dumps(serialize_profile(p)) + b"\n" for p in snapshot.ordered[start:start + batch_size])
+
+
+snapshot_store = SnapshotStore()
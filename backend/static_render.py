@@ -0,0 +1,480 @@
+"""Static renders of the profile and project responses, for nginx or a CDN to serve.
+
+For every profile, the responses of
+
+    GET /api/profiles/{slug}                        -> profile.json
+    GET /api/profiles/{slug}/projects               -> projects.json
+    GET /api/profiles/{slug}/projects?skill={value} -> projects/skill/{value}.json
+
+are written for every skill and technology of the profile (``value`` is
+lowercased and percent-encoded). ``.br`` and ``.gz`` siblings are written next
+to any file of ``COMPRESSION_MIN_BYTES`` or more. The bytes are exactly what
+the API sends, so the strong ETags recorded in ``manifest.json`` are the API's
+ETags too.
+
+Each render of a profile goes to a new directory named after the profile's
+latest change-log seq, and ``current`` is then switched to it with an atomic
+symlink replace, so readers never see half a render:
+
+    STATIC_DIR/profiles/{slug}/v{seq}/...
+    STATIC_DIR/profiles/{slug}/current -> v{seq}
+    STATIC_DIR/by-id/{id} -> ../profiles/{slug}
+    STATIC_DIR/default -> profiles/{slug}    (the profile of the unscoped /api routes)
+
+A profile whose slug is not one ``slugify`` would produce is stored under its
+id instead, so a slug can never name a path outside ``profiles/``. Nothing is
+written or deleted where the real path falls outside ``STATIC_DIR``.
+
+Files whose bytes did not change are hard-linked from the previous version.
+Their mtime then stays the same, and so do nginx's mtime-based ETag and
+Last-Modified.
+
+``state.json`` records the change-log seq up to which everything is rendered.
+A run that is interrupted starts again from there, and skips every profile
+whose ``current`` is already at its latest seq. So a full render resumes where
+it stopped as well. Profiles are rendered in batches on a process pool. A file
+lock lets only one process render at a time, so every uvicorn worker can run
+the renderer.
+
+    python manage.py render          # render what changed since the last run
+    python manage.py render --full   # render every profile again
+"""
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run a single renderer
+    fcntl = None
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, func, select
+from starlette._utils import get_route_path
+
+from cache import etag_matches, render
+from compression import COMPRESSION_MIN_BYTES, ENCODINGS, compress, negotiate
+from database import data_version, read_engine
+from models import Change, Profile, slugify
+from serializers import serialize_profile, serialize_project
+from snapshot import ProfileSnap, load_profiles
+
+logger = logging.getLogger(__name__)
+
+STATIC_RENDER_ENABLED = os.getenv("STATIC_RENDER_ENABLED", "0").lower() in ("1", "true", "yes")
+STATIC_DIR = os.getenv("STATIC_DIR", "static")
+# Render processes; 0 renders in the calling thread
+STATIC_RENDER_WORKERS = int(os.getenv("STATIC_RENDER_WORKERS", str(os.cpu_count() or 1)))
+# Profiles loaded and rendered per task
+STATIC_RENDER_BATCH = int(os.getenv("STATIC_RENDER_BATCH", "200"))
+# How often the renderer checks data_version for other workers' commits
+STATIC_RENDER_POLL_SECONDS = float(os.getenv("STATIC_RENDER_POLL_SECONDS", "1.0"))
+# Version directories kept per profile, current included, for requests still reading an older one
+STATIC_KEEP_VERSIONS = int(os.getenv("STATIC_KEEP_VERSIONS", "2"))
+STATIC_CACHE_CONTROL = os.getenv("STATIC_CACHE_CONTROL", "public, max-age=60")
+
+# Suffixes of the precompressed siblings, as nginx's gzip_static / brotli_static expect them
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+MANIFEST = "manifest.json"
+_VERSION = re.compile(r"v(\d+)$")
+
+
+def skill_values(profile: ProfileSnap) -> List[str]:
+    """Every ``skill`` filter value worth rendering: the profile's technologies and skill names"""
+    values = set(profile.projects_by_technology)
+    values.update(skill.name.strip().lower() for skill in profile.skills)
+    values.discard("")
+    return sorted(values)
+
+
+def responses(profile: ProfileSnap) -> Iterator[Tuple[str, dict]]:
+    """``(file name, payload)`` for each rendered response of ``profile``"""
+    yield "profile.json", serialize_profile(profile)
+    yield "projects.json", {"projects": [serialize_project(p) for p in profile.projects]}
+    for value in skill_values(profile):
+        projects = profile.projects_by_technology.get(value, ())
+        yield f"projects/skill/{quote(value, safe='')}.json", {"projects": [serialize_project(p) for p in projects]}
+
+
+def _version(name: Optional[str]) -> Optional[int]:
+    match = _VERSION.match(name or "")
+    return int(match.group(1)) if match else None
+
+
+def _readlink(path: str) -> Optional[str]:
+    try:
+        return os.readlink(path)
+    except OSError:
+        return None
+
+
+def _swap_link(path: str, target: str):
+    """Point the symlink ``path`` at ``target`` atomically"""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.symlink(target, tmp)
+    os.replace(tmp, path)
+
+
+def current_version(root: str, profile_id: int) -> Optional[int]:
+    """Seq of the render ``by-id/{profile_id}`` currently points at, if any"""
+    return _version(_readlink(os.path.join(root, "by-id", str(profile_id), "current")))
+
+
+def _profile_dir_name(slug: Optional[str], profile_id: int) -> str:
+    return slug if slug and slugify(slug) == slug else str(profile_id)
+
+
+def _inside(root: str, path: str) -> bool:
+    """Whether ``path``, with every symlink resolved, is below ``root``"""
+    return os.path.realpath(path).startswith(os.path.realpath(root) + os.sep)
+
+
+def _rmtree(root: str, path: str):
+    if _inside(root, path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        logger.warning("not removing %s: it is outside %s", path, root)
+
+
+def _manifest(version_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(version_dir, MANIFEST)) as f:
+            return json.load(f)["files"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def render_profile(root: str, profile: ProfileSnap, version: int) -> int:
+    """Write ``profile``'s responses as ``v{version}`` and make it current.
+
+    Returns how many responses changed; the files of the others are
+    hard-linked from the current version rather than written and compressed
+    again.
+    """
+    profile_dir = os.path.join(root, "profiles", _profile_dir_name(profile.slug, profile.id))
+    if not _inside(root, profile_dir):
+        logger.warning("not rendering profile %s: %s is outside %s", profile.id, profile_dir, root)
+        return 0
+    os.makedirs(profile_dir, exist_ok=True)
+    previous = _readlink(os.path.join(profile_dir, "current"))
+    previous_dir = os.path.join(profile_dir, previous) if previous else None
+    previous_files = _manifest(previous_dir) if previous_dir else {}
+
+    tmp = os.path.join(profile_dir, f".v{version}.tmp-{os.getpid()}")
+    _rmtree(root, tmp)
+    files, written = {}, 0
+    for name, payload in responses(profile):
+        rendered = render(payload)
+        files[name] = rendered.etag
+        path = os.path.join(tmp, name)
+        encodings = ENCODINGS if len(rendered.body) >= COMPRESSION_MIN_BYTES else ()
+        unchanged = previous_files.get(name) == rendered.etag
+        written += not unchanged
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for encoding in (None, *encodings):
+            suffix = SUFFIXES[encoding] if encoding else ""
+            source = os.path.join(previous_dir, name) + suffix if unchanged else None
+            if source and os.path.exists(source):
+                os.link(source, path + suffix)
+            else:
+                _write(path + suffix, rendered.body if encoding is None else compress(rendered.body, encoding))
+    _write(os.path.join(tmp, MANIFEST), json.dumps(
+        {"profile_id": profile.id, "slug": profile.slug, "version": version, "files": files}
+    ).encode())
+
+    target = os.path.join(profile_dir, f"v{version}")
+    if os.path.isdir(target):  # a forced render of the same version
+        os.rename(target, f"{tmp}-old")
+    os.rename(tmp, target)
+    _swap_link(os.path.join(profile_dir, "current"), f"v{version}")
+    _rmtree(root, f"{tmp}-old")
+
+    by_id = os.path.join(root, "by-id")
+    os.makedirs(by_id, exist_ok=True)
+    alias = os.path.join(by_id, str(profile.id))
+    old_dir = _readlink(alias)
+    _swap_link(alias, os.path.relpath(profile_dir, by_id))
+    if old_dir and os.path.normpath(os.path.join(by_id, old_dir)) != os.path.normpath(profile_dir):
+        _rmtree(root, os.path.join(by_id, old_dir))  # the slug changed
+    _prune(root, profile_dir)
+    return written
+
+
+def _prune(root: str, profile_dir: str):
+    """Drop all but the newest ``STATIC_KEEP_VERSIONS`` versions, and leftovers of interrupted renders"""
+    versions = sorted(
+        (v, name) for name in os.listdir(profile_dir) if (v := _version(name)) is not None
+    )
+    for _, name in versions[:-STATIC_KEEP_VERSIONS]:
+        _rmtree(root, os.path.join(profile_dir, name))
+    for name in os.listdir(profile_dir):
+        if name.startswith(".v") and f".tmp-{os.getpid()}" not in name:
+            _rmtree(root, os.path.join(profile_dir, name))
+
+
+def remove_profile(root: str, profile_id: int):
+    alias = os.path.join(root, "by-id", str(profile_id))
+    target = _readlink(alias)
+    if target:
+        _rmtree(root, os.path.join(root, "by-id", target))
+    if os.path.lexists(alias):
+        os.remove(alias)
+
+
+def render_batch(root: str, versions: Dict[int, int]) -> int:
+    """Render the profiles in ``versions`` (id -> seq); runs in a pool process"""
+    with Session(read_engine) as session:
+        profiles = load_profiles(session, sorted(versions))
+    written = 0
+    for profile_id, version in versions.items():
+        profile = profiles.get(profile_id)
+        if profile is None:
+            remove_profile(root, profile_id)
+        else:
+            written += render_profile(root, profile, version)
+    return written
+
+
+def _read_state(root: str) -> Optional[int]:
+    try:
+        with open(os.path.join(root, "state.json")) as f:
+            return json.load(f)["seq"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_state(root: str, seq: int):
+    tmp = os.path.join(root, f"state.json.tmp-{os.getpid()}")
+    _write(tmp, json.dumps({"seq": seq}).encode())
+    os.replace(tmp, os.path.join(root, "state.json"))
+
+
+@contextmanager
+def render_lock(root: str, blocking: bool = True):
+    """Yield True while holding the renderer lock for ``root``, False if another process has it"""
+    os.makedirs(root, exist_ok=True)
+    if fcntl is None:
+        yield True
+        return
+    with open(os.path.join(root, ".render-lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def pending_versions(session: Session, root: str, full: bool = False) -> Tuple[int, Dict[int, int]]:
+    """``(head seq, {profile id: seq to render})`` of the profiles whose render is out of date"""
+    # The log position is read first: a commit landing during the render is
+    # rendered again by the next run, never skipped
+    head = session.exec(select(func.max(Change.seq))).one() or 0
+    since = None if full else _read_state(root)
+    if since is None:
+        profile_ids = set(session.exec(select(Profile.id)))
+    else:
+        profile_ids = set(session.exec(select(Change.profile_id).where(Change.seq > since).distinct())) - {None}
+    latest = dict(session.exec(
+        select(Change.profile_id, func.max(Change.seq)).where(Change.seq <= head).group_by(Change.profile_id)
+    ).all())
+    versions = {profile_id: latest.get(profile_id, 0) for profile_id in profile_ids}
+    if not full:
+        versions = {
+            profile_id: version for profile_id, version in versions.items()
+            if current_version(root, profile_id) != version
+        }
+    return head, versions
+
+
+def _default_profile(session: Session, root: str):
+    first = session.exec(select(Profile.slug, Profile.id).order_by(Profile.id).limit(1)).first()
+    default = os.path.join(root, "default")
+    if first is None:
+        if os.path.lexists(default):
+            os.remove(default)
+    elif _readlink(default) != (target := f"profiles/{_profile_dir_name(first.slug, first.id)}"):
+        _swap_link(default, target)
+
+
+def render_pending(
+    root: str = STATIC_DIR,
+    workers: int = STATIC_RENDER_WORKERS,
+    batch_size: int = STATIC_RENDER_BATCH,
+    full: bool = False,
+    pool: Optional[ProcessPoolExecutor] = None,
+    blocking: bool = True,
+) -> Optional[dict]:
+    """Render every profile changed since the last completed run.
+
+    Returns counts for the run, or None if another process holds the lock
+    and ``blocking`` is false.
+    """
+    with render_lock(root, blocking) as locked:
+        if not locked:
+            return None
+        with Session(read_engine) as session:
+            head, versions = pending_versions(session, root, full)
+        ids = sorted(versions)
+        batches = [{i: versions[i] for i in ids[start:start + batch_size]} for start in range(0, len(ids), batch_size)]
+        if workers <= 0 or (pool is None and len(batches) <= 1):
+            written = sum(render_batch(root, batch) for batch in batches)
+        else:
+            own_pool = pool is None
+            if own_pool:
+                pool = ProcessPoolExecutor(min(workers, len(batches)), mp_context=multiprocessing.get_context("spawn"))
+            try:
+                written = sum(pool.map(render_batch, [root] * len(batches), batches))
+            finally:
+                if own_pool:
+                    pool.shutdown()
+        with Session(read_engine) as session:
+            _default_profile(session, root)
+        _write_state(root, head)
+        return {"seq": head, "profiles": len(versions), "changed": written}
+
+
+class StaticRenderer:
+    """Runs ``render_pending`` from a background thread after every commit"""
+
+    def __init__(
+        self,
+        root: str = STATIC_DIR,
+        workers: int = STATIC_RENDER_WORKERS,
+        poll_seconds: float = STATIC_RENDER_POLL_SECONDS,
+    ):
+        self.root = root
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.runs = 0
+        self.last_run: Optional[dict] = None
+        self._stale = threading.Event()
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the renderer thread; it first finishes whatever an earlier run left"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self.workers > 0 and self._pool is None:
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+                self._thread = threading.Thread(target=self._run, name="static-render", daemon=True)
+                self._thread.start()
+                self._stale.set()
+
+    def wake(self):
+        """Tell the renderer something was committed; safe to call from any thread"""
+        self._stale.set()
+
+    def _run(self):
+        seen_version = None
+        while True:
+            woken = self._stale.wait(self.poll_seconds)
+            self._stale.clear()
+            if data_version is not None:
+                version = data_version()
+                if not woken and version == seen_version:
+                    continue
+                seen_version = version
+            elif not woken:
+                continue
+            try:
+                self.render()
+            except Exception:
+                logger.exception("static render failed; retrying on the next commit")
+
+    def render(self) -> Optional[dict]:
+        result = render_pending(self.root, self.workers, pool=self._pool, blocking=False)
+        if result is not None:
+            self.runs += 1
+            self.last_run = result
+        return result
+
+
+static_renderer = StaticRenderer()
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _static_stale(session):
+    static_renderer.wake()
+
+
+@lru_cache(maxsize=4096)
+def _version_files(version_dir: str) -> Dict[str, str]:
+    # Version directories never change once renamed into place
+    return _manifest(version_dir)
+
+
+class StaticRenderApp:
+    """Serves STATIC_DIR with the API's ETags and the precompressed variants.
+
+    Meant to be mounted, e.g. at ``/static``, as the origin of a CDN; nginx can
+    serve the same directory with ``gzip_static`` and ``brotli_static``.
+    """
+
+    def __init__(self, root: str = STATIC_DIR, cache_control: str = STATIC_CACHE_CONTROL):
+        self.root = os.path.realpath(root)
+        self.cache_control = cache_control
+
+    def _resolve(self, route_path: str) -> Optional[Tuple[str, str, str]]:
+        """``(file, version dir, name in the manifest)`` for a request path inside the root"""
+        path = os.path.realpath(os.path.join(self.root, route_path.lstrip("/")))
+        if not path.startswith(self.root + os.sep) or not path.endswith(".json") or not os.path.isfile(path):
+            return None
+        version_dir = os.path.dirname(path)
+        while _version(os.path.basename(version_dir)) is None:
+            if version_dir == self.root:
+                return None
+            version_dir = os.path.dirname(version_dir)
+        return path, version_dir, os.path.relpath(path, version_dir).replace(os.sep, "/")
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        resolved = self._resolve(get_route_path(scope)) if request.method in ("GET", "HEAD") else None
+        etag = _version_files(resolved[1]).get(resolved[2]) if resolved else None
+        if etag is None:
+            await JSONResponse({"detail": "Not Found"}, status_code=404)(scope, receive, send)
+            return
+        path = resolved[0]
+        encoding = negotiate(request.headers.get("accept-encoding"))
+        if encoding is not None and not os.path.exists(path + SUFFIXES[encoding]):
+            encoding = None
+        headers = {"ETag": etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if encoding is not None:
+            # The API's ETag for this coding of the same response
+            headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+        if etag_matches(request, etag):
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            path += SUFFIXES[encoding]
+        # Read inline: the files are API-sized bodies, and FileResponse would go
+        # through the thread pool for the stat and every read
+        with open(path, "rb") as f:
+            body = f.read()
+        await Response(body, media_type="application/json", headers=headers)(scope, receive, send)
@@ -71,7 +71,7 @@ export const api = {
     },
 
     async search(query: string): Promise<{ query: string; results: { projects: Project[]; skills: Skill[] } }> {
-        const response = await fetch(`${API_BASE_URL}/api/search?q=${encodeURIComponent(query)}`);
+        const response = await fetch(`${API_BASE_URL}/api/search?q=${encodeURIComponent(query)}&format=legacy`);
         if (!response.ok) throw new Error('Failed to search');
         return response.json();
     },